@@ -0,0 +1,98 @@
+using System;
+using System.Buffers.Binary;
+using System.Collections.Generic;
+using MongoDB.Bson;
+using MongoDB.Bson.Serialization;
+using MongoDB.Bson.Serialization.Serializers;
+
+namespace FluxCommerce.Api.Data
+{
+    /// <summary>
+    /// Reads product embeddings stored either as a BSON array of numbers or as packed
+    /// float32 BSON binary (subtype 9, dtype byte 0x27, padding byte, little-endian values),
+    /// the compact layout written by the embedding scripts with --storage binary.
+    /// Writes the array layout, which every reader understands.
+    /// </summary>
+    public class EmbeddingSerializer : SerializerBase<float[]>
+    {
+        private const BsonBinarySubType VectorSubType = (BsonBinarySubType)9;
+        private const byte Float32DType = 0x27;
+
+        public override float[] Deserialize(BsonDeserializationContext context, BsonDeserializationArgs args)
+        {
+            var reader = context.Reader;
+            var bsonType = reader.GetCurrentBsonType();
+            switch (bsonType)
+            {
+                case BsonType.Array:
+                    return ReadArray(reader);
+                case BsonType.Binary:
+                    return ReadPackedFloat32(reader.ReadBinaryData());
+                case BsonType.Null:
+                    reader.ReadNull();
+                    return null!;
+                default:
+                    throw CreateCannotDeserializeFromBsonTypeException(bsonType);
+            }
+        }
+
+        public override void Serialize(BsonSerializationContext context, BsonSerializationArgs args, float[] value)
+        {
+            var writer = context.Writer;
+            if (value == null)
+            {
+                writer.WriteNull();
+                return;
+            }
+
+            writer.WriteStartArray();
+            foreach (var element in value)
+            {
+                writer.WriteDouble(element);
+            }
+            writer.WriteEndArray();
+        }
+
+        private static float[] ReadArray(IBsonReader reader)
+        {
+            var values = new List<float>(384);
+            reader.ReadStartArray();
+            while (reader.ReadBsonType() != BsonType.EndOfDocument)
+            {
+                values.Add(reader.CurrentBsonType switch
+                {
+                    BsonType.Double => (float)reader.ReadDouble(),
+                    BsonType.Int32 => reader.ReadInt32(),
+                    BsonType.Int64 => reader.ReadInt64(),
+                    _ => throw new FormatException($"Embedding element of BSON type {reader.CurrentBsonType} is not a number")
+                });
+            }
+            reader.ReadEndArray();
+            return values.ToArray();
+        }
+
+        private static float[] ReadPackedFloat32(BsonBinaryData data)
+        {
+            var bytes = data.Bytes;
+            if (data.SubType != VectorSubType || bytes.Length < 2 || bytes[0] != Float32DType || (bytes.Length - 2) % 4 != 0)
+            {
+                throw new FormatException($"Embedding binary of subtype {data.SubType} is not a packed float32 vector");
+            }
+
+            var vector = new float[(bytes.Length - 2) / 4];
+            var payload = bytes.AsSpan(2);
+            if (BitConverter.IsLittleEndian)
+            {
+                Buffer.BlockCopy(bytes, 2, vector, 0, payload.Length);
+            }
+            else
+            {
+                for (var i = 0; i < vector.Length; i++)
+                {
+                    vector[i] = BinaryPrimitives.ReadSingleLittleEndian(payload.Slice(i * 4, 4));
+                }
+            }
+            return vector;
+        }
+    }
+}
@@ -1,5 +1,7 @@
+using FluxCommerce.Api.Data;
 using MongoDB.Bson;
 using MongoDB.Bson.Serialization.Attributes;
+using System;
 using System.Collections.Generic;
 using System.ComponentModel.DataAnnotations;
 
@@ -28,9 +30,11 @@ namespace FluxCommerce.Api.Models
         public List<string> Keywords { get; set; } = new();
         
         /// <summary>
-        /// Vector embedding for semantic search (384 dimensions for all-MiniLM-L6-v2)
+        /// Vector embedding for semantic search (384 dimensions for all-MiniLM-L6-v2),
+        /// stored as a BSON array or as packed float32 binary
         /// </summary>
         [BsonElement("embedding")]
+        [BsonSerializer(typeof(EmbeddingSerializer))]
         public float[] Embedding { get; set; } = new float[384];
         
         /// <summary>
@@ -38,5 +42,44 @@ namespace FluxCommerce.Api.Models
         /// </summary>
         [BsonElement("searchableText")]
         public string SearchableText { get; set; } = string.Empty;
+
+        /// <summary>
+        /// SHA-256 of the searchable text and the model the embedding was generated from;
+        /// unset while the product still needs (re-)embedding
+        /// </summary>
+        [BsonElement("embeddingTextHash")]
+        [BsonIgnoreIfNull]
+        public string? EmbeddingTextHash { get; set; }
+
+        [BsonElement("embeddingModel")]
+        [BsonIgnoreIfNull]
+        public string? EmbeddingModel { get; set; }
+
+        /// <summary>
+        /// When the embedding was last written; a newer value than SimilarProductsUpdatedAt
+        /// means the precomputed neighbours no longer match it
+        /// </summary>
+        [BsonElement("embeddingUpdatedAt")]
+        [BsonIgnoreIfNull]
+        public DateTime? EmbeddingUpdatedAt { get; set; }
+
+        /// <summary>
+        /// Most similar products of the same store, best first (written by compute_similar_products.py)
+        /// </summary>
+        [BsonElement("similarProducts")]
+        public List<SimilarProduct> SimilarProducts { get; set; } = new();
+
+        [BsonElement("similarProductsUpdatedAt")]
+        [BsonIgnoreIfNull]
+        public DateTime? SimilarProductsUpdatedAt { get; set; }
+    }
+
+    public class SimilarProduct
+    {
+        [BsonElement("productId")]
+        public string ProductId { get; set; } = string.Empty;
+
+        [BsonElement("score")]
+        public double Score { get; set; }
     }
 }
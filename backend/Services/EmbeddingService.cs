@@ -1,5 +1,7 @@
+using System.Diagnostics;
 using System.Text;
 using System.Text.Json;
+using System.Text.Json.Serialization;
 
 namespace FluxCommerce.Api.Services;
 
@@ -37,7 +39,9 @@ public class EmbeddingService : IEmbeddingService
             var json = JsonSerializer.Serialize(request);
             var content = new StringContent(json, Encoding.UTF8, "application/json");
 
+            var stopwatch = Stopwatch.StartNew();
             var response = await _httpClient.PostAsync($"{_embeddingServiceUrl}/embed", content);
+            LogTiming(response, "/embed", stopwatch.Elapsed);
 
             if (!response.IsSuccessStatusCode)
             {
@@ -74,7 +78,9 @@ public class EmbeddingService : IEmbeddingService
             var json = JsonSerializer.Serialize(request);
             var content = new StringContent(json, Encoding.UTF8, "application/json");
 
+            var stopwatch = Stopwatch.StartNew();
             var response = await _httpClient.PostAsync($"{_embeddingServiceUrl}/embed_batch", content);
+            LogTiming(response, "/embed_batch", stopwatch.Elapsed);
 
             if (!response.IsSuccessStatusCode)
             {
@@ -94,6 +100,77 @@ public class EmbeddingService : IEmbeddingService
         }
     }
 
+    public async Task<List<SimilarityHit>?> SearchAsync(string query, string storeId, int limit, bool hybrid = false)
+    {
+        if (string.IsNullOrWhiteSpace(query) || string.IsNullOrWhiteSpace(storeId))
+        {
+            return new List<SimilarityHit>();
+        }
+
+        try
+        {
+            var request = new SearchRequest
+            {
+                StoreId = storeId,
+                Query = query.Trim(),
+                K = limit,
+                Hybrid = hybrid
+            };
+
+            var json = JsonSerializer.Serialize(request);
+            var content = new StringContent(json, Encoding.UTF8, "application/json");
+
+            var stopwatch = Stopwatch.StartNew();
+            var response = await _httpClient.PostAsync($"{_embeddingServiceUrl}/search", content);
+            LogTiming(response, "/search", stopwatch.Elapsed);
+
+            if (!response.IsSuccessStatusCode)
+            {
+                // 503 while the index loads, 404 from older service versions
+                _logger.LogWarning("Embedding service search unavailable: {StatusCode}", response.StatusCode);
+                return null;
+            }
+
+            var responseJson = await response.Content.ReadAsStringAsync();
+            var searchResponse = JsonSerializer.Deserialize<SearchResponse>(responseJson);
+
+            return searchResponse?.Results
+                .Select(r => new SimilarityHit
+                {
+                    ProductId = r.ProductId,
+                    Score = r.Score,
+                    VectorScore = r.VectorScore,
+                    KeywordScore = r.KeywordScore,
+                    MatchingTerms = r.MatchingTerms
+                })
+                .ToList();
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Error searching store {StoreId} for query: {Query}", storeId, query);
+            return null;
+        }
+    }
+
+    private void LogTiming(HttpResponseMessage response, string endpoint, TimeSpan elapsed)
+    {
+        if (!_logger.IsEnabled(LogLevel.Debug))
+        {
+            return;
+        }
+
+        // Present when the embedding service runs with EMBEDDING_SERVER_TIMING=1
+        var serverTiming = response.Headers.TryGetValues("Server-Timing", out var values)
+            ? string.Join(", ", values)
+            : "n/a";
+
+        _logger.LogDebug(
+            "Embedding service {Endpoint} took {ElapsedMs:F1} ms (server: {ServerTiming})",
+            endpoint,
+            elapsed.TotalMilliseconds,
+            serverTiming);
+    }
+
     public float CalculateCosineSimilarity(float[] embedding1, float[] embedding2)
     {
         if (embedding1 == null || embedding2 == null || embedding1.Length != embedding2.Length)
@@ -132,4 +209,43 @@ public class EmbeddingService : IEmbeddingService
     {
         public List<float[]> Embeddings { get; set; } = new();
     }
+
+    private class SearchRequest
+    {
+        [JsonPropertyName("store_id")]
+        public string StoreId { get; set; } = string.Empty;
+
+        [JsonPropertyName("query")]
+        public string Query { get; set; } = string.Empty;
+
+        [JsonPropertyName("k")]
+        public int K { get; set; }
+
+        [JsonPropertyName("hybrid")]
+        public bool Hybrid { get; set; }
+    }
+
+    private class SearchResponse
+    {
+        [JsonPropertyName("results")]
+        public List<SearchResult> Results { get; set; } = new();
+    }
+
+    private class SearchResult
+    {
+        [JsonPropertyName("product_id")]
+        public string ProductId { get; set; } = string.Empty;
+
+        [JsonPropertyName("score")]
+        public double Score { get; set; }
+
+        [JsonPropertyName("vector_score")]
+        public double? VectorScore { get; set; }
+
+        [JsonPropertyName("keyword_score")]
+        public double? KeywordScore { get; set; }
+
+        [JsonPropertyName("matching_terms")]
+        public List<string>? MatchingTerms { get; set; }
+    }
 }
\ No newline at end of file
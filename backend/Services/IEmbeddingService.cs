@@ -25,4 +25,25 @@ public interface IEmbeddingService
     /// <param name="embedding2">Second embedding vector</param>
     /// <returns>Cosine similarity score between 0 and 1</returns>
     float CalculateCosineSimilarity(float[] embedding1, float[] embedding2);
+
+    /// <summary>
+    /// Rank a store's products by similarity to a text query using the embedding service's in-memory index
+    /// </summary>
+    /// <param name="query">Search text</param>
+    /// <param name="storeId">Store whose products are searched</param>
+    /// <param name="limit">Maximum number of hits</param>
+    /// <param name="hybrid">Blend in the service's BM25 keyword index (70% vector, 30% keywords)</param>
+    /// <returns>Hits ordered by similarity, or null when the service's search index is unavailable</returns>
+    Task<List<SimilarityHit>?> SearchAsync(string query, string storeId, int limit, bool hybrid = false);
+}
+
+public class SimilarityHit
+{
+    public string ProductId { get; set; } = string.Empty;
+    public double Score { get; set; }
+
+    // Set only by hybrid searches
+    public double? VectorScore { get; set; }
+    public double? KeywordScore { get; set; }
+    public List<string>? MatchingTerms { get; set; }
 }
\ No newline at end of file
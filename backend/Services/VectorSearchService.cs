@@ -6,6 +6,11 @@ namespace FluxCommerce.Api.Services;
 
 public class VectorSearchService : IVectorSearchService
 {
+    // Vector candidates fetched from the embedding service's index per requested result,
+    // re-ranked here with the keyword score
+    private const int CandidateMultiplier = 5;
+    private const int MinCandidates = 50;
+
     private readonly MongoDbService _mongoDbService;
     private readonly IEmbeddingService _embeddingService;
     private readonly ILogger<VectorSearchService> _logger;
@@ -24,7 +29,15 @@ public class VectorSearchService : IVectorSearchService
     {
         try
         {
-            // Generate embedding for the search query
+            // Top candidates from the embedding service's in-memory vector and keyword indexes,
+            // without loading the whole store
+            var hits = await _embeddingService.SearchAsync(query, storeId, Math.Max(limit * CandidateMultiplier, MinCandidates), hybrid: true);
+            if (hits != null)
+            {
+                return await RankIndexedCandidates(query, storeId, hits, limit);
+            }
+
+            // Fall back to scanning the store when the index is unavailable
             var queryEmbedding = await _embeddingService.GenerateEmbeddingAsync(query);
             
             _logger.LogInformation("Generated embedding for query: {Query}", query);
@@ -85,7 +98,23 @@ public class VectorSearchService : IVectorSearchService
         {
             // Get the reference product
             var referenceProduct = await _mongoDbService.GetProductByIdAsync(productId);
-            if (referenceProduct == null || referenceProduct.Embedding == null)
+            if (referenceProduct == null)
+            {
+                return new List<Product>();
+            }
+
+            // Neighbours precomputed by compute_similar_products.py: no similarity work per request
+            if (referenceProduct.SimilarProducts.Count > 0)
+            {
+                var precomputed = await GetPrecomputedSimilarProducts(referenceProduct, storeId, limit);
+                if (precomputed != null)
+                {
+                    return precomputed;
+                }
+                _logger.LogInformation("Precomputed similar products of {ProductId} are stale; computing them live", productId);
+            }
+
+            if (referenceProduct.Embedding == null)
             {
                 return new List<Product>();
             }
@@ -121,6 +150,94 @@ public class VectorSearchService : IVectorSearchService
         }
     }
 
+    /// <summary>
+    /// The precomputed neighbours in stored order, or null when the list is stale: the product or one
+    /// of its neighbours was re-embedded after the list was computed, or a neighbour was deleted
+    /// or left the store
+    /// </summary>
+    private async Task<List<Product>?> GetPrecomputedSimilarProducts(Product referenceProduct, string storeId, int limit)
+    {
+        var computedAt = referenceProduct.SimilarProductsUpdatedAt;
+        if (computedAt == null || referenceProduct.EmbeddingUpdatedAt > computedAt)
+        {
+            return null;
+        }
+
+        var ids = referenceProduct.SimilarProducts.Select(s => s.ProductId).Distinct().ToList();
+        var filter = Builders<Product>.Filter.And(
+            Builders<Product>.Filter.In(p => p.Id, ids),
+            Builders<Product>.Filter.Eq(p => p.StoreId, storeId),
+            Builders<Product>.Filter.Ne(p => p.IsDeleted, true)
+        );
+
+        var products = await _mongoDbService.GetProductCollection()
+            .Find(filter)
+            .Project<Product>(Builders<Product>.Projection.Exclude(p => p.Embedding))
+            .ToListAsync();
+        var productsById = products.ToDictionary(p => p.Id!);
+        if (productsById.Count < ids.Count || products.Any(p => p.EmbeddingUpdatedAt > computedAt))
+        {
+            return null;
+        }
+
+        // Keep the precomputed order
+        return ids
+            .Select(id => productsById[id])
+            .Take(limit)
+            .ToList();
+    }
+
+    private async Task<List<ProductSearchResult>> RankIndexedCandidates(string query, string storeId, List<SimilarityHit> hits, int limit)
+    {
+        var ids = hits.Select(h => h.ProductId).ToList();
+        var filter = Builders<Product>.Filter.And(
+            Builders<Product>.Filter.In(p => p.Id, ids),
+            Builders<Product>.Filter.Eq(p => p.StoreId, storeId),
+            Builders<Product>.Filter.Ne(p => p.IsDeleted, true)
+        );
+
+        // The embedding arrays are not needed once the index has scored the products
+        var products = await _mongoDbService.GetProductCollection()
+            .Find(filter)
+            .Project<Product>(Builders<Product>.Projection.Exclude(p => p.Embedding))
+            .ToListAsync();
+        var productsById = products.ToDictionary(p => p.Id!);
+
+        var topResults = hits
+            .Where(h => productsById.ContainsKey(h.ProductId))
+            .Select(h =>
+            {
+                var product = productsById[h.ProductId];
+                if (h.KeywordScore.HasValue)
+                {
+                    // Already blended 70% vector / 30% BM25 by the service
+                    return new ProductSearchResult
+                    {
+                        Product = product,
+                        SimilarityScore = h.Score,
+                        MatchingTerms = h.MatchingTerms ?? new List<string>()
+                    };
+                }
+
+                // Service without a keyword index: same 70% vector / 30% keyword blend as the full scan
+                return new ProductSearchResult
+                {
+                    Product = product,
+                    SimilarityScore = (h.Score * 0.7) + (CalculateKeywordScore(query, product) * 0.3),
+                    MatchingTerms = GetMatchingTerms(query, product)
+                };
+            })
+            .Where(r => r.SimilarityScore > 0.1)
+            .OrderByDescending(r => r.SimilarityScore)
+            .Take(limit)
+            .ToList();
+
+        _logger.LogInformation("Found {Count} products for query '{Query}' in store {StoreId} from {Candidates} indexed candidates",
+            topResults.Count, query, storeId, hits.Count);
+
+        return topResults;
+    }
+
     private async Task<List<Product>> GetStoreProductsWithEmbeddings(string storeId)
     {
         var filter = Builders<Product>.Filter.And(
@@ -0,0 +1,151 @@
+"""
+Approximate nearest-neighbour search for FluxCommerce product vectors
+An inverted-file (IVF) index: spherical k-means splits the vectors into
+nlist clusters stored as contiguous row ranges, and a query only scores
+the nprobe clusters whose centroids are closest to it.
+
+nprobe trades recall for latency: nprobe == nlist is exact search.
+"""
+import json
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows scored per matmul while assigning vectors to centroids
+ASSIGN_CHUNK_ROWS = 16384
+
+# Training sample per centroid (k-means quality flattens out well before this)
+TRAIN_POINTS_PER_LIST = 64
+
+
+def auto_nlist(size: int) -> int:
+    """About sqrt(n) clusters keeps both the centroid scan and each list small"""
+    return max(1, int(round(math.sqrt(size))))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by cosine) of every row, computed in chunks to bound memory"""
+    assignments = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+        assignments[start:start + chunk.shape[0]] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of normalized vectors"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(vectors.shape[0], max(nlist * TRAIN_POINTS_PER_LIST, 10000))
+    sample = vectors[np.sort(rng.choice(vectors.shape[0], sample_size, replace=False))]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        occupied = counts > 0
+        sums = np.add.reduceat(sample[order], starts[occupied], axis=0)
+        centroids[occupied] = _normalize(sums)
+
+        # Re-seed empty clusters with random sample points
+        empty = np.flatnonzero(~occupied)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Cluster structure over a row-ordered vector matrix owned by the caller.
+
+    build() returns the permutation that groups rows by cluster; once the
+    caller stores its rows in that order, list i is rows
+    offsets[i]:offsets[i + 1]. Rows at or past `size` (added after the
+    build) form an unclustered tail that every search scores exactly.
+    """
+
+    def __init__(self, nlist: int = 0, nprobe: int = 16, train_iterations: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.size = 0
+
+    def build(self, vectors: np.ndarray) -> np.ndarray:
+        """Train on normalized vectors and return the row order grouped by cluster"""
+        nlist = min(self.nlist or auto_nlist(vectors.shape[0]), vectors.shape[0])
+        self.centroids = train_centroids(vectors, nlist, self.train_iterations, self.seed)
+        self.nlist = nlist
+        return self.group(assign(vectors, self.centroids))
+
+    def group(self, assignments: np.ndarray) -> np.ndarray:
+        """Set the list offsets for per-row cluster assignments; returns the grouping row order"""
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.size = int(assignments.shape[0])
+        return np.argsort(assignments, kind="stable")
+
+    def assignments(self) -> np.ndarray:
+        """Cluster of every clustered row, in row order"""
+        return np.repeat(np.arange(self.nlist, dtype=np.int32), np.diff(self.offsets))
+
+    def probe(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """The nprobe lists whose centroids score highest against the query"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        if nprobe >= self.nlist:
+            return np.arange(self.nlist)
+        return np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+    def candidates(self, vectors: np.ndarray, total_rows: int, query: np.ndarray, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, scores) of the probed lists plus the unclustered tail. Each list
+        is a contiguous slice, so scoring needs no gather copy.
+        """
+        ranges: List[Tuple[int, int]] = [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in self.probe(query, nprobe)]
+        if total_rows > self.size:
+            ranges.append((self.size, total_rows))
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([vectors[start:end] @ query for start, end in ranges])
+        return rows, scores
+
+    def params(self) -> dict:
+        return {"nlist": self.nlist, "nprobe": self.nprobe, "clustered_rows": self.size, "train_iterations": self.train_iterations}
+
+    def save(self, path: str, ids: Sequence[str]):
+        """
+        Write the centroids and each clustered product's list to an .npz file.
+        Products are stored by id, so the file stays valid when the matrix is
+        reloaded in a different row order.
+        """
+        np.savez(
+            path,
+            centroids=self.centroids,
+            assignments=self.assignments(),
+            ids=np.asarray(list(ids[:self.size]), dtype=str),
+            params=np.asarray(json.dumps(self.params())),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["IVFIndex", np.ndarray, np.ndarray]:
+        """Returns (index without offsets, product ids, their list assignments)"""
+        with np.load(path) as data:
+            params = json.loads(str(data["params"]))
+            index = cls(params["nlist"], params["nprobe"], params.get("train_iterations", 10))
+            index.centroids = data["centroids"].astype(np.float32)
+            return index, data["ids"], data["assignments"]
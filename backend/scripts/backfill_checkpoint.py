@@ -0,0 +1,120 @@
+"""
+Checkpoints and dead letters for the FluxCommerce embedding backfill
+Products are read in _id order and the highest _id below which every
+product has been written is saved after each bulk write, so a crashed or
+interrupted run resumes after it instead of starting over. Products the
+embedding service keeps rejecting are recorded in a dead-letter collection
+rather than stored with a placeholder vector.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+CHECKPOINTS_COLLECTION = "EmbeddingBackfillJobs"
+DEAD_LETTERS_COLLECTION = "EmbeddingDeadLetters"
+
+
+class Watermark:
+    """
+    Batches are numbered as they are read but finish out of order; the
+    watermark is the last _id of the longest finished prefix of batches
+    """
+
+    def __init__(self, last_id: Any = None):
+        self.last_id = last_id
+        self.next_seq = 0
+        self.finished: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def complete(self, seq: int, last_id: Any):
+        with self._lock:
+            self.finished[seq] = last_id
+            while self.next_seq in self.finished:
+                self.last_id = self.finished.pop(self.next_seq)
+                self.next_seq += 1
+
+
+class BackfillCheckpoint:
+    """
+    One document per job in EmbeddingBackfillJobs. A run resumes from the
+    saved _id when the previous run with the same model and scope did not
+    finish.
+    """
+
+    def __init__(self, db, job_id: str, model_id: str, full: bool):
+        self.collection = db[CHECKPOINTS_COLLECTION]
+        self.job_id = job_id
+        self.model_id = model_id
+        self.full = full
+        self.resume_after: Any = None
+        self.previously_processed = 0
+
+    def start(self, restart: bool = False) -> Optional[Any]:
+        """Record a running job; returns the _id to resume after, or None for a fresh start"""
+        job = self.collection.find_one({"_id": self.job_id}) or {}
+        resumable = (
+            job.get("status") == "running"
+            and job.get("model") == self.model_id
+            and job.get("full") == self.full
+            and job.get("last_id") is not None
+        )
+        now = datetime.now(timezone.utc)
+        if resumable and not restart:
+            self.resume_after = job["last_id"]
+            self.previously_processed = job.get("processed", 0)
+            self.collection.update_one({"_id": self.job_id}, {"$set": {"resumed_at": now}})
+        else:
+            self.collection.replace_one(
+                {"_id": self.job_id},
+                {"status": "running", "model": self.model_id, "full": self.full, "last_id": None,
+                 "processed": 0, "started_at": now, "updated_at": now},
+                upsert=True,
+            )
+        return self.resume_after
+
+    def save(self, last_id: Any, processed: int):
+        if last_id is None:
+            return
+        self.collection.update_one(
+            {"_id": self.job_id},
+            {"$set": {"last_id": last_id, "processed": self.previously_processed + processed,
+                      "updated_at": datetime.now(timezone.utc)}},
+        )
+
+    def finish(self, summary: Dict[str, Any]):
+        self.collection.update_one(
+            {"_id": self.job_id},
+            {"$set": {"status": "done", "summary": summary, "finished_at": datetime.now(timezone.utc)}},
+        )
+
+
+class DeadLetters:
+    """
+    Products whose embedding failed after every retry, keyed by product
+    _id. They keep their previous embedding (or none) and no text hash, so
+    the next run tries them again; a later success removes the entry.
+    """
+
+    def __init__(self, db, job_id: str):
+        self.collection = db[DEAD_LETTERS_COLLECTION]
+        self.job_id = job_id
+        self.recorded = 0
+        # Only pay for clean-up deletes when there is something to clean up
+        self.has_entries = self.collection.estimated_document_count() > 0
+
+    def record(self, product_id: Any, text_hash: str, model_id: str, error: str):
+        self.collection.update_one(
+            {"_id": product_id},
+            {"$set": {"job": self.job_id, "model": model_id, "textHash": text_hash, "error": error[:1000],
+                      "failedAt": datetime.now(timezone.utc)},
+             "$inc": {"failures": 1}},
+            upsert=True,
+        )
+        self.recorded += 1
+
+    def resolve(self, product_ids):
+        if self.has_entries and product_ids:
+            self.collection.delete_many({"_id": {"$in": list(product_ids)}})
+
+    def count(self) -> int:
+        return self.collection.count_documents({})
@@ -0,0 +1,325 @@
+"""
+Pipelined embedding backfill for FluxCommerce
+A reader thread, N embedding client threads and the calling (writer)
+thread connected by bounded queues, so reading MongoDB, waiting on the
+embedding service and writing results all overlap. A full queue blocks
+the stage feeding it, which keeps memory bounded by the queue sizes.
+
+Requests to the service go through an AdaptiveRateLimiter instead of a
+fixed sleep: it lowers the number of requests in flight when latency
+rises above a target or the service answers 429/503, and raises it again
+while the service keeps up. Batches that still fail are retried with
+exponential backoff and then split in halves, so one bad product ends up
+in the dead-letter list on its own instead of taking its batch with it.
+"""
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from embedding_codec import decode_embeddings_response
+
+# Status codes that mean "slow down" rather than "this batch is bad"
+OVERLOAD_STATUS_CODES = (429, 503)
+
+_DONE = object()
+
+
+class ServiceOverloaded(Exception):
+    def __init__(self, status_code: int, retry_after: Optional[float]):
+        super().__init__(f"Embedding service answered {status_code}" if status_code else "Embedding service unreachable")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ServiceUnavailable(Exception):
+    """The service stayed overloaded or unreachable through every attempt; stop and resume later"""
+
+
+class AdaptiveRateLimiter:
+    """
+    Limits concurrent requests with additive increase / multiplicative
+    decrease: each fast response adds about one slot per window of
+    requests, a slow one cuts the limit by a quarter, and an overload
+    response halves it and pauses every client for Retry-After (or an
+    exponential backoff).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        target_latency: float = 2.0,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.backoff = initial_backoff
+        self._condition = threading.Condition()
+
+        self.requests = 0
+        self.throttled = 0
+        self.slow = 0
+        self.latency_total = 0.0
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, overloaded: bool = False, retry_after: Optional[float] = None):
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.latency_total += latency
+            if overloaded:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+                pause = retry_after if retry_after is not None else self.backoff
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+            elif latency > self.target_latency:
+                self.slow += 1
+                self.limit = max(1.0, self.limit * 0.75)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                self.backoff = self.initial_backoff
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "slow": self.slow,
+            "avg_latency_s": self.latency_total / max(self.requests, 1),
+        }
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingClient:
+    """
+    /embed_batch client on one pooled keep-alive session shared by all
+    pipeline threads, throttled by an AdaptiveRateLimiter
+    """
+
+    def __init__(
+        self,
+        service_url: str,
+        limiter: AdaptiveRateLimiter,
+        response_format: str = "f32",
+        timeout: float = 60,
+        max_attempts: int = 8
+    ):
+        self.service_url = service_url
+        self.limiter = limiter
+        self.response_format = response_format
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limiter.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, texts: List[str]) -> np.ndarray:
+        self.limiter.acquire()
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                f"{self.service_url}/embed_batch",
+                params={"format": self.response_format},
+                json={"texts": texts},
+                timeout=self.timeout,
+            )
+        except requests.ConnectionError:
+            # Treat a refused or dropped connection like an overload: back off and retry
+            self.limiter.release(time.perf_counter() - started, overloaded=True)
+            raise ServiceOverloaded(0, None)
+        except BaseException:
+            self.limiter.release(time.perf_counter() - started)
+            raise
+
+        latency = time.perf_counter() - started
+        if response.status_code in OVERLOAD_STATUS_CODES:
+            self.limiter.release(latency, overloaded=True, retry_after=_retry_after(response))
+            raise ServiceOverloaded(response.status_code, _retry_after(response))
+        self.limiter.release(latency)
+        response.raise_for_status()
+        return decode_embeddings_response(response)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch, retrying overload responses until max_attempts"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return self._post(texts)
+            except ServiceOverloaded as e:
+                if attempt == self.max_attempts:
+                    raise ServiceUnavailable(f"{e} after {attempt} attempts") from e
+        raise RuntimeError("unreachable")
+
+    def close(self):
+        self.session.close()
+
+
+class BatchRetrier:
+    """
+    Wraps an embed(texts) function. A failing batch is retried `retries`
+    times with exponential backoff and jitter; if it still fails it is
+    split in halves, each tried once and split again on failure, down to
+    single texts. ServiceUnavailable is not retried here: the limiter has
+    already backed off, and splitting would not help.
+    """
+
+    def __init__(self, embed: Callable[[List[str]], np.ndarray], retries: int = 3, backoff: float = 1.0, max_backoff: float = 30.0):
+        self.embed = embed
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+
+        self.retried = 0
+        self.splits = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _attempt(self, texts: List[str], retries: int) -> Tuple[Optional[np.ndarray], Optional[BaseException]]:
+        for attempt in range(retries + 1):
+            try:
+                return self.embed(texts), None
+            except ServiceUnavailable:
+                raise
+            except Exception as e:
+                error = e
+            if attempt < retries:
+                self._count("retried")
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+        return None, error
+
+    def __call__(self, texts: List[str]) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+        """(vector, None) or (None, error message) per text, in order"""
+        return self._run(texts, self.retries)
+
+    def _run(self, texts: List[str], retries: int) -> List[Tuple[Optional[np.ndarray], Optional[str]]]:
+        vectors, error = self._attempt(texts, retries)
+        if vectors is not None:
+            return [(vector, None) for vector in vectors]
+        if len(texts) == 1:
+            return [(None, f"{type(error).__name__}: {error}")]
+        self._count("splits")
+        middle = len(texts) // 2
+        return self._run(texts[:middle], 0) + self._run(texts[middle:], 0)
+
+
+def run_pipeline(
+    batches: Iterable[Any],
+    embed: Callable[[Any], Any],
+    write: Callable[[Any, Any], None],
+    concurrency: int = 4,
+    queue_size: int = 0
+):
+    """
+    Feed batches through `concurrency` embed() threads into write(), which
+    runs on the calling thread. Queues hold at most queue_size batches
+    (default 2 per embedder). The first exception of any stage stops the
+    pipeline and is re-raised here.
+    """
+    concurrency = max(1, concurrency)
+    queue_size = queue_size or 2 * concurrency
+    pending: queue.Queue = queue.Queue(maxsize=queue_size)
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(target: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping"""
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            for batch in batches:
+                if not put(pending, batch):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for _ in range(concurrency):
+                put(pending, _DONE)
+
+    def embedder():
+        try:
+            while not stop.is_set():
+                try:
+                    batch = pending.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if batch is _DONE:
+                    break
+                if not put(results, (batch, embed(batch))):
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            put(results, _DONE)
+
+    threads = [threading.Thread(target=reader, name="backfill-reader", daemon=True)]
+    threads += [threading.Thread(target=embedder, name=f"backfill-embedder-{i}", daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < concurrency and not stop.is_set():
+            try:
+                item = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                finished += 1
+                continue
+            write(*item)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,377 @@
+"""
+Sharded multi-process embedding backfill for FluxCommerce
+One backfill process spends a core on building texts, encoding and BSON
+handling. This coordinator splits the Products collection into shards,
+either _id ranges or one shard per StoreId, and hands them to a pool of
+worker processes. Every worker has its own MongoDB client and its own
+encoder, connects to the coordinator's MongoDB URI, and runs
+generate_embeddings.backfill_products on one shard at a time with that
+shard's own checkpoint.
+
+The shard plan is saved with the checkpoints, so an interrupted run is
+resumed with the same shards: finished shards are skipped and the others
+continue from their last checkpoint. Ctrl-C asks the workers to write
+the batches they have in flight and stop; a second Ctrl-C kills them.
+"""
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymongo
+
+from backfill_checkpoint import CHECKPOINTS_COLLECTION
+from embedding_backends import BACKEND_REMOTE
+from embedding_freshness import LIVE_PRODUCTS_FILTER, format_counts
+
+SHARD_BY_ID = "id"
+SHARD_BY_STORE = "store"
+SHARD_MODES = [SHARD_BY_ID, SHARD_BY_STORE]
+
+# More _id ranges than workers, so a worker that finishes a sparse range
+# picks up another one instead of idling while a dense range finishes
+SHARDS_PER_WORKER = 4
+
+# _ids sampled per shard to place the range boundaries
+SAMPLES_PER_SHARD = 100
+
+# Store shards scan their store in _id order
+STORE_INDEX = [("StoreId", pymongo.ASCENDING), ("_id", pymongo.ASCENDING)]
+
+# Thread pools of the native libraries, capped per worker so the workers
+# together use each core once
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+# Summary fields added up over the shards
+SUMMED_FIELDS = [
+    "processed", "written", "write_failures", "write_concern_errors", "bulk_writes", "dead_letters", "retries",
+    "splits", "throttled",
+]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def shard_filter(shard: Dict[str, Any]) -> Dict[str, Any]:
+    """Products query of a planned shard ({"store": id} or {"lower": _id, "upper": _id})"""
+    if "store" in shard:
+        return {"StoreId": shard["store"]}
+    bounds = {}
+    if shard.get("lower") is not None:
+        bounds["$gte"] = shard["lower"]
+    if shard.get("upper") is not None:
+        bounds["$lt"] = shard["upper"]
+    return {"_id": bounds} if bounds else {}
+
+
+def id_range_shards(collection, shards: int) -> List[Dict[str, Any]]:
+    """
+    Split the _id space into about `shards` ranges holding similar numbers
+    of products. Boundaries are quantiles of a random $sample of _ids, so
+    planning reads a few thousand keys rather than the whole index.
+    """
+    if shards <= 1:
+        return [{"lower": None, "upper": None}]
+    sample = [document["_id"] for document in collection.aggregate([
+        {"$sample": {"size": shards * SAMPLES_PER_SHARD}},
+        {"$project": {"_id": 1}},
+        {"$sort": {"_id": pymongo.ASCENDING}},
+    ])]
+    boundaries = []
+    for index in range(1, shards):
+        if not sample:
+            break
+        candidate = sample[index * len(sample) // shards]
+        if not boundaries or candidate > boundaries[-1]:
+            boundaries.append(candidate)
+    edges = [None] + boundaries + [None]
+    return [{"lower": lower, "upper": upper} for lower, upper in zip(edges, edges[1:])]
+
+
+def store_shards(collection) -> List[Dict[str, Any]]:
+    """
+    One shard per store, largest first, so the longest shards start first
+    and the small ones fill in the gaps. A shard scans its store in _id
+    order, which needs the {StoreId: 1, _id: 1} index (ensure_store_index).
+    """
+    stores = collection.aggregate([
+        {"$match": LIVE_PRODUCTS_FILTER},
+        {"$group": {"_id": "$StoreId", "products": {"$sum": 1}}},
+        {"$sort": {"products": pymongo.DESCENDING}},
+    ])
+    return [{"store": store["_id"], "products": store["products"]} for store in stores]
+
+
+def has_store_index(collection) -> bool:
+    return any(index["key"] == STORE_INDEX for index in collection.index_information().values())
+
+
+def ensure_store_index(collection):
+    """Build the {StoreId: 1, _id: 1} index store shards scan by; a no-op when it exists"""
+    collection.create_index(STORE_INDEX)
+
+
+class ShardPlan:
+    """
+    The shards of a sharded job, saved in EmbeddingBackfillJobs as
+    "<job>:plan" next to the per-shard checkpoints "<job>:shard-<n>"
+    """
+
+    def __init__(self, db, job_id: str, model_id: str, full: bool, shard_by: str):
+        self.collection = db[CHECKPOINTS_COLLECTION]
+        self.job_id = job_id
+        self.plan_id = f"{job_id}:plan"
+        self.model_id = model_id
+        self.full = full
+        self.shard_by = shard_by
+        self.shards: List[Dict[str, Any]] = []
+        self.resumed = False
+
+    def shard_job_id(self, index: int) -> str:
+        return f"{self.job_id}:shard-{index:04d}"
+
+    def load_or_create(self, products, workers: int, restart: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        The (index, shard) pairs still to run: the unfinished shards of an
+        interrupted run with the same model, scope and sharding, or every
+        shard of a new plan
+        """
+        plan = self.collection.find_one({"_id": self.plan_id}) or {}
+        resumable = (
+            plan.get("status") == "running"
+            and plan.get("model") == self.model_id
+            and plan.get("full") == self.full
+            and plan.get("shard_by") == self.shard_by
+        )
+        if resumable and not restart:
+            self.resumed = True
+            self.shards = plan["shards"]
+            done = {
+                job["_id"] for job in self.collection.find(
+                    {"_id": {"$in": [self.shard_job_id(index) for index in range(len(self.shards))]}, "status": "done"},
+                    {"_id": 1},
+                )
+            }
+            return [(index, shard) for index, shard in enumerate(self.shards) if self.shard_job_id(index) not in done]
+
+        if self.shard_by == SHARD_BY_STORE:
+            self.shards = store_shards(products)
+        else:
+            self.shards = id_range_shards(products, workers * SHARDS_PER_WORKER)
+        now = datetime.now(timezone.utc)
+        self.collection.replace_one(
+            {"_id": self.plan_id},
+            {"status": "running", "model": self.model_id, "full": self.full, "shard_by": self.shard_by,
+             "shards": self.shards, "started_at": now, "updated_at": now},
+            upsert=True,
+        )
+        return list(enumerate(self.shards))
+
+    def finish(self, summary: Dict[str, Any]):
+        self.collection.update_one(
+            {"_id": self.plan_id},
+            {"$set": {"status": "done", "summary": summary, "finished_at": datetime.now(timezone.utc)}},
+        )
+
+
+# State of a worker process, set up by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(settings: Dict[str, Any], progress, stop):
+    # Ctrl-C reaches every process in the group; the coordinator handles it
+    # and asks the workers to stop through `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker.update(settings=settings, progress=progress, stop=stop, backend=None)
+
+
+def _worker_backend():
+    """The worker's encoder, loaded on its first shard (a failed load then fails that shard instead of the pool)"""
+    # Imported here: generate_embeddings imports this module
+    import generate_embeddings as backfill
+    if _worker["backend"] is None:
+        settings = _worker["settings"]
+        for name in ("READ_BATCH_SIZE", "WRITE_BATCH_SIZE", "WRITE_CONCERN", "EMBEDDING_STORAGE", "EMBEDDING_SERVICE_URL"):
+            setattr(backfill, name, settings[name])
+        backend = backfill.create_backend(
+            settings["backend"],
+            model_path=settings["model_path"],
+            num_threads=settings["num_threads"],
+            url=backfill.EMBEDDING_SERVICE_URL,
+            concurrency=settings["concurrency"],
+            target_latency=settings["target_latency"],
+        )
+        backend.load()
+        _worker["backend"] = backend
+    return _worker["backend"]
+
+
+def _run_shard(task) -> Tuple[int, Optional[Dict[str, Any]], Dict[str, int]]:
+    """Backfill one shard in a worker; the summary is None when the run was stopped before the shard started"""
+    import generate_embeddings as backfill
+    index, shard, job_id, restart = task
+    settings, progress, stop = _worker["settings"], _worker["progress"], _worker["stop"]
+    if stop.is_set():
+        return index, None, {}
+    if backfill.client is None:
+        backfill.connect(settings["MONGO_URI"])
+    summary, counts = backfill.backfill_products(
+        _worker_backend(),
+        settings["batch_size"],
+        settings["full"],
+        settings["retries"],
+        restart,
+        job_id=job_id,
+        shard_filter=shard_filter(shard),
+        should_stop=stop.is_set,
+        on_batch=lambda processed, failed: progress.put((processed, failed)),
+    )
+    return index, summary, dict(counts)
+
+
+def run_sharded_backfill(
+    db,
+    job_id: str,
+    model_id: str,
+    settings: Dict[str, Any],
+    workers: int,
+    shard_by: str = SHARD_BY_ID,
+    restart: bool = False,
+    progress_every: int = 10000,
+    create_index: bool = False
+) -> bool:
+    """
+    Backfill every shard of the plan on `workers` processes and print the
+    aggregated progress. settings holds the backfill options the workers
+    need (see _worker_backend and _run_shard). With store shards,
+    create_index builds their index first; without it a missing index is
+    only reported. Returns True when every shard finished.
+    """
+    if shard_by == SHARD_BY_STORE:
+        if create_index:
+            print("Ensuring the {StoreId: 1, _id: 1} index...")
+            ensure_store_index(db["Products"])
+        elif not has_store_index(db["Products"]):
+            print("⚠️  No {StoreId: 1, _id: 1} index: every store shard will sort its products in memory. "
+                  "Create it with --create-index.")
+    plan = ShardPlan(db, job_id, model_id, settings["full"], shard_by)
+    pending = plan.load_or_create(db["Products"], workers, restart)
+    if plan.resumed:
+        print(f"Resuming sharded run: {len(pending)} of {len(plan.shards)} {shard_by} shards left")
+    else:
+        print(f"Planned {len(plan.shards)} {shard_by} shards")
+    if not pending:
+        plan.finish({"shards": len(plan.shards)})
+        return True
+
+    workers = max(1, min(workers, len(pending)))
+    if settings["backend"] != BACKEND_REMOTE and not settings["num_threads"]:
+        settings = dict(settings, num_threads=max(1, default_workers() // workers))
+    # Spawned workers inherit the environment before they import numpy and torch
+    for name in THREAD_ENV_VARS:
+        os.environ.setdefault(name, str(settings["num_threads"] or 1))
+    threads = f", {settings['num_threads']} threads each" if settings["num_threads"] else ""
+    print(f"Starting {workers} worker processes ({settings['backend']} backend{threads})")
+
+    context = multiprocessing.get_context("spawn")
+    progress = context.Queue()
+    stop = context.Event()
+    pool = context.Pool(workers, _init_worker, (settings, progress, stop))
+    # A new plan resets checkpoints left by older plans under the same shard ids.
+    # One failing shard (service gone, model not loadable) stops the others cleanly.
+    results = [
+        pool.apply_async(
+            _run_shard,
+            ((index, shard, plan.shard_job_id(index), not plan.resumed),),
+            error_callback=lambda error: stop.set(),
+        )
+        for index, shard in pending
+    ]
+    pool.close()
+
+    totals = Counter()
+    next_report = progress_every
+    started = time.perf_counter()
+
+    def drain(timeout: float):
+        nonlocal next_report
+        try:
+            processed, failed = progress.get(timeout=timeout)
+        except queue.Empty:
+            return
+        totals.update(processed=processed, failed=failed)
+        while True:
+            try:
+                processed, failed = progress.get_nowait()
+            except queue.Empty:
+                break
+            totals.update(processed=processed, failed=failed)
+        if totals["processed"] >= next_report:
+            finished = sum(result.ready() for result in results)
+            print(f"  ✓ Processed {totals['processed']} products "
+                  f"({totals['processed'] / (time.perf_counter() - started):.0f} docs/s, "
+                  f"{totals['failed']} failed, {finished}/{len(results)} shards done)")
+            next_report = (totals["processed"] // progress_every + 1) * progress_every
+
+    def wait():
+        while not all(result.ready() for result in results):
+            drain(0.5)
+        drain(0)
+
+    interrupted = False
+    try:
+        wait()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\nStopping: workers are writing the batches in flight and saving their checkpoints "
+              "(Ctrl-C again to kill them)...")
+        stop.set()
+        try:
+            wait()
+        except KeyboardInterrupt:
+            pool.terminate()
+            pool.join()
+            print("Workers killed; run again to resume from the last saved checkpoints.")
+            return False
+    pool.join()
+
+    summary = Counter()
+    counts = Counter()
+    errors = []
+    complete = 0
+    for result in results:
+        try:
+            _, shard_summary, shard_counts = result.get()
+        except Exception as e:
+            errors.append(e)
+            continue
+        if shard_summary is None:
+            continue
+        summary.update({field: shard_summary[field] for field in SUMMED_FIELDS})
+        counts.update(shard_counts)
+        complete += shard_summary["complete"]
+
+    elapsed = time.perf_counter() - started
+    summary = dict(summary, shards=len(plan.shards), workers=workers, backend=settings["backend"],
+                   seconds=round(elapsed, 1), docs_per_s=round(summary["processed"] / max(elapsed, 1e-9), 1))
+    print(f"Products: {format_counts(counts)}")
+    print(f"Retries: {summary['retries']}, split batches: {summary['splits']}, throttled: {summary['throttled']}")
+    print(f"Processed {summary['processed']} products in {elapsed:.1f}s ({summary['docs_per_s']:.0f} docs/s) "
+          f"on {workers} workers; {summary['written']} written, {summary['write_failures']} write failures, "
+          f"{summary['dead_letters']} dead letters")
+    if summary["write_concern_errors"]:
+        print(f"⚠️  {summary['write_concern_errors']} write concern errors: some updates may not be replicated")
+    for error in errors[:3]:
+        print(f"❌ Shard failed: {error}")
+    if complete == len(pending) and not errors:
+        plan.finish(summary)
+        print(f"✅ All {len(plan.shards)} shards complete!")
+        return True
+    if interrupted or errors:
+        print(f"{complete} of {len(pending)} shards finished; run again to resume the others from their checkpoints.")
+    return False
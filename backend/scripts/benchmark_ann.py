@@ -0,0 +1,112 @@
+"""
+Benchmark approximate (IVF) against exact product search
+Builds a synthetic clustered catalog of normalized vectors for each size,
+then reports index build time, recall@k against exact search and per-query
+p50/p99 latency for the exact scan and for several nprobe values.
+
+Usage: python benchmark_ann.py [--sizes 10000 100000 1000000] [--nprobe 4 8 16 32 64] [--queries 200]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from vector_index import StorePartition, normalize_rows
+
+# Rows generated (and scored for the ground truth) per chunk, to bound memory
+CHUNK_ROWS = 65536
+
+
+def synthetic_catalog(size: int, centers: np.ndarray, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """Normalized vectors scattered around topic directions, like products around their categories"""
+    topics, dimensions = centers.shape
+    vectors = np.empty((size, dimensions), dtype=np.float32)
+    for start in range(0, size, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, size - start)
+        chunk = centers[rng.integers(0, topics, rows)]
+        chunk += rng.standard_normal((rows, dimensions), dtype=np.float32) * (noise / np.sqrt(dimensions))
+        vectors[start:start + rows] = normalize_rows(chunk)
+    return vectors
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Row indices of the true top-k for every query"""
+    best_scores = np.full((queries.shape[0], 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((queries.shape[0], 0), dtype=np.int64)
+    for start in range(0, vectors.shape[0], CHUNK_ROWS):
+        scores = queries @ vectors[start:start + CHUNK_ROWS].T
+        rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, rows], axis=1)
+        keep = np.argsort(-scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    return best_rows
+
+
+def measure(partition: StorePartition, queries: np.ndarray, truth: list, k: int, **search_args) -> dict:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = partition.search(query, k, **search_args)
+        latencies.append(time.perf_counter() - started)
+        hits += len(expected.intersection(product_id for product_id, _ in results))
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "recall": hits / (len(truth) * k),
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def run(size: int, args):
+    rng = np.random.default_rng(args.seed)
+    centers = normalize_rows(rng.standard_normal((max(size // 500, 16), args.dimensions)).astype(np.float32))
+    vectors = synthetic_catalog(size, centers, args.noise, rng)
+    # Queries come from the same topics but are not catalog products
+    queries = synthetic_catalog(args.queries, centers, args.noise, rng)
+    ids = [str(row) for row in range(size)]
+    truth = [{ids[row] for row in rows} for rows in exact_neighbours(vectors, queries, args.k)]
+
+    partition = StorePartition(args.dimensions)
+    partition.bulk_load(ids, vectors)
+    del vectors
+
+    rows = [("exact", 0.0, measure(partition, queries, truth, args.k))]
+
+    started = time.perf_counter()
+    partition.build_ann(args.nlist, args.nprobe[0])
+    build_seconds = time.perf_counter() - started
+
+    for nprobe in args.nprobe:
+        rows.append((f"ivf nprobe={nprobe}", build_seconds, measure(partition, queries, truth, args.k, nprobe=nprobe)))
+
+    print(f"\n{size:,} products, {partition.ivf.nlist} lists, {args.queries} queries, recall@{args.k}")
+    print(f"{'method':<18}{'build s':>9}{'recall':>9}{'p50 ms':>9}{'p99 ms':>9}{'speedup':>9}")
+    exact_p50 = rows[0][2]["p50"]
+    for method, build, result in rows:
+        print(
+            f"{method:<18}{build:>9.2f}{result['recall']:>9.3f}{result['p50']:>9.2f}"
+            f"{result['p99']:>9.2f}{exact_p50 / result['p50']:>8.1f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF approximate search against exact search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000], help="Catalog sizes to test")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64], help="Probe counts to test")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF clusters (0 = about sqrt(size))")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per size")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--dimensions", type=int, default=384, help="Vector dimensions")
+    parser.add_argument("--noise", type=float, default=1.5, help="Spread of products around their topic (higher is harder)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark the MongoDB side of the embedding backfill
+Seeds a synthetic catalog into a scratch database, then writes an
+embedding for every product twice:
+
+  legacy  list(find()) of whole documents + one update_one per product
+  bulk    projected cursor read in pages + unordered bulk_write batches
+
+Embeddings come from a seeded random generator, so only MongoDB I/O is
+measured. Reports docs/s and the peak Python memory of each pass.
+
+Usage: python benchmark_backfill.py [--products 100000] [--write-batch 500] [--write-concern 1]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pymongo
+from pymongo import UpdateOne
+
+from embedding_freshness import LIVE_PRODUCTS_FILTER, SCAN_PROJECTION
+from mongo_bulk import BulkWriter, parse_write_concern
+from product_text import create_searchable_text
+
+WORDS = (
+    "pizza pasta leche queso pan café té jugo arroz pollo carne pescado fruta manzana banano "
+    "paracetamol ibuprofeno vitamina crema champú jabón perro gato alimento juguete rompecabezas "
+    "teclado mouse audífonos cargador cable pantalla fresco natural orgánico premium artesanal"
+).split()
+
+
+def seed_catalog(collection, products: int, seed: int):
+    """Products shaped like the real ones, including image URLs the backfill never needs"""
+    rng = np.random.default_rng(seed)
+    collection.drop()
+    for start in range(0, products, 5000):
+        collection.insert_many([
+            {
+                "Name": " ".join(rng.choice(WORDS, 3)),
+                "Description": " ".join(rng.choice(WORDS, 30)),
+                "Keywords": list(rng.choice(WORDS, 5)),
+                "Price": float(rng.uniform(1000, 100000)),
+                "Stock": int(rng.integers(0, 500)),
+                "Images": [f"https://cdn.example.com/products/{start + i}/{n}.jpg" for n in range(6)],
+                "StoreId": f"store-{int(rng.integers(0, 50))}",
+                "IsDeleted": False,
+                "embedding": rng.standard_normal(384).astype(np.float32).tolist(),
+            }
+            for i in range(min(5000, products - start))
+        ], ordered=False)
+
+
+def run_legacy(collection, dimensions: int, rng: np.random.Generator) -> int:
+    products = list(collection.find(LIVE_PRODUCTS_FILTER))
+    for product in products:
+        collection.update_one(
+            {"_id": product["_id"]},
+            {"$set": {"searchableText": create_searchable_text(product), "embedding": rng.standard_normal(dimensions).tolist()}},
+        )
+    return len(products)
+
+
+def run_bulk(collection, dimensions: int, rng: np.random.Generator, args) -> int:
+    cursor = collection.find(LIVE_PRODUCTS_FILTER, projection=SCAN_PROJECTION, batch_size=args.read_batch)
+    with BulkWriter(collection, args.write_batch, parse_write_concern(args.write_concern)) as writer:
+        for product in cursor:
+            writer.add(UpdateOne(
+                {"_id": product["_id"]},
+                {"$set": {"searchableText": create_searchable_text(product), "embedding": rng.standard_normal(dimensions).tolist()}},
+            ))
+    return writer.written
+
+
+def measure(name: str, run) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    documents = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"name": name, "documents": documents, "seconds": elapsed, "docs_per_s": documents / elapsed, "peak_mb": peak / 2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-document vs bulk MongoDB writes in the embedding backfill")
+    parser.add_argument("--products", type=int, default=100000, help="Synthetic catalog size")
+    parser.add_argument("--read-batch", type=int, default=1000, help="Cursor page size of the bulk pass")
+    parser.add_argument("--write-batch", type=int, default=500, help="Updates per bulk_write")
+    parser.add_argument("--write-concern", default="1", help='"1", "majority" or "0"')
+    parser.add_argument("--skip-legacy", action="store_true", help="Only run the bulk pass")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--db", default="FluxCommerceBenchmark", help="Scratch database (dropped afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(args.mongo_uri)
+    collection = client[args.db]["Products"]
+    try:
+        print(f"Seeding {args.products} products into {args.db}.Products...")
+        started = time.perf_counter()
+        seed_catalog(collection, args.products, seed=0)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+        rng = np.random.default_rng(1)
+        results = []
+        if not args.skip_legacy:
+            results.append(measure("legacy", lambda: run_legacy(collection, 384, rng)))
+        results.append(measure(f"bulk (batch {args.write_batch}, w={args.write_concern})", lambda: run_bulk(collection, 384, rng, args)))
+
+        print(f"\n{'pass':<32}{'docs':>9}{'seconds':>10}{'docs/s':>10}{'peak MB':>10}")
+        for result in results:
+            print(
+                f"{result['name']:<32}{result['documents']:>9}{result['seconds']:>10.1f}"
+                f"{result['docs_per_s']:>10.0f}{result['peak_mb']:>10.1f}"
+            )
+    finally:
+        if not args.keep:
+            client.drop_database(args.db)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark the mock embedding engine for FluxCommerce
+Compares the original one-text-at-a-time create_simple_embedding (global
+np.random reseeding, salted hash()) with the vectorized batch engine in
+mock_embeddings.py on synthetic product texts, and checks that each one
+gives the same vectors across threads and across processes.
+
+Usage: python benchmark_mock_embeddings.py [--texts 20000] [--batch 256]
+"""
+import argparse
+import hashlib
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from mock_embeddings import embed_texts
+
+WORDS = (
+    "pizza hamburguesa ensalada arroz leche huevos pan croissant paracetamol alcohol curitas "
+    "medicamento auriculares mouse teclado computadora juguete muñeca carrito rompecabezas regalo "
+    "fresco natural orgánico premium artesanal grande pequeño familiar económico importado"
+).split()
+
+
+def legacy_create_simple_embedding(text: str) -> List[float]:
+    """The per-text mock from before mock_embeddings.py, verbatim"""
+    text = text.lower().strip()
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    np.random.seed(seed)
+    embedding = np.random.normal(0, 0.1, 384)
+    food_keywords = ['pizza', 'hamburguesa', 'ensalada', 'arroz', 'leche', 'huevos', 'pan', 'croissant', 'comida', 'desayuno', 'almuerzo', 'cena']
+    medicine_keywords = ['paracetamol', 'alcohol', 'curitas', 'medicina', 'medicamento', 'dolor', 'cabeza', 'fiebre']
+    tech_keywords = ['auriculares', 'mouse', 'teclado', 'tecnología', 'electrónica', 'computadora']
+    toy_keywords = ['juguete', 'muñeca', 'carrito', 'rompecabezas', 'niño', 'niña', 'regalo']
+    if any(keyword in text for keyword in food_keywords):
+        embedding[0:50] += 0.3
+    if any(keyword in text for keyword in medicine_keywords):
+        embedding[50:100] += 0.3
+    if any(keyword in text for keyword in tech_keywords):
+        embedding[100:150] += 0.3
+    if any(keyword in text for keyword in toy_keywords):
+        embedding[150:200] += 0.3
+    words = text.split()
+    for i, word in enumerate(words):
+        if i < 50:
+            embedding[hash(word) % 384] += 0.2
+    norm = np.linalg.norm(embedding)
+    if norm > 0:
+        embedding = embedding / norm
+    return embedding.tolist()
+
+
+def legacy_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray([legacy_create_simple_embedding(text) for text in texts], dtype=np.float32)
+
+
+def synthetic_texts(count: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, int(rng.integers(8, 40)))) for _ in range(count)]
+
+
+def texts_per_second(embed, texts: List[str], batch: int) -> float:
+    embed(texts[:batch])  # warm up
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch):
+        embed(texts[start:start + batch])
+    return len(texts) / (time.perf_counter() - started)
+
+
+def threads_agree(embed, texts: List[str], batch: int, threads: int = 4) -> bool:
+    """Same vectors from concurrent threads as from one thread"""
+    expected = embed(texts)
+    chunks = [texts[start:start + batch] for start in range(0, len(texts), batch)]
+    with ThreadPoolExecutor(threads) as pool:
+        concurrent = np.concatenate(list(pool.map(embed, chunks)))
+    return bool(np.array_equal(expected, concurrent))
+
+
+def _digest_in_child(args) -> str:
+    name, texts = args
+    embed = embed_texts if name == "batch" else legacy_batch
+    return hashlib.sha256(np.ascontiguousarray(embed(texts), dtype=np.float32).tobytes()).hexdigest()
+
+
+def processes_agree(name: str, texts: List[str], processes: int = 2) -> bool:
+    """Same vectors from freshly spawned interpreters (each with its own hash() salt)"""
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        digests = pool.map(_digest_in_child, [(name, texts)] * processes)
+    return len(set(digests)) == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the legacy and vectorized mock embedding generators")
+    parser.add_argument("--texts", type=int, default=20000, help="Synthetic product texts")
+    parser.add_argument("--batch", type=int, default=256, help="Texts per batch")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    sample = texts[:2000]
+    print(f"{len(texts)} texts, batches of {args.batch}\n")
+    print(f"{'engine':<10}{'texts/s':>12}{'threads agree':>16}{'processes agree':>18}")
+    results = {}
+    for name, embed in (("legacy", legacy_batch), ("batch", embed_texts)):
+        results[name] = texts_per_second(embed, texts, args.batch)
+        print(
+            f"{name:<10}{results[name]:>12.0f}"
+            f"{str(threads_agree(embed, sample, args.batch)):>16}{str(processes_agree(name, sample)):>18}"
+        )
+    print(f"\nSpeedup: {results['batch'] / results['legacy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
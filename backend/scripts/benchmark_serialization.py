@@ -0,0 +1,89 @@
+"""
+Benchmark embedding response serialization for FluxCommerce
+Compares the pydantic response-model path with the pre-rendered fast path
+
+Usage: python benchmark_serialization.py [--vectors 1000] [--repeat 20]
+"""
+import argparse
+import json
+import time
+from typing import Callable, List
+
+import numpy as np
+from pydantic import BaseModel
+
+import embedding_codec
+from embedding_codec import FORMAT_F16, FORMAT_F32, encode_binary, render_json
+
+
+class BatchEmbeddingResponse(BaseModel):
+    embeddings: List[List[float]]
+
+
+def pydantic_path(embeddings: np.ndarray) -> bytes:
+    """What FastAPI does for response_model=BatchEmbeddingResponse"""
+    response = BatchEmbeddingResponse(embeddings=[emb.tolist() for emb in embeddings])
+    content = BatchEmbeddingResponse.model_validate(response).model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def stdlib_fast_path(embeddings: np.ndarray) -> bytes:
+    """render_json() as it behaves when orjson is not installed"""
+    saved = embedding_codec.orjson
+    embedding_codec.orjson = None
+    try:
+        return render_json("embeddings", embeddings)
+    finally:
+        embedding_codec.orjson = saved
+
+
+def time_it(fn: Callable[[np.ndarray], bytes], embeddings: np.ndarray, repeat: int):
+    fn(embeddings)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn(embeddings)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)), len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding response serialization")
+    parser.add_argument("--vectors", type=int, default=1000, help="Vectors per response")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed repetitions per method")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    embeddings = rng.normal(0, 0.1, (args.vectors, args.dimensions)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    # The fast path must parse back to exactly what the pydantic path sends
+    reference = json.loads(pydantic_path(embeddings))
+    assert json.loads(render_json("embeddings", embeddings)) == reference
+    assert json.loads(stdlib_fast_path(embeddings)) == reference
+
+    methods = [
+        ("pydantic response model", pydantic_path),
+        ("fast json (stdlib)", stdlib_fast_path),
+    ]
+    if embedding_codec.orjson is not None:
+        methods.append(("fast json (orjson)", lambda e: render_json("embeddings", e)))
+    else:
+        print("orjson is not installed - skipping the orjson fast path")
+    methods.append(("binary f32", lambda e: encode_binary(e, FORMAT_F32)))
+    methods.append(("binary f16", lambda e: encode_binary(e, FORMAT_F16)))
+
+    print(f"Serializing {args.vectors} x {args.dimensions} vectors, median of {args.repeat} runs")
+    print(f"{'method':<26}{'ms / 1k vectors':>18}{'payload KB':>14}{'speedup':>10}")
+
+    baseline = None
+    for name, fn in methods:
+        seconds, size = time_it(fn, embeddings, args.repeat)
+        per_1k_ms = seconds * 1000.0 * 1000.0 / args.vectors
+        baseline = baseline or per_1k_ms
+        print(f"{name:<26}{per_1k_ms:>18.2f}{size / 1024:>14.1f}{baseline / per_1k_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark how embedding service throughput scales with EMBEDDING_WORKERS
+Starts the service once per worker count, drives it with concurrent
+/embed_batch calls and reports texts/s and the memory of the process tree
+(PSS counts pages shared copy-on-write between workers only once)
+
+Usage: python benchmark_workers.py [--workers 1 2 4] [--duration 15] [--concurrency 16]
+"""
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from typing import List
+
+import requests
+
+WORDS = (
+    "pizza pasta leche queso pan café té jugo arroz pollo carne pescado fruta manzana banano "
+    "paracetamol ibuprofeno vitamina crema champú jabón perro gato alimento juguete rompecabezas "
+    "teclado mouse audífonos cargador cable pantalla fresco natural orgánico premium artesanal "
+    "para con sin de la el los las familia niños adultos desayuno almuerzo cena dolor cabeza"
+).split()
+
+
+def random_text(rng: random.Random) -> str:
+    # Unique texts, so the embedding cache never answers for the model
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 40))) + f" {rng.random():.12f}"
+
+
+def process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for children_file in glob.glob(f"/proc/{pid}/task/*/children"):
+        with open(children_file) as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS and PSS of a process and its children (Linux only)"""
+    rss = pss = 0
+    for member in process_tree(pid):
+        try:
+            with open(f"/proc/{member}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            pass
+    return {"rss": rss / 1024, "pss": pss / 1024}
+
+
+def wait_until_ready(url: str, workers: int, timeout: float) -> bool:
+    """Poll /health on fresh connections until every worker reports healthy"""
+    ready_pids = set()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            health = requests.get(f"{url}/health", timeout=5).json()
+            if health["status"] == "healthy":
+                ready_pids.add(health.get("process", {}).get("pid"))
+                if len(ready_pids) >= workers:
+                    return True
+            elif health["status"] == "failed":
+                return False
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def drive(url: str, duration: float, concurrency: int, batch_size: int) -> dict:
+    stop_at = time.time() + duration
+    counts = [0] * concurrency
+    errors = [0] * concurrency
+
+    def client(index: int):
+        rng = random.Random(index)
+        session = requests.Session()
+        while time.time() < stop_at:
+            texts = [random_text(rng) for _ in range(batch_size)]
+            try:
+                response = session.post(f"{url}/embed_batch", json={"texts": texts}, params={"format": "f32"}, timeout=60)
+                response.raise_for_status()
+                counts[index] += batch_size
+            except requests.RequestException:
+                errors[index] += 1
+
+    started = time.time()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    return {"texts_per_s": sum(counts) / elapsed, "errors": sum(errors)}
+
+
+def run(workers: int, args) -> dict:
+    env = dict(
+        os.environ,
+        EMBEDDING_WORKERS=str(workers),
+        EMBEDDING_PORT=str(args.port),
+        EMBEDDING_HOST="127.0.0.1",
+        EMBEDDING_CACHE_MAX_MB="0",
+        EMBEDDING_CACHE_PATH="",
+    )
+    if args.threads:
+        env["EMBEDDING_NUM_THREADS"] = str(args.threads)
+
+    url = f"http://127.0.0.1:{args.port}"
+    service = subprocess.Popen(
+        [sys.executable, "embedding_service.py"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_until_ready(url, workers, args.startup_timeout):
+            raise RuntimeError(f"Service with {workers} worker(s) did not become ready")
+        result = drive(url, args.duration, args.concurrency, args.batch_size)
+        result.update(memory_mb(service.pid))
+        return result
+    finally:
+        service.terminate()
+        try:
+            service.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            service.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding service scaling across worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to test")
+    parser.add_argument("--threads", type=int, default=0, help="EMBEDDING_NUM_THREADS per worker (0 = cores / workers)")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--batch-size", type=int, default=16, help="Texts per /embed_batch request")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the benchmarked service")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the workers to be ready")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU cores, {args.concurrency} connections, {args.batch_size} texts per request")
+    print(f"{'workers':>8}{'texts/s':>12}{'scaling':>10}{'RSS MB':>10}{'PSS MB':>10}{'errors':>8}")
+
+    baseline = None
+    for workers in args.workers:
+        result = run(workers, args)
+        baseline = baseline or result["texts_per_s"]
+        print(
+            f"{workers:>8}{result['texts_per_s']:>12.1f}{result['texts_per_s'] / baseline:>9.2f}x"
+            f"{result['rss']:>10.0f}{result['pss']:>10.0f}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Precompute "similar products" for FluxCommerce product pages
+For every product, finds the k most similar products of the same store
+by cosine similarity of their embeddings and stores them on the product
+document as similarProducts: [{"productId", "score"}], best first.
+
+Similarities are computed with blocked matrix multiplication: a tile of
+rows is scored against one tile of columns at a time, keeping a running
+top-k per row, so the score matrix never exceeds tile_rows x tile_cols.
+
+Progress is checkpointed per store in the SimilarProductsJobs collection
+after every row tile; an interrupted run resumes where it stopped as long
+as the store's products and embeddings have not changed.
+
+Usage: python compute_similar_products.py [--store STORE_ID ...] [--k 20] [--force]
+"""
+import argparse
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pymongo
+from pymongo import UpdateOne
+
+from embedding_storage import decode_embedding
+
+DB_NAME = "FluxCommerce"
+JOBS_COLLECTION = "SimilarProductsJobs"
+
+# Same products the search index uses
+PRODUCT_FILTER = {"IsDeleted": {"$ne": True}, "embedding": {"$exists": True}}
+
+
+def load_store(products, store_id: str, dimensions: int) -> Tuple[List[Any], np.ndarray]:
+    """Ids (in _id order, so reruns see the same rows) and normalized embeddings of a store"""
+    ids, vectors = [], []
+    cursor = products.find(
+        {**PRODUCT_FILTER, "StoreId": store_id},
+        {"_id": 1, "embedding": 1},
+        batch_size=1000,
+    ).sort("_id", pymongo.ASCENDING)
+    for document in cursor:
+        vector = decode_embedding(document.get("embedding"))
+        if vector is None or len(vector) != dimensions:
+            continue
+        norm = np.linalg.norm(vector)
+        # Zero vectors are the placeholder left by failed embedding runs
+        if not np.isfinite(norm) or norm < 1e-6:
+            continue
+        ids.append(document["_id"])
+        vectors.append(vector / norm)
+    if not vectors:
+        return [], np.zeros((0, dimensions), dtype=np.float32)
+    return ids, np.stack(vectors)
+
+
+def fingerprint(ids: List[Any], matrix: np.ndarray) -> str:
+    """Changes whenever a product is added, removed or re-embedded"""
+    digest = hashlib.sha256()
+    digest.update("\n".join(str(product_id) for product_id in ids).encode("utf-8"))
+    digest.update(matrix.tobytes())
+    return digest.hexdigest()
+
+
+def top_k_tile(matrix: np.ndarray, start: int, end: int, k: int, tile_cols: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (indices, scores) of the k nearest other rows for rows start:end, best
+    first, scoring one column tile at a time
+    """
+    queries = matrix[start:end]
+    rows = queries.shape[0]
+    best_scores = np.full((rows, 0), -np.inf, dtype=np.float32)
+    best_index = np.zeros((rows, 0), dtype=np.int64)
+
+    for col_start in range(0, matrix.shape[0], tile_cols):
+        scores = queries @ matrix[col_start:col_start + tile_cols].T
+        # A product is not similar to itself
+        overlap = np.arange(max(start, col_start), min(end, col_start + scores.shape[1]))
+        scores[overlap - start, overlap - col_start] = -np.inf
+
+        keep = min(k, scores.shape[1])
+        candidates = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+        index = np.concatenate([best_index, candidates + col_start], axis=1)
+
+        keep = min(k, scores.shape[1])
+        selected = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(scores, selected, axis=1)
+        best_index = np.take_along_axis(index, selected, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_index, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def process_store(db, store_id: str, args) -> Optional[int]:
+    """Compute and write one store's neighbours; returns products written, None if skipped"""
+    products = db["Products"]
+    jobs = db[JOBS_COLLECTION]
+
+    # Lists are stamped with the time the embeddings were read, so any product
+    # re-embedded while the job runs counts as newer than its neighbours
+    read_at = datetime.now(timezone.utc)
+    ids, matrix = load_store(products, store_id, args.dimensions)
+    if len(ids) < 2:
+        print(f"  Store {store_id}: {len(ids)} embedded product(s), nothing to compare")
+        return None
+
+    current = fingerprint(ids, matrix)
+    job = jobs.find_one({"_id": store_id}) or {}
+    same_input = job.get("fingerprint") == current and job.get("k") == args.k
+    if same_input and job.get("status") == "done" and not args.force:
+        # Same vectors as when the lists were computed (e.g. a --full re-embed): they are current as of now
+        products.update_many(
+            {"StoreId": store_id, "similarProductsUpdatedAt": {"$exists": True}},
+            {"$set": {"similarProductsUpdatedAt": read_at}},
+        )
+        print(f"  Store {store_id}: up to date ({len(ids)} products), skipping")
+        return None
+    start_row = job.get("rows_done", 0) if same_input and job.get("status") == "running" and not args.force else 0
+    if start_row:
+        print(f"  Store {store_id}: resuming at product {start_row}/{len(ids)}")
+
+    jobs.update_one(
+        {"_id": store_id},
+        {"$set": {"status": "running", "fingerprint": current, "k": args.k, "total": len(ids), "rows_done": start_row,
+                  "started_at": job.get("started_at") if start_row else datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+    started = time.perf_counter()
+    for tile_start in range(start_row, len(ids), args.tile_rows):
+        tile_end = min(tile_start + args.tile_rows, len(ids))
+        neighbours, scores = top_k_tile(matrix, tile_start, tile_end, args.k, args.tile_cols)
+        updates = [
+            UpdateOne(
+                {"_id": ids[row]},
+                {"$set": {
+                    "similarProducts": [
+                        {"productId": str(ids[neighbour]), "score": round(float(score), 6)}
+                        for neighbour, score in zip(neighbours[offset], scores[offset])
+                        if score > -np.inf
+                    ],
+                    "similarProductsUpdatedAt": read_at,
+                }},
+            )
+            for offset, row in enumerate(range(tile_start, tile_end))
+        ]
+        products.bulk_write(updates, ordered=False)
+        jobs.update_one({"_id": store_id}, {"$set": {"rows_done": tile_end}})
+
+        elapsed = time.perf_counter() - started
+        print(f"  Store {store_id}: {tile_end}/{len(ids)} products ({(tile_end - start_row) / elapsed:.0f}/s)")
+
+    jobs.update_one({"_id": store_id}, {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}})
+    return len(ids) - start_row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar products for every FluxCommerce product")
+    parser.add_argument("--store", action="append", help="Only this StoreId (repeatable); default: every store")
+    parser.add_argument("--k", type=int, default=20, help="Neighbours stored per product")
+    parser.add_argument("--tile-rows", type=int, default=1024, help="Products scored (and written) per tile")
+    parser.add_argument("--tile-cols", type=int, default=16384, help="Products compared against per matrix multiplication")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions")
+    parser.add_argument("--force", action="store_true", help="Recompute stores that are already up to date")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    args = parser.parse_args()
+
+    print("🔗 FluxCommerce Similar Products")
+    print("=" * 50)
+
+    client = pymongo.MongoClient(args.mongo_uri)
+    try:
+        db = client[DB_NAME]
+        store_ids = args.store or sorted(str(store_id) for store_id in db["Products"].distinct("StoreId", PRODUCT_FILTER) if store_id)
+        print(f"{len(store_ids)} store(s), top {args.k} neighbours per product")
+
+        started = time.perf_counter()
+        written = 0
+        for store_id in store_ids:
+            written += process_store(db, store_id, args) or 0
+        print(f"✅ Wrote similar products for {written} products in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Embedding inference backends for FluxCommerce
+PyTorch (sentence-transformers), ONNX Runtime, dynamically int8-quantized ONNX,
+the mock engine and a remote embedding service share one interface, so the
+service and the backfill scripts can switch between them by configuration.
+
+Heavy libraries (torch, sentence_transformers, onnxruntime, transformers,
+requests) are imported inside load(), so importing this module stays cheap.
+"""
+import json
+import logging
+import os
+import time
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_DIMENSIONS = 384
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx", "all-MiniLM-L6-v2")
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "onnx_config.json"
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKEND_MOCK = "mock"
+BACKEND_REMOTE = "remote"
+BACKENDS = [BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8, BACKEND_MOCK, BACKEND_REMOTE]
+
+
+class EmbeddingBackend:
+    """
+    Common interface for embedding backends.
+
+    encode() returns a (len(texts), dimensions) float32 array of
+    L2-normalized vectors, matching sentence-transformers' output for
+    all-MiniLM-L6-v2 (whose pipeline ends in a Normalize layer).
+    """
+
+    name = "base"
+
+    # Whether a loaded backend may be shared by processes forked afterwards
+    fork_safe = True
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, dimensions: int = DEFAULT_DIMENSIONS, num_threads: int = 0):
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.num_threads = num_threads
+        self.max_seq_length = 256
+        self.tokenizer = None
+        self.loaded = False
+        self.timings = {}
+
+    def load(self):
+        raise NotImplementedError
+
+    def warmup(self) -> float:
+        """
+        Run a dummy encode so the first real request does not pay for lazy
+        initialization (allocator growth, kernel selection, thread pools)
+        """
+        started = time.perf_counter()
+        self.encode(["warmup", "texto de calentamiento para el modelo de embeddings"])
+        self.timings["warmup_s"] = time.perf_counter() - started
+        return self.timings["warmup_s"]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token length of each text as the model will see it (after truncation)"""
+        if self.tokenizer is None:
+            # No tokenizer (mock, remote): words plus the two special tokens
+            return [min(len(text.split()) + 2, self.max_seq_length) for text in texts]
+        encoded = self.tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def model_id(self) -> str:
+        """
+        Id stored as embeddingModel with each vector; the same string
+        embedding_freshness.model_id_from_health() derives from /health
+        """
+        return f"{self.model_name}:{self.name}"
+
+    def close(self):
+        """Release connections held by the backend; nothing to do for in-process models"""
+
+    def describe(self) -> dict:
+        return {
+            "backend": self.name,
+            "model": self.model_name,
+            "dimensions": self.dimensions,
+            "loaded": self.loaded,
+            "timings": self.timings,
+        }
+
+
+class TorchBackend(EmbeddingBackend):
+    """
+    sentence-transformers model running on PyTorch. With model_path set the
+    model is loaded from that local directory (e.g. one written by
+    SentenceTransformer.save()), so startup needs no network access.
+    """
+
+    name = BACKEND_TORCH
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        dimensions: int = DEFAULT_DIMENSIONS,
+        num_threads: int = 0,
+        model_path: Optional[str] = None
+    ):
+        super().__init__(model_name, dimensions, num_threads)
+        self.model_path = model_path
+        self.model = None
+
+    def load(self):
+        started = time.perf_counter()
+        import torch
+        from sentence_transformers import SentenceTransformer
+        imported = time.perf_counter()
+
+        if self.num_threads > 0:
+            torch.set_num_threads(self.num_threads)
+
+        self.model = SentenceTransformer(self.model_path or self.model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.loaded = True
+        self.timings.update(import_s=imported - started, load_s=time.perf_counter() - imported)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=max(len(texts), 1), convert_to_tensor=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info["path"] = self.model_path or self.model_name
+        return info
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Transformer exported to ONNX (see export_onnx_model.py) running on ONNX
+    Runtime, with the sentence-transformers mean pooling and normalization
+    reimplemented in NumPy.
+    """
+
+    name = BACKEND_ONNX
+
+    # ONNX Runtime sessions own thread pools that do not survive fork()
+    fork_safe = False
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        dimensions: int = DEFAULT_DIMENSIONS,
+        num_threads: int = 0,
+        model_dir: str = DEFAULT_ONNX_DIR,
+        quantized: bool = False
+    ):
+        super().__init__(model_name, dimensions, num_threads)
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.session = None
+        self._input_names: List[str] = []
+        if quantized:
+            self.name = BACKEND_ONNX_INT8
+
+    @property
+    def model_path(self) -> str:
+        return os.path.join(self.model_dir, ONNX_INT8_MODEL_FILE if self.quantized else ONNX_MODEL_FILE)
+
+    def load(self):
+        started = time.perf_counter()
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        imported = time.perf_counter()
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found at {self.model_path}. Run: python export_onnx_model.py --output {self.model_dir}"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads > 0:
+            options.intra_op_num_threads = self.num_threads
+
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        config_path = os.path.join(self.model_dir, ONNX_CONFIG_FILE)
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as config_file:
+                config = json.load(config_file)
+            self.max_seq_length = config.get("max_seq_length", self.max_seq_length)
+            if config.get("model_name") and config["model_name"] != self.model_name:
+                logger.warning(f"ONNX model in {self.model_dir} was exported from {config['model_name']}, not {self.model_name}")
+        self.loaded = True
+        self.timings.update(import_s=imported - started, load_s=time.perf_counter() - imported)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = encoded["attention_mask"].astype(np.float32)[:, :, None]
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings = summed / counts
+        norms = np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return (embeddings / norms).astype(np.float32)
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info["path"] = self.model_path
+        return info
+
+
+class MockBackend(EmbeddingBackend):
+    """
+    The word-based mock engine (mock_embeddings.py): no model to load and
+    identical vectors in every process, for tests and development data
+    """
+
+    name = BACKEND_MOCK
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        from mock_embeddings import DIMENSIONS, MOCK_MODEL_ID
+        if dimensions != DIMENSIONS:
+            raise ValueError(f"The mock backend produces {DIMENSIONS}-dimensional vectors, not {dimensions}")
+        super().__init__(MOCK_MODEL_ID, dimensions)
+        self._embed_texts = None
+
+    def load(self):
+        started = time.perf_counter()
+        from mock_embeddings import embed_texts
+        self._embed_texts = embed_texts
+        self.loaded = True
+        self.timings.update(import_s=time.perf_counter() - started, load_s=0.0)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._embed_texts(texts)
+
+
+class RemoteBackend(EmbeddingBackend):
+    """
+    A running embedding service over HTTP: /embed_batch with binary float32
+    responses on a pooled keep-alive session, throttled by the adaptive rate
+    limiter of backfill_pipeline.py. The model id is the one the service
+    reports in /health, so vectors are tagged with the model that made them.
+    """
+
+    name = BACKEND_REMOTE
+
+    # The HTTP session's pooled sockets must not be shared with forked children
+    fork_safe = False
+
+    def __init__(
+        self,
+        url: str,
+        dimensions: int = DEFAULT_DIMENSIONS,
+        concurrency: int = 4,
+        target_latency: float = 2.0,
+        response_format: str = "f32",
+        timeout: float = 60
+    ):
+        super().__init__("remote", dimensions)
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.target_latency = target_latency
+        self.response_format = response_format
+        self.timeout = timeout
+        self.health = None
+        self.limiter = None
+        self.client = None
+
+    def fetch_health(self) -> dict:
+        import requests
+        response = requests.get(f"{self.url}/health", timeout=5)
+        response.raise_for_status()
+        self.health = response.json()
+        if not self.health.get("model_loaded", True):
+            raise RuntimeError(f"Embedding service at {self.url} has not loaded its model yet")
+        return self.health
+
+    def load(self):
+        started = time.perf_counter()
+        from backfill_pipeline import AdaptiveRateLimiter, EmbeddingClient
+        imported = time.perf_counter()
+
+        if self.health is None:
+            self.fetch_health()
+        self.limiter = AdaptiveRateLimiter(self.concurrency, self.target_latency)
+        self.client = EmbeddingClient(self.url, self.limiter, self.response_format, self.timeout)
+        self.loaded = True
+        self.timings.update(import_s=imported - started, load_s=time.perf_counter() - imported)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.client.embed(texts)
+
+    def model_id(self) -> str:
+        from embedding_freshness import model_id_from_health
+        return model_id_from_health(self.health if self.health is not None else self.fetch_health())
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info["url"] = self.url
+        if self.health is not None:
+            info["model"] = self.health.get("model")
+        if self.limiter is not None:
+            info["requests"] = self.limiter.stats()
+        return info
+
+
+def create_backend(
+    name: str,
+    model_name: str = DEFAULT_MODEL_NAME,
+    dimensions: int = DEFAULT_DIMENSIONS,
+    num_threads: int = 0,
+    onnx_dir: Optional[str] = None,
+    model_path: Optional[str] = None,
+    url: Optional[str] = None,
+    concurrency: int = 4,
+    target_latency: float = 2.0
+) -> EmbeddingBackend:
+    """
+    Build (but do not load) the backend selected by name. The remote
+    backend needs the service url; concurrency and target_latency tune its
+    rate limiter.
+    """
+    name = name.strip().lower()
+    if name == BACKEND_TORCH:
+        return TorchBackend(model_name, dimensions, num_threads, model_path=model_path)
+    if name in (BACKEND_ONNX, BACKEND_ONNX_INT8):
+        return OnnxBackend(
+            model_name,
+            dimensions,
+            num_threads,
+            model_dir=onnx_dir or DEFAULT_ONNX_DIR,
+            quantized=(name == BACKEND_ONNX_INT8)
+        )
+    if name == BACKEND_MOCK:
+        return MockBackend(dimensions)
+    if name == BACKEND_REMOTE:
+        if not url:
+            raise ValueError("The remote embedding backend needs the service url")
+        return RemoteBackend(url, dimensions, concurrency, target_latency)
+    raise ValueError(f"Unknown embedding backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """
+    Row-wise cosine similarity between two backends' outputs for the same texts
+    """
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    cosines = (reference * candidate).sum(axis=1)
+    return {
+        "texts": int(cosines.shape[0]),
+        "min": float(cosines.min()),
+        "mean": float(cosines.mean()),
+        "p01": float(np.percentile(cosines, 1)),
+    }
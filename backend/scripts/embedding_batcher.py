@@ -0,0 +1,190 @@
+"""
+Dynamic micro-batching for the FluxCommerce Embedding Service
+Collects concurrent single-text requests into one model.encode batch and
+splits large batches into length-bucketed, token-budgeted sub-batches
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Async callable that encodes a list of texts and returns one row per text
+EncodeFn = Callable[[List[str]], Awaitable[Any]]
+
+
+class MicroBatcher:
+    """
+    Async request queue that groups concurrent single-text encodes.
+
+    A batch is flushed as soon as it holds max_batch_size texts or the
+    oldest text in it has waited max_wait_ms, whichever comes first.
+    Each caller gets back its own row of the batch result.
+    """
+
+    def __init__(self, encode_fn: EncodeFn, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+        # Simple counters for /health
+        self.batches_flushed = 0
+        self.texts_encoded = 0
+
+    @property
+    def running(self) -> bool:
+        return self._collector is not None and not self._collector.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        """Start the collector task on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        """
+        Stop collecting and fail every request that was still waiting: the
+        partial batch the collector held when it was cancelled and whatever
+        is left in the queue. Batches already being encoded finish normally.
+        """
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            _fail_stopped(future)
+
+    async def submit(self, text: str) -> Any:
+        """Queue a single text and wait for its embedding row"""
+        if not self.running:
+            raise RuntimeError("Embedding batcher is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            try:
+                while len(batch) < self.max_batch_size:
+                    # Take whatever is already queued before waiting for more
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopped while filling a batch: these texts are off the queue, so stop() cannot see them
+                for _, future in batch:
+                    _fail_stopped(future)
+                raise
+
+            # Encode in the background so the next batch can start filling up
+            task = asyncio.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Callers that disconnected while queued do not need encoding
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await self.encode_fn(texts)
+        except Exception as e:
+            logger.error(f"Error encoding micro-batch of {len(texts)} texts: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_flushed += 1
+        self.texts_encoded += len(texts)
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "pending": self.pending,
+            "batches_flushed": self.batches_flushed,
+            "texts_encoded": self.texts_encoded,
+            "average_batch_size": (self.texts_encoded / self.batches_flushed) if self.batches_flushed else 0.0,
+        }
+
+
+def _fail_stopped(future: asyncio.Future):
+    if not future.done():
+        future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough word-piece count for when no tokenizer is available
+    (Spanish text averages about 1.3 word pieces per word, plus [CLS]/[SEP])
+    """
+    return int(len(text.split()) * 1.3) + 2
+
+
+def plan_sub_batches(lengths: List[int], token_budget: int) -> List[List[int]]:
+    """
+    Split a batch into sub-batches of similar length.
+
+    Indices are sorted by token length and grouped greedily so that the
+    padded size of each sub-batch (longest length * item count) stays
+    within token_budget. A text longer than the budget gets a sub-batch
+    of its own. Returns lists of original indices, so callers can put
+    each result row back in its original position.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    sub_batches: List[List[int]] = []
+    current: List[int] = []
+    for i in order:
+        longest = max(lengths[i], 1)  # sorted, so this text is the longest so far
+        if current and longest * (len(current) + 1) > token_budget:
+            sub_batches.append(current)
+            current = []
+        current.append(i)
+
+    if current:
+        sub_batches.append(current)
+    return sub_batches
@@ -0,0 +1,194 @@
+"""
+Content-addressed embedding cache for the FluxCommerce Embedding Service
+In-memory LRU tier with an optional SQLite tier that survives restarts
+"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text before hashing so trivially different inputs share a key
+    """
+    text = unicodedata.normalize("NFC", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(text: str, model_name: str) -> bytes:
+    """
+    Hash of the normalized text plus the model name
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.digest()
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embedding vectors bounded by memory size.
+
+    Vectors are stored as read-only float32 arrays keyed by cache_key().
+    When persist_path is set, every stored vector is also written to a
+    SQLite database and memory misses are looked up there before the
+    model is asked to encode the text.
+    """
+
+    def __init__(self, model_name: str, max_bytes: int = 64 * 1024 * 1024, persist_path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if persist_path:
+            self._open_db(persist_path)
+
+    def _open_db(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL)"
+        )
+        self._db.commit()
+        logger.info(f"Embedding cache persisted to {path}")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def ensure_open(self):
+        """Reopen the SQLite tier after close(), e.g. in a forked worker process"""
+        with self._lock:
+            if self.persist_path and self._db is None:
+                self._open_db(self.persist_path)
+
+    def key(self, text: str) -> bytes:
+        return cache_key(text, self.model_name)
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors for keys; misses are returned as None
+        """
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+            if missing and self._db is not None:
+                found = self._load_from_db([keys[i] for i in missing])
+                still_missing = []
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        self._insert(keys[i], vector)
+                        results[i] = vector
+                        self.disk_hits += 1
+                    else:
+                        still_missing.append(i)
+                missing = still_missing
+
+            self.misses += len(missing)
+
+        return results
+
+    def put_many(self, keys: List[bytes], vectors) -> None:
+        """
+        Store vectors (one row per key) in memory and, if enabled, on disk
+        """
+        rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self._insert(key, vector)
+                rows.append((key, self.model_name, int(vector.shape[0]), vector.tobytes()))
+
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                self._db.commit()
+
+    def _insert(self, key: bytes, vector: np.ndarray):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+
+        if vector.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _load_from_db(self, keys: List[bytes]) -> dict:
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                [self.model_name, *chunk]
+            )
+            for key, blob in cursor:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                found[bytes(key)] = vector
+        return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+            }
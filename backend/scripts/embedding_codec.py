@@ -0,0 +1,150 @@
+"""
+Wire formats for FluxCommerce embedding responses
+JSON stays the default; raw little-endian float32/float16 is available on request
+
+Binary layout (all little-endian):
+    4 bytes   magic b"FXEB"
+    1 byte    format version (1)
+    1 byte    dtype code (1 = float32, 2 = float16)
+    2 bytes   reserved (zero)
+    4 bytes   row count (uint32)
+    4 bytes   dimension (uint32)
+    rows * dimension * itemsize bytes of row-major vector data
+"""
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard json encoder
+    orjson = None
+
+BINARY_MAGIC = b"FXEB"
+BINARY_VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+
+FORMAT_JSON = "json"
+FORMAT_F32 = "f32"
+FORMAT_F16 = "f16"
+
+MEDIA_TYPES = {
+    FORMAT_JSON: "application/json",
+    FORMAT_F32: "application/x-embeddings-f32",
+    FORMAT_F16: "application/x-embeddings-f16",
+}
+
+_DTYPES = {
+    FORMAT_F32: (1, np.dtype("<f4")),
+    FORMAT_F16: (2, np.dtype("<f2")),
+}
+_DTYPES_BY_CODE = {code: dtype for code, dtype in _DTYPES.values()}
+
+_FORMAT_ALIASES = {
+    "json": FORMAT_JSON,
+    "f32": FORMAT_F32,
+    "float32": FORMAT_F32,
+    "f16": FORMAT_F16,
+    "float16": FORMAT_F16,
+}
+
+
+def negotiate_format(format_param: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    Pick the response format from the ?format= parameter or the Accept header.
+    The query parameter wins; anything unrecognised in Accept falls back to JSON.
+    Raises ValueError for an unknown ?format= value.
+    """
+    if format_param:
+        fmt = _FORMAT_ALIASES.get(format_param.strip().lower())
+        if fmt is None:
+            raise ValueError(f"Unsupported format '{format_param}'. Use one of: json, f32, f16")
+        return fmt
+
+    if accept:
+        for media_range in accept.split(","):
+            media_type = media_range.split(";")[0].strip().lower()
+            for fmt, known in MEDIA_TYPES.items():
+                if media_type == known:
+                    return fmt
+
+    return FORMAT_JSON
+
+
+def render_json(field: str, embeddings) -> bytes:
+    """
+    Render {field: vector} or {field: [[...], ...]} straight from numpy.
+
+    Vectors are widened to float64 before encoding so every number parses
+    back to exactly the value embedding.tolist() produced through the
+    pydantic response models. Without orjson the standard encoder is used
+    with the same separators as FastAPI's JSONResponse.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    if orjson is not None:
+        return orjson.dumps({field: matrix}, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(
+        {field: matrix.tolist()},
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_binary(embeddings, fmt: str = FORMAT_F32) -> bytes:
+    """
+    Pack a (rows, dim) array (or a single vector) into the binary wire format
+    """
+    code, dtype = _DTYPES[fmt]
+    matrix = np.asarray(embeddings)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1) if matrix.size else matrix.reshape(0, 0)
+    rows, dim = matrix.shape
+
+    header = HEADER.pack(BINARY_MAGIC, BINARY_VERSION, code, 0, rows, dim)
+    return header + np.ascontiguousarray(matrix, dtype=dtype).tobytes()
+
+
+def decode_binary(payload: bytes) -> np.ndarray:
+    """
+    Unpack the binary wire format into a (rows, dim) float32 array
+    """
+    if len(payload) < HEADER.size:
+        raise ValueError("Embedding payload is shorter than its header")
+
+    magic, version, code, _, rows, dim = HEADER.unpack_from(payload)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Embedding payload has an unknown magic number")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported embedding payload version {version}")
+    dtype = _DTYPES_BY_CODE.get(code)
+    if dtype is None:
+        raise ValueError(f"Unsupported embedding dtype code {code}")
+
+    expected = rows * dim * dtype.itemsize
+    if len(payload) - HEADER.size != expected:
+        raise ValueError(f"Embedding payload size mismatch: expected {expected} data bytes")
+
+    matrix = np.frombuffer(payload, dtype=dtype, offset=HEADER.size, count=rows * dim)
+    return matrix.reshape(rows, dim).astype(np.float32)
+
+
+def decode_embeddings_response(response) -> np.ndarray:
+    """
+    Decode a `requests` response from /embed, /embed_batch or /embeddings,
+    whichever format the service answered in, into a (rows, dim) float32 array.
+    An empty batch decodes to shape (0, 0), as in the binary format.
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type in (MEDIA_TYPES[FORMAT_F32], MEDIA_TYPES[FORMAT_F16]):
+        return decode_binary(response.content)
+
+    data = response.json()
+    if "embeddings" in data:
+        if not data["embeddings"]:
+            return np.zeros((0, 0), np.float32)
+        return np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["embeddings"]), -1)
+    return np.asarray([data["embedding"]], dtype=np.float32)
@@ -0,0 +1,163 @@
+"""
+Incremental re-embedding for the FluxCommerce embedding generators
+Each embedded product stores a hash of the text it was embedded from and
+the id of the model that embedded it, so later runs only embed products
+that are new, changed, embedded by another model, or whose last attempt
+failed and left the zero-vector fallback. A product whose hash is current
+but whose embedding is missing, empty or all zeros (a partial write, a
+migration, a manual $unset) is picked up as well.
+"""
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from embedding_storage import STORAGE_ARRAY, STORAGE_BINARY, decode_embedding, encode_embedding
+
+TEXT_HASH_FIELD = "embeddingTextHash"
+MODEL_FIELD = "embeddingModel"
+# When the vector was last written; the API compares it with similarProductsUpdatedAt
+EMBEDDED_AT_FIELD = "embeddingUpdatedAt"
+
+# Non-deleted products, as the generators have always selected them
+LIVE_PRODUCTS_FILTER = {
+    "$or": [
+        {"IsDeleted": {"$ne": True}},
+        {"IsDeleted": {"$exists": False}}
+    ]
+}
+
+EMBEDDING_DIMENSIONS = 384
+
+# Computed by the server for each scanned product, so the vector itself is never sent
+EMBEDDING_STATE_FIELD = "embeddingState"
+EMBEDDING_OK = "ok"
+EMBEDDING_EMPTY = "empty"
+EMBEDDING_MISSING = "missing"
+
+# "ok", or "empty" for an empty or all-zero array or packed vector, or "missing".
+# $anyElementTrue is false for [] and for arrays of zeros; a packed vector is
+# compared with the zero vector of the usual dimension (MongoDB 4.4+).
+EMBEDDING_STATE_EXPRESSION = {
+    "$switch": {
+        "branches": [
+            {
+                "case": {"$isArray": "$embedding"},
+                "then": {"$cond": [{"$anyElementTrue": ["$embedding"]}, EMBEDDING_OK, EMBEDDING_EMPTY]},
+            },
+            {
+                "case": {"$eq": [{"$type": "$embedding"}, "binData"]},
+                "then": {"$cond": [
+                    {"$or": [
+                        {"$lte": [{"$binarySize": "$embedding"}, 2]},
+                        {"$eq": ["$embedding", encode_embedding(np.zeros(EMBEDDING_DIMENSIONS, dtype=np.float32), STORAGE_BINARY)]},
+                    ]},
+                    EMBEDDING_EMPTY,
+                    EMBEDDING_OK,
+                ]},
+            },
+        ],
+        "default": EMBEDDING_MISSING,
+    }
+}
+
+# What a run needs to decide whether a product is stale (not the embedding itself)
+SCAN_PROJECTION = {
+    "Name": 1, "Description": 1, "Keywords": 1, TEXT_HASH_FIELD: 1, MODEL_FIELD: 1,
+    EMBEDDING_STATE_FIELD: EMBEDDING_STATE_EXPRESSION,
+}
+
+REASON_NEW = "new"
+REASON_CHANGED = "changed"
+REASON_MODEL = "model changed"
+REASON_NO_VECTOR = "missing vector"
+REASON_UNCHANGED = "unchanged"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_id_from_health(health: Dict[str, Any]) -> str:
+    """
+    "<model>:<backend>" from the service's /health, since int8 or ONNX
+    backends produce slightly different vectors than PyTorch
+    """
+    backend = health.get("backend")
+    if isinstance(backend, dict):
+        return f"{backend.get('model')}:{backend.get('backend')}"
+    return str(health.get("model") or "unknown")
+
+
+def stale_reason(product: Dict[str, Any], current_hash: str, model_id: str) -> str:
+    """
+    Why the product needs embedding, or REASON_UNCHANGED. Products that
+    have never been embedded, or whose last embedding failed, carry no hash.
+    The embedding's state comes from SCAN_PROJECTION; a product read
+    without it is judged by its hash and model only.
+    """
+    stored_hash = product.get(TEXT_HASH_FIELD)
+    if stored_hash is None:
+        return REASON_NEW
+    if product.get(EMBEDDING_STATE_FIELD, EMBEDDING_OK) != EMBEDDING_OK:
+        return REASON_NO_VECTOR
+    if stored_hash != current_hash:
+        return REASON_CHANGED
+    if product.get(MODEL_FIELD) != model_id:
+        return REASON_MODEL
+    return REASON_UNCHANGED
+
+
+def select_stale(
+    products: Iterable[Dict[str, Any]],
+    create_searchable_text,
+    model_id: str,
+    counts: Counter,
+    full: bool = False
+) -> Iterator[Tuple[Dict[str, Any], str, str]]:
+    """
+    Yield (product, searchable_text, text_hash) for each product that needs
+    embedding (every product with full), tallying the reasons in counts
+    """
+    for product in products:
+        searchable_text = create_searchable_text(product)
+        current_hash = text_hash(searchable_text)
+        reason = stale_reason(product, current_hash, model_id)
+        counts[reason] += 1
+        if full or reason != REASON_UNCHANGED:
+            yield product, searchable_text, current_hash
+
+
+def is_fallback(embedding: Any) -> bool:
+    """The [0.0] * 384 vector written when the embedding request failed"""
+    vector = decode_embedding(embedding)
+    return vector is None or not vector.size or not np.any(vector)
+
+
+def embedding_update(
+    searchable_text: str,
+    current_hash: str,
+    model_id: str,
+    embedding: List[float],
+    storage: str = STORAGE_ARRAY
+) -> Dict[str, Any]:
+    """
+    The $set/$unset for a freshly embedded product, with the embedding in
+    the given storage layout. A failed (zero) vector gets no hash, so the
+    next run retries it.
+    """
+    fields = {
+        "searchableText": searchable_text,
+        "embedding": encode_embedding(embedding, storage),
+        EMBEDDED_AT_FIELD: datetime.now(timezone.utc),
+    }
+    if is_fallback(embedding):
+        return {"$set": fields, "$unset": {TEXT_HASH_FIELD: "", MODEL_FIELD: ""}}
+    return {"$set": {**fields, TEXT_HASH_FIELD: current_hash, MODEL_FIELD: model_id}}
+
+
+def format_counts(counts: Counter) -> str:
+    order = [REASON_NEW, REASON_CHANGED, REASON_MODEL, REASON_NO_VECTOR, REASON_UNCHANGED]
+    return ", ".join(f"{counts.get(reason, 0)} {reason}" for reason in order)
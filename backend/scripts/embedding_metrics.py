@@ -0,0 +1,266 @@
+"""
+Prometheus-style metrics for the FluxCommerce embedding services
+A small dependency-free registry (counters, gauges, histograms) rendered in
+the Prometheus text exposition format, an ASGI middleware that times every
+request, and per-stage timers that can be echoed in a Server-Timing header.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+# Stage durations of the request being handled, for the Server-Timing header
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+_request_started: ContextVar[float] = ContextVar("request_started", default=0.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observation counts in cumulative buckets, plus their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket, one for +Inf, then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+
+        lines = []
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Gauge or counter whose value is read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.callback())}"]
+
+
+class MetricsRegistry:
+    """Holds the metrics of one process and renders them for /metrics"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, callback: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, "gauge"))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable[[], float]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, "counter"))
+
+    def render(self) -> bytes:
+        return ("\n".join(metric.render() for metric in self._metrics) + "\n").encode("utf-8")
+
+
+class ServiceMetrics:
+    """
+    The metric set shared by embedding_service.py and mock_embedding_service.py:
+    request latency per endpoint, per-stage durations, model batch sizes and
+    texts embedded. Services add their own queue depth / cache gauges.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        self.request_seconds = self.registry.histogram(
+            "embedding_request_duration_seconds",
+            "Request latency by endpoint, method and status code",
+            ("endpoint", "method", "status"),
+        )
+        self.stage_seconds = self.registry.histogram(
+            "embedding_stage_duration_seconds",
+            "Time spent in each processing stage (parse, encode, tokenize, inference, serialize)",
+            ("stage",),
+        )
+        self.batch_size = self.registry.histogram(
+            "embedding_batch_size",
+            "Texts per model encode call",
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.texts = self.registry.counter(
+            "embedding_texts_total",
+            "Texts embedded, by endpoint (rate() gives texts per second)",
+            ("endpoint",),
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as one processing stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - started)
+
+    def record_stage(self, name: str, seconds: float):
+        self.stage_seconds.observe(seconds, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def mark_parsed(self):
+        """
+        Call first thing in a handler: the time since the request arrived is
+        body parsing and validation
+        """
+        started = _request_started.get()
+        if started:
+            self.record_stage("parse", time.perf_counter() - started)
+
+    def render(self) -> bytes:
+        return self.registry.render()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records request latency per route and, when
+    server_timing is on, adds a Server-Timing header with the stages
+    recorded before the response started.
+
+    A plain ASGI middleware rather than BaseHTTPMiddleware, so streaming
+    request and response bodies pass through untouched.
+    """
+
+    def __init__(self, app, metrics: ServiceMetrics, server_timing: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stages: Dict[str, float] = {}
+        stages_token = _request_stages.set(stages)
+        started_token = _request_started.set(started)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    stages["total"] = time.perf_counter() - started
+                    timing = ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stages.reset(stages_token)
+            _request_started.reset(started_token)
+            # Route templates keep label cardinality bounded; unmatched paths share one label
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            self.metrics.request_seconds.observe(
+                time.perf_counter() - started,
+                endpoint=endpoint,
+                method=scope.get("method", ""),
+                status=str(status),
+            )
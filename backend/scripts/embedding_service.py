@@ -1,15 +1,38 @@
 """
 FastAPI Embedding Service for FluxCommerce
-Uses sentence-transformers for generating text embeddings
+Generates text embeddings with sentence-transformers on PyTorch, ONNX Runtime
+or an int8-quantized ONNX model (see embedding_backends.py)
+
+Heavy libraries are imported by the backend while the model loads in the
+background, so the process answers /livez right away and /readyz once the
+model has loaded and warmed up.
 """
-from fastapi import FastAPI, HTTPException
+import time
+
+_process_started = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List
+from typing import List, Optional
+import asyncio
 import logging
+import os
 import uvicorn
 
+from embedding_backends import BACKEND_TORCH, create_backend
+from embedding_batcher import MicroBatcher, plan_sub_batches
+from embedding_cache import EmbeddingCache
+from embedding_codec import FORMAT_JSON, MEDIA_TYPES, encode_binary, negotiate_format, render_json
+from embedding_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, ServiceMetrics
+from embedding_snapshot import SnapshotError, load_snapshot, model_name_of, stale_reason
+from embedding_stream import DuplexStreamingResponse, stream_embeddings
+from embedding_workers import can_fork, default_threads_per_worker, serve_preforked
+from inference_pool import InferencePool
+from keyword_index import KeywordIndex, hybrid_rank
+from vector_index import VectorIndex
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,8 +40,170 @@ logger = logging.getLogger(__name__)
 # Initialize FastAPI app
 app = FastAPI(title="FluxCommerce Embedding Service", version="1.0.0")
 
-# Global model variable
-model = None
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+EMBEDDING_DIMENSIONS = 384
+
+# Inference backend: torch, onnx or onnx-int8 (ONNX models come from export_onnx_model.py),
+# or mock for the model-free test engine
+BACKEND_NAME = os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH)
+ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "")
+
+# Local sentence-transformers model directory (torch backend); avoids any Hub download at startup
+MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "")
+
+# Micro-batching of concurrent /embed calls
+MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+
+# Threads that run model inference off the event loop
+INFERENCE_WORKERS = int(os.getenv("EMBEDDING_INFERENCE_WORKERS", "1"))
+
+# Server processes forked after the model is preloaded, and intra-op threads per process
+# (0 = library default with one process, cores split evenly between processes otherwise)
+HOST = os.getenv("EMBEDDING_HOST", "0.0.0.0")
+PORT = int(os.getenv("EMBEDDING_PORT", "8000"))
+WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0")) or (default_threads_per_worker(WORKERS) if WORKERS > 1 else 0)
+
+# Embedding cache (memory bound in MB, optional SQLite file for persistence)
+CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "64"))
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+# Padded tokens (longest text * texts) per model forward pass
+TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "8192"))
+
+# Request size limits, rejected with 413 before any encoding starts
+MAX_REQUEST_TEXTS = int(os.getenv("EMBEDDING_MAX_REQUEST_TEXTS", "2048"))
+MAX_REQUEST_CHARS = int(os.getenv("EMBEDDING_MAX_REQUEST_CHARS", "2000000"))
+
+# Records encoded per chunk by /embed_stream
+STREAM_CHUNK_SIZE = int(os.getenv("EMBEDDING_STREAM_CHUNK_SIZE", "256"))
+
+# Serialize JSON responses straight from numpy instead of through pydantic models
+FAST_JSON = os.getenv("EMBEDDING_FAST_JSON", "1") != "0"
+
+# Product search index, loaded from the Products collection at startup
+SEARCH_INDEX = os.getenv("EMBEDDING_SEARCH_INDEX", "1") != "0"
+MONGO_URI = os.getenv("EMBEDDING_MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB = os.getenv("EMBEDDING_MONGO_DB", "FluxCommerce")
+MAX_SEARCH_K = 1000
+
+# Memory-mapped snapshot (embedding_snapshot.py export) to load the vectors from instead of MongoDB
+SNAPSHOT_PATH = os.getenv("EMBEDDING_SNAPSHOT_PATH", "")
+# Check the snapshot's SHA-256 before using it (reads the whole file)
+SNAPSHOT_VERIFY = os.getenv("EMBEDDING_SNAPSHOT_VERIFY", "0") != "0"
+# Compare the snapshot's fingerprint with the catalog before using it (reads _id, hash and model of every product)
+SNAPSHOT_CHECK = os.getenv("EMBEDDING_SNAPSHOT_CHECK", "0") != "0"
+
+# Hybrid search blends cosine and BM25 over this many candidates per requested result
+HYBRID_CANDIDATE_MULTIPLIER = 5
+HYBRID_MIN_CANDIDATES = 50
+
+# Approximate (IVF) search for stores with at least this many products; 0 disables it
+ANN_MIN_PRODUCTS = int(os.getenv("EMBEDDING_ANN_MIN_PRODUCTS", "50000"))
+ANN_NLIST = int(os.getenv("EMBEDDING_ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("EMBEDDING_ANN_NPROBE", "16"))
+# Directory for trained clusters, reused on the next start instead of re-running k-means
+ANN_PATH = os.getenv("EMBEDDING_ANN_PATH") or None
+
+# Log a line (with a text preview) per request; turn off at high request rates
+LOG_REQUESTS = os.getenv("EMBEDDING_LOG_REQUESTS", "1") != "0"
+
+# Add a Server-Timing header with per-stage durations to every response
+SERVER_TIMING = os.getenv("EMBEDDING_SERVER_TIMING", "0") != "0"
+
+metrics = ServiceMetrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics, server_timing=SERVER_TIMING)
+
+# Global inference backend, set once it has loaded and warmed up
+backend = None
+
+# Backend loaded by the parent process before forking workers (see preload_backend)
+preloaded = None
+
+# Startup progress for /livez, /readyz and /health: starting -> ready | failed
+startup = {"state": "starting", "error": None, "timings": {}}
+load_task: Optional[asyncio.Task] = None
+
+inference_pool = InferencePool(max_workers=INFERENCE_WORKERS)
+
+def _encode_blocking(texts: List[str]) -> np.ndarray:
+    # Group texts of similar length so short product names do not pay
+    # padding up to the longest description, then restore input order
+    with metrics.stage("tokenize"):
+        sub_batches = plan_sub_batches(backend.count_tokens(texts), TOKEN_BUDGET)
+
+    with metrics.stage("inference"):
+        if len(sub_batches) == 1:
+            return backend.encode(texts)
+
+        embeddings = np.empty((len(texts), EMBEDDING_DIMENSIONS), dtype=np.float32)
+        for indices in sub_batches:
+            embeddings[indices] = backend.encode([texts[i] for i in indices])
+        return embeddings
+
+async def encode_texts(texts: List[str]) -> np.ndarray:
+    """Encode a list of texts with the loaded model on the inference pool"""
+    metrics.batch_size.observe(len(texts))
+    return await inference_pool.run(_encode_blocking, texts)
+
+batcher = MicroBatcher(encode_texts, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+
+# Backends produce slightly different vectors, so each gets its own cache namespace
+cache = EmbeddingCache(f"{MODEL_NAME}:{BACKEND_NAME}", max_bytes=int(CACHE_MAX_MB * 1024 * 1024), persist_path=CACHE_PATH or None)
+
+# Queue depth and cache counters, read when /metrics is scraped
+metrics.registry.gauge_callback("embedding_model_ready", "1 once the model is loaded and warmed up", lambda: backend is not None)
+metrics.registry.gauge_callback("embedding_batcher_pending", "Single-text requests waiting for a micro-batch", lambda: batcher.pending)
+metrics.registry.gauge_callback("embedding_inference_queued", "Encode jobs waiting for an inference worker", lambda: inference_pool.queued)
+metrics.registry.gauge_callback("embedding_inference_running", "Encode jobs running on an inference worker", lambda: inference_pool.running)
+metrics.registry.counter_callback("embedding_cache_hits_total", "Texts answered from the memory or SQLite cache", lambda: cache.hits + cache.disk_hits)
+metrics.registry.counter_callback("embedding_cache_misses_total", "Texts the model had to encode", lambda: cache.misses)
+metrics.registry.counter_callback("embedding_cache_evictions_total", "Vectors evicted from the memory cache", lambda: cache.evictions)
+
+# Per-store product embedding matrices for /search
+vector_index = VectorIndex(
+    EMBEDDING_DIMENSIONS,
+    ann_min_products=ANN_MIN_PRODUCTS,
+    ann_nlist=ANN_NLIST,
+    ann_nprobe=ANN_NPROBE,
+    ann_dir=ANN_PATH,
+)
+keyword_index = KeywordIndex()
+search_state = {"state": "loading" if SEARCH_INDEX else "disabled", "error": None, "source": None}
+index_task: Optional[asyncio.Future] = None
+
+metrics.registry.gauge_callback("embedding_search_index_products", "Products in the in-memory search index", lambda: vector_index.stats()["products"])
+
+async def embed_text(text: str) -> np.ndarray:
+    """Embed a single text through the cache and the micro-batcher"""
+    key = cache.key(text)
+    embedding = cache.get_many([key])[0]
+    if embedding is None:
+        embedding = await batcher.submit(text)
+        cache.put_many([key], [embedding])
+    return embedding
+
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed texts through the cache, encoding each distinct miss only once"""
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIMENSIONS), dtype=np.float32)
+
+    keys = [cache.key(text) for text in texts]
+    embeddings = cache.get_many(keys)
+
+    missing = {}
+    for key, text, embedding in zip(keys, texts, embeddings):
+        if embedding is None and key not in missing:
+            missing[key] = text
+
+    if missing:
+        encoded = await encode_texts(list(missing.values()))
+        cache.put_many(list(missing.keys()), encoded)
+        fresh = dict(zip(missing.keys(), encoded))
+        embeddings = [fresh[key] if embedding is None else embedding for key, embedding in zip(keys, embeddings)]
+
+    return np.stack(embeddings)
 
 class EmbeddingRequest(BaseModel):
     text: str
@@ -32,38 +217,277 @@ class EmbeddingResponse(BaseModel):
 class BatchEmbeddingResponse(BaseModel):
     embeddings: List[List[float]]
 
-@app.on_event("startup")
-async def load_model():
-    """Load the sentence transformer model on startup"""
-    global model
+class SearchRequest(BaseModel):
+    store_id: str
+    query: Optional[str] = None
+    vector: Optional[List[float]] = None
+    k: int = 10
+    exclude: List[str] = []
+    nprobe: Optional[int] = None
+    exact: bool = False
+    hybrid: bool = False
+    keyword_weight: float = 0.3
+
+class SearchResult(BaseModel):
+    product_id: str
+    score: float
+    vector_score: Optional[float] = None
+    keyword_score: Optional[float] = None
+    matching_terms: Optional[List[str]] = None
+
+class ProductUpdate(BaseModel):
+    store_id: str
+    product_id: str
+    text: Optional[str] = None
+    vector: Optional[List[float]] = None
+    deleted: bool = False
+
+class SearchResponse(BaseModel):
+    store_id: str
+    results: List[SearchResult]
+
+def check_request_size(texts: List[str]):
+    """Reject oversized requests with a clear 413 instead of exhausting memory"""
+    if len(texts) > MAX_REQUEST_TEXTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request has {len(texts)} texts; the limit is {MAX_REQUEST_TEXTS} per request. Split it into smaller batches."
+        )
+    total_chars = sum(len(text) for text in texts)
+    if total_chars > MAX_REQUEST_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request has {total_chars} characters of text; the limit is {MAX_REQUEST_CHARS} per request. Split it into smaller batches."
+        )
+
+def resolve_format(response_format: Optional[str], accept: Optional[str]) -> str:
+    """Pick json/f32/f16 from ?format= or the Accept header"""
+    try:
+        return negotiate_format(response_format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def binary_response(embeddings: np.ndarray, fmt: str) -> Response:
+    """Raw little-endian vectors with a row count/dimension header"""
+    return Response(content=encode_binary(embeddings, fmt), media_type=MEDIA_TYPES[fmt])
+
+def json_response(field: str, embeddings: np.ndarray) -> Response:
+    """Pre-rendered JSON body, skipping per-element pydantic validation"""
+    return Response(content=render_json(field, embeddings), media_type=MEDIA_TYPES[FORMAT_JSON])
+
+def require_model():
+    """Answer 503 until the model has loaded and warmed up"""
+    if backend is None:
+        if startup["state"] == "failed":
+            raise HTTPException(status_code=503, detail=f"Model failed to load: {startup['error']}")
+        raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "5"})
+
+def require_search_index():
+    """Answer 503 until the product index has loaded from MongoDB"""
+    if search_state["state"] == "disabled":
+        raise HTTPException(status_code=503, detail="Search index is disabled (EMBEDDING_SEARCH_INDEX=0)")
+    if not vector_index.loaded:
+        if search_state["state"] == "failed":
+            raise HTTPException(status_code=503, detail=f"Search index failed to load: {search_state['error']}")
+        raise HTTPException(status_code=503, detail="Search index is still loading", headers={"Retry-After": "5"})
+
+def load_search_index():
+    """Load every product embedding and searchable text from MongoDB into the in-memory indexes (blocking)"""
+    import pymongo
+
+    search_state["state"] = "loading"
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
     try:
-        logger.info("Loading sentence transformer model...")
-        model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        logger.info("Model loaded successfully!")
+        products = client[MONGO_DB]["Products"]
+        if SNAPSHOT_PATH and load_vector_snapshot(products):
+            search_state["source"] = "snapshot"
+        else:
+            vector_index.load_from_mongo(products)
+            search_state["source"] = "mongo"
+        keyword_index.load_from_mongo(products)
+        search_state["state"] = "ready"
+        search_state["error"] = None
+    except Exception as e:
+        logger.error(f"Failed to load the search index: {e}")
+        search_state["state"] = "failed"
+        search_state["error"] = str(e)
+    finally:
+        client.close()
+
+def load_vector_snapshot(products) -> bool:
+    """
+    Map the vectors from EMBEDDING_SNAPSHOT_PATH; False when it is missing,
+    for another model or, with EMBEDDING_SNAPSHOT_CHECK, stale
+    """
+    configured = configured_backend()
+    try:
+        snapshot = load_snapshot(
+            SNAPSHOT_PATH, model_name_of([configured.model_id()]), configured.dimensions, verify=SNAPSHOT_VERIFY
+        )
+    except SnapshotError as e:
+        logger.warning(f"Not using the embedding snapshot: {e}")
+        return False
+    if SNAPSHOT_CHECK:
+        reason = stale_reason(snapshot.manifest, products)
+        if reason:
+            logger.warning(f"Embedding snapshot at {SNAPSHOT_PATH} is stale ({reason}); loading from MongoDB instead")
+            return False
+    vector_index.load_snapshot(snapshot)
+    checked = "checked against the catalog" if SNAPSHOT_CHECK else "not checked against the catalog"
+    logger.info(f"Search index mapped from snapshot {SNAPSHOT_PATH} (created {snapshot.manifest['created_at']}, {checked})")
+    return True
+
+def search_index_stats() -> dict:
+    """Search index state with the vector and keyword index sizes"""
+    return {**search_state, **vector_index.stats(), "keywords": keyword_index.stats()}
+
+def build_backend():
+    """Create (but do not load) the configured backend"""
+    return create_backend(
+        BACKEND_NAME,
+        MODEL_NAME,
+        EMBEDDING_DIMENSIONS,
+        num_threads=NUM_THREADS,
+        onnx_dir=ONNX_DIR or None,
+        model_path=MODEL_PATH or None
+    )
+
+def configured_backend():
+    """The loaded backend, or the configured one (not loaded) while it is still loading"""
+    return backend or preloaded or build_backend()
+
+def preload_backend():
+    """
+    Load the model and the search index in the parent process so forked
+    workers share their pages. Warmup runs in each worker, since inference
+    thread pools do not survive fork().
+    """
+    global preloaded
+    # Each worker opens its own SQLite connection
+    cache.close()
+
+    selected = build_backend()
+    if selected.fork_safe:
+        logger.info(f"Preloading {MODEL_NAME} on the '{BACKEND_NAME}' backend...")
+        selected.load()
+        preloaded = selected
+    else:
+        logger.info(f"The '{BACKEND_NAME}' backend cannot be shared across fork(); each worker loads its own copy")
+
+    if SEARCH_INDEX:
+        load_search_index()
+
+async def load_backend():
+    """Load and warm up the backend off the event loop, then mark the service ready"""
+    global backend
+    loop = asyncio.get_running_loop()
+    try:
+        selected = preloaded or build_backend()
+        if not selected.loaded:
+            logger.info(f"Loading {MODEL_NAME} on the '{BACKEND_NAME}' backend...")
+            await loop.run_in_executor(None, selected.load)
+        await loop.run_in_executor(None, selected.warmup)
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
-        raise e
+        startup["state"] = "failed"
+        startup["error"] = str(e)
+        return
+
+    backend = selected
+    startup["timings"].update(selected.timings)
+    startup["timings"]["ready_s"] = time.perf_counter() - _process_started
+    startup["state"] = "ready"
+    logger.info(
+        "Model ready: import {import_s:.2f}s, load {load_s:.2f}s, warmup {warmup_s:.2f}s, "
+        "{ready_s:.2f}s since process start".format(**startup["timings"])
+    )
+
+@app.on_event("startup")
+async def load_model():
+    """Start serving immediately and load the inference backend in the background"""
+    global load_task, index_task
+    startup["timings"]["app_import_s"] = time.perf_counter() - _process_started
+    cache.ensure_open()
+    inference_pool.start()
+    batcher.start()
+    logger.info(f"Inference pool started with {INFERENCE_WORKERS} worker(s)")
+    logger.info(f"Micro-batching enabled (max_batch_size={MAX_BATCH_SIZE}, max_wait_ms={MAX_WAIT_MS})")
+    load_task = asyncio.create_task(load_backend())
+    if SEARCH_INDEX and not vector_index.loaded:
+        index_task = asyncio.get_running_loop().run_in_executor(None, load_search_index)
+
+@app.on_event("shutdown")
+async def stop_inference():
+    """Flush in-flight micro-batches and stop the inference pool"""
+    if load_task is not None and not load_task.done():
+        load_task.cancel()
+    await batcher.stop()
+    inference_pool.shutdown()
+    cache.close()
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up; fails only if the model can never load"""
+    if startup["state"] == "failed":
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup["error"]})
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: 200 only once the model is loaded and warmed up"""
+    content = {"status": startup["state"], "error": startup["error"], "timings": startup["timings"]}
+    return JSONResponse(status_code=200 if backend is not None else 503, content=content)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    return {
+        "status": "healthy" if backend is not None else startup["state"],
+        "model_loaded": backend is not None,
+        "startup": {"state": startup["state"], "error": startup["error"], "timings": startup["timings"]},
+        "backend": backend.describe() if backend is not None else None,
+        "process": {"pid": os.getpid(), "workers": WORKERS, "num_threads": NUM_THREADS},
+        "search_index": search_index_stats(),
+        "batching": batcher.stats(),
+        "inference_pool": inference_pool.stats(),
+        "cache": cache.stats()
+    }
 
 @app.post("/embed", response_model=EmbeddingResponse)
-async def generate_embedding(request: EmbeddingRequest):
+async def generate_embedding(
+    request: EmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """Generate embedding for a single text"""
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    metrics.mark_parsed()
+    require_model()
+    
+    check_request_size([request.text])
+    fmt = resolve_format(response_format, accept)
     
     try:
-        # Generate embedding
-        embedding = model.encode(request.text, convert_to_tensor=False)
+        # Generate embedding (grouped with concurrent requests into one batch)
+        with metrics.stage("encode"):
+            embedding = await embed_text(request.text)
+        metrics.texts.inc(1, endpoint="/embed")
+        
+        if fmt != FORMAT_JSON:
+            if LOG_REQUESTS:
+                logger.info(f"Generated embedding for text: '{request.text[:50]}...' ({fmt})")
+            with metrics.stage("serialize"):
+                return binary_response(embedding, fmt)
+        
+        if LOG_REQUESTS:
+            logger.info(f"Generated embedding for text: '{request.text[:50]}...'")
+        
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embedding", embedding)
         
         # Convert to list of floats
         embedding_list = embedding.tolist()
         
-        logger.info(f"Generated embedding for text: '{request.text[:50]}...'")
-        
         return EmbeddingResponse(embedding=embedding_list)
     
     except Exception as e:
@@ -71,35 +495,241 @@ async def generate_embedding(request: EmbeddingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/embed_batch", response_model=BatchEmbeddingResponse)
-async def generate_embeddings_batch(request: BatchEmbeddingRequest):
+async def generate_embeddings_batch(
+    request: BatchEmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """Generate embeddings for multiple texts"""
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+    metrics.mark_parsed()
+    require_model()
+    
+    check_request_size(request.texts)
+    fmt = resolve_format(response_format, accept)
     
     try:
         # Generate embeddings for all texts
-        embeddings = model.encode(request.texts, convert_to_tensor=False)
+        with metrics.stage("encode"):
+            embeddings = await embed_texts(request.texts)
+        metrics.texts.inc(len(request.texts), endpoint="/embed_batch")
+        
+        if fmt != FORMAT_JSON:
+            if LOG_REQUESTS:
+                logger.info(f"Generated embeddings for {len(request.texts)} texts ({fmt})")
+            with metrics.stage("serialize"):
+                return binary_response(embeddings, fmt)
+        
+        if LOG_REQUESTS:
+            logger.info(f"Generated embeddings for {len(request.texts)} texts")
+        
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embeddings", embeddings)
         
         # Convert to list of lists
         embeddings_list = [emb.tolist() for emb in embeddings]
         
-        logger.info(f"Generated embeddings for {len(request.texts)} texts")
-        
         return BatchEmbeddingResponse(embeddings=embeddings_list)
     
     except Exception as e:
         logger.error(f"Error generating batch embeddings: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/embeddings", response_model=BatchEmbeddingResponse)
+async def generate_embeddings(
+    request: BatchEmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
+    """Generate embeddings for multiple texts (FluxCommerce backend compatible endpoint)"""
+    metrics.mark_parsed()
+    require_model()
+    
+    check_request_size(request.texts)
+    fmt = resolve_format(response_format, accept)
+    
+    try:
+        with metrics.stage("encode"):
+            embeddings = await embed_texts(request.texts)
+        metrics.texts.inc(len(request.texts), endpoint="/embeddings")
+        
+        if fmt != FORMAT_JSON:
+            if LOG_REQUESTS:
+                logger.info(f"Generated embeddings for {len(request.texts)} texts via /embeddings endpoint ({fmt})")
+            with metrics.stage("serialize"):
+                return binary_response(embeddings, fmt)
+        
+        if LOG_REQUESTS:
+            logger.info(f"Generated embeddings for {len(request.texts)} texts via /embeddings endpoint")
+        
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embeddings", embeddings)
+        
+        embeddings_list = [emb.tolist() for emb in embeddings]
+        
+        return BatchEmbeddingResponse(embeddings=embeddings_list)
+    
+    except Exception as e:
+        logger.error(f"Error generating embeddings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/embed_stream")
+async def generate_embeddings_stream(request: Request):
+    """
+    Stream embeddings for a chunked NDJSON upload of {"id": ..., "text": ...}
+    records. Results come back as {"id": ..., "embedding": [...]} lines as
+    each chunk of EMBEDDING_STREAM_CHUNK_SIZE records is encoded.
+    """
+    require_model()
+    
+    if LOG_REQUESTS:
+        logger.info("Started embedding stream")
+    
+    async def embed_chunk(texts: List[str]) -> np.ndarray:
+        metrics.texts.inc(len(texts), endpoint="/embed_stream")
+        return await embed_texts(texts)
+    
+    return DuplexStreamingResponse(
+        stream_embeddings(request.stream(), embed_chunk, STREAM_CHUNK_SIZE, MAX_REQUEST_CHARS)
+    )
+
+@app.post("/search", response_model=SearchResponse, response_model_exclude_none=True)
+async def search_products(request: SearchRequest):
+    """
+    Top-k products of one store by cosine similarity to a text query or a
+    query vector, from the in-memory per-store embedding matrix. With
+    hybrid, the text query is also matched against the keyword index and
+    both candidate lists are blended by keyword_weight.
+    """
+    metrics.mark_parsed()
+    require_search_index()
+    
+    if (request.query is None) == (request.vector is None):
+        raise HTTPException(status_code=400, detail="Send exactly one of 'query' or 'vector'")
+    if not 1 <= request.k <= MAX_SEARCH_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_SEARCH_K}")
+    if request.nprobe is not None and request.nprobe < 1:
+        raise HTTPException(status_code=400, detail="nprobe must be at least 1")
+    if request.hybrid and request.query is None:
+        raise HTTPException(status_code=400, detail="Hybrid search needs a text 'query'")
+    if not 0.0 <= request.keyword_weight <= 1.0:
+        raise HTTPException(status_code=400, detail="keyword_weight must be between 0 and 1")
+    
+    if request.query is not None:
+        require_model()
+        check_request_size([request.query])
+        with metrics.stage("encode"):
+            query_vector = await embed_text(request.query)
+    else:
+        query_vector = request.vector
+    
+    try:
+        with metrics.stage("search"):
+            if request.hybrid:
+                results = hybrid_search(request, query_vector)
+            else:
+                results = [
+                    {"product_id": product_id, "score": score}
+                    for product_id, score in vector_index.search(
+                        request.store_id, query_vector, request.k, request.exclude, request.nprobe, request.exact
+                    )
+                ]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if LOG_REQUESTS:
+        logger.info(f"Search in store {request.store_id} returned {len(results)} products")
+    
+    return {"store_id": request.store_id, "results": results}
+
+def hybrid_search(request: SearchRequest, query_vector) -> List[dict]:
+    """
+    Blend the vector and BM25 candidate lists: candidates found by only one
+    index are scored by the other one directly, so no full scan is needed
+    """
+    candidates = max(request.k * HYBRID_CANDIDATE_MULTIPLIER, HYBRID_MIN_CANDIDATES)
+    vector_scores = dict(vector_index.search(
+        request.store_id, query_vector, candidates, request.exclude, request.nprobe, request.exact
+    ))
+    keyword_scores = dict(keyword_index.search(request.store_id, request.query, candidates, request.exclude))
+    
+    keyword_only = [product_id for product_id in keyword_scores if product_id not in vector_scores]
+    vector_scores.update(vector_index.scores(request.store_id, query_vector, keyword_only))
+    vector_only = [product_id for product_id in vector_scores if product_id not in keyword_scores]
+    keyword_scores.update(keyword_index.score(request.store_id, request.query, vector_only))
+    
+    return [
+        {
+            "product_id": product_id,
+            "score": score,
+            "vector_score": vector_score,
+            "keyword_score": keyword_score,
+            "matching_terms": keyword_index.matching_terms(request.store_id, request.query, product_id),
+        }
+        for product_id, score, vector_score, keyword_score in hybrid_rank(
+            vector_scores, keyword_scores, request.k, request.keyword_weight
+        )
+    ]
+
+@app.post("/search/products")
+async def update_search_products(updates: List[ProductUpdate]):
+    """
+    Apply product changes to the search indexes without a full reload:
+    new or edited products (text and/or vector) and deleted ones
+    """
+    require_search_index()
+    for update in updates:
+        if update.deleted:
+            vector_index.remove(update.product_id)
+            keyword_index.remove(update.product_id)
+            continue
+        if update.vector is not None:
+            vector_index.upsert(update.store_id, update.product_id, update.vector)
+        if update.text is not None:
+            keyword_index.upsert(update.store_id, update.product_id, update.text)
+    return {"updated": len(updates), **search_index_stats()}
+
+@app.post("/search/reload")
+async def reload_search_index():
+    """Reload the search index from MongoDB (e.g. after a bulk embedding run)"""
+    if search_state["state"] == "disabled":
+        raise HTTPException(status_code=503, detail="Search index is disabled (EMBEDDING_SEARCH_INDEX=0)")
+    await asyncio.get_running_loop().run_in_executor(None, load_search_index)
+    return search_index_stats()
+
+@app.get("/search/stats")
+async def search_stats():
+    """Search index size, memory and load time"""
+    return search_index_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text-format metrics for this process"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Embedding cache hit/miss/eviction counters"""
+    return cache.stats()
+
 @app.get("/")
 async def root():
     """Root endpoint with basic info"""
+    configured = configured_backend()
     return {
         "message": "FluxCommerce Embedding Service",
-        "model": "sentence-transformers/all-MiniLM-L6-v2",
-        "dimensions": 384,
-        "endpoints": ["/embed", "/embed_batch", "/health"]
+        "model": configured.model_id(),
+        "backend": BACKEND_NAME,
+        "dimensions": configured.dimensions,
+        "formats": list(MEDIA_TYPES.keys()),
+        "endpoints": ["/embed", "/embed_batch", "/embeddings", "/embed_stream", "/search", "/search/products", "/search/reload", "/search/stats", "/cache/stats", "/metrics", "/health", "/livez", "/readyz"]
     }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if WORKERS > 1 and can_fork():
+        serve_preforked(app, HOST, PORT, WORKERS, preload_backend)
+    else:
+        if WORKERS > 1:
+            logger.warning("EMBEDDING_WORKERS needs fork() (Linux/macOS); serving with a single process")
+        uvicorn.run(app, host=HOST, port=PORT)
\ No newline at end of file
@@ -0,0 +1,313 @@
+"""
+Memory-mapped embedding snapshots for the FluxCommerce search index
+Exports every product embedding from MongoDB into a directory holding:
+
+  vectors.npy    contiguous L2-normalized float32 rows, grouped by store
+  products.npz   product ids in row order, store ids and each store's first row
+  manifest.json  model name, dimensions, counts, a SHA-256 of the above
+                 and a fingerprint of the catalog the vectors came from
+
+Loading maps vectors.npy read-only, so the index is ready in milliseconds
+and every process that maps the same file shares its pages. The catalog
+fingerprint covers each product's _id, embeddingTextHash and
+embeddingModel, so a snapshot is refused once any product has been
+re-embedded, edited or embedded by another model since the export.
+
+Usage:
+  python embedding_snapshot.py export <dir> [--model NAME]   (default: the model of the stored vectors)
+  python embedding_snapshot.py info <dir>
+  python embedding_snapshot.py verify <dir>
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from embedding_freshness import MODEL_FIELD, TEXT_HASH_FIELD
+from embedding_storage import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# 2: manifest records the catalog fingerprint and the model ids of the vectors
+SNAPSHOT_VERSION = 2
+VECTORS_FILE = "vectors.npy"
+TABLE_FILE = "products.npz"
+MANIFEST_FILE = "manifest.json"
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_DIMENSIONS = 384
+
+# Products exported from MongoDB: the same set the search index loads
+SNAPSHOT_FILTER = {"IsDeleted": {"$ne": True}, "embedding": {"$exists": True}}
+
+# Fields the catalog fingerprint is computed from
+FINGERPRINT_PROJECTION = {"_id": 1, TEXT_HASH_FIELD: 1, MODEL_FIELD: 1}
+
+# Rows copied and hashed per chunk, to bound memory on large catalogs
+CHUNK_ROWS = 65536
+
+_MASK_128 = (1 << 128) - 1
+
+
+class SnapshotError(Exception):
+    """The snapshot is missing, incomplete, corrupt or built for another model"""
+
+
+@dataclass
+class Snapshot:
+    manifest: Dict[str, Any]
+    vectors: np.ndarray
+    ids: np.ndarray
+    store_ids: np.ndarray
+    store_offsets: np.ndarray
+
+    def stores(self):
+        """(store_id, product ids, vector rows) per store; rows are views into the mapped file"""
+        for index, store_id in enumerate(self.store_ids):
+            start, end = int(self.store_offsets[index]), int(self.store_offsets[index + 1])
+            yield str(store_id), self.ids[start:end], self.vectors[start:end]
+
+
+class CatalogFingerprint:
+    """
+    Order-independent hash of (_id, text hash, model) over the embedded
+    products: the sum of a 128-bit BLAKE2b digest per product, so the
+    export (in cursor order) and the staleness check (in any order) agree.
+    Also counts the products and the model ids that embedded them.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.count = 0
+        self.models = Counter()
+
+    def add(self, document: Dict[str, Any]):
+        model = document.get(MODEL_FIELD)
+        key = f"{document['_id']}\t{document.get(TEXT_HASH_FIELD) or ''}\t{model or ''}"
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        self.total = (self.total + int.from_bytes(digest, "little")) & _MASK_128
+        self.count += 1
+        self.models[model or "unknown"] += 1
+
+    def hexdigest(self) -> str:
+        return f"blake2b-sum:{self.total:032x}"
+
+    @classmethod
+    def of(cls, collection) -> "CatalogFingerprint":
+        fingerprint = cls()
+        for document in collection.find(SNAPSHOT_FILTER, FINGERPRINT_PROJECTION, batch_size=10000):
+            fingerprint.add(document)
+        return fingerprint
+
+
+def model_name_of(model_ids) -> Optional[str]:
+    """The model name shared by "<model>:<backend>" ids, or None when they differ or are unknown"""
+    names = {model_id.rsplit(":", 1)[0] for model_id in model_ids if model_id != "unknown"}
+    return names.pop() if len(names) == 1 else None
+
+
+def compute_checksum(vectors: np.ndarray, ids: np.ndarray, store_ids: np.ndarray, store_offsets: np.ndarray) -> str:
+    digest = hashlib.sha256()
+    for start in range(0, vectors.shape[0], CHUNK_ROWS):
+        digest.update(np.ascontiguousarray(vectors[start:start + CHUNK_ROWS]).tobytes())
+    digest.update("\n".join(ids.tolist()).encode("utf-8"))
+    digest.update("\n".join(store_ids.tolist()).encode("utf-8"))
+    digest.update(np.asarray(store_offsets, dtype=np.int64).tobytes())
+    return "sha256:" + digest.hexdigest()
+
+
+def _usable_rows(vectors: np.ndarray) -> np.ndarray:
+    """Rows that are finite and not the all-zero placeholder of a failed embedding"""
+    norms = np.linalg.norm(vectors, axis=1)
+    return np.isfinite(norms) & (norms >= 1e-6)
+
+
+def export_snapshot(collection, path: str, model_name: Optional[str] = None, dimensions: int = DEFAULT_DIMENSIONS) -> Dict[str, Any]:
+    """
+    Write a snapshot of the Products collection to `path`. Rows are first
+    streamed to a scratch file in cursor order and then copied grouped by
+    store, so memory stays bounded by the id table. The directory is
+    replaced only once every file is complete.
+
+    The manifest's model is model_name, or else the model that embedded
+    the exported products (the default model when they do not say).
+    """
+    started = time.perf_counter()
+    expected = collection.count_documents(SNAPSHOT_FILTER)
+    staging = path.rstrip("/\\") + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    scratch_path = os.path.join(staging, "scratch.npy")
+    scratch = np.lib.format.open_memmap(scratch_path, mode="w+", dtype=np.float32, shape=(max(expected, 1), dimensions))
+    ids, stores = [], []
+    skipped = 0
+    fingerprint = CatalogFingerprint()
+
+    cursor = collection.find(SNAPSHOT_FILTER, {**FINGERPRINT_PROJECTION, "StoreId": 1, "embedding": 1}, batch_size=1000)
+    for document in cursor:
+        if fingerprint.count >= expected:
+            # Products added while exporting are picked up by the next export
+            break
+        fingerprint.add(document)
+        vector = decode_embedding(document.get("embedding"))
+        store_id = document.get("StoreId")
+        if not store_id or vector is None or len(vector) != dimensions:
+            skipped += 1
+            continue
+        scratch[len(ids)] = vector
+        ids.append(str(document["_id"]))
+        stores.append(str(store_id))
+
+    count = len(ids)
+    usable = np.concatenate([
+        _usable_rows(scratch[start:min(start + CHUNK_ROWS, count)]) for start in range(0, count, CHUNK_ROWS)
+    ]) if count else np.zeros(0, dtype=bool)
+    skipped += int(count - usable.sum())
+
+    store_ids, store_codes = np.unique(np.asarray(stores, dtype=str), return_inverse=True)
+    rows = np.flatnonzero(usable)
+    order = rows[np.argsort(store_codes[rows], kind="stable")]
+    store_offsets = np.concatenate(([0], np.cumsum(np.bincount(store_codes[order], minlength=len(store_ids))))).astype(np.int64)
+
+    vectors = np.lib.format.open_memmap(
+        os.path.join(staging, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(order.size, dimensions)
+    )
+    for start in range(0, order.size, CHUNK_ROWS):
+        chunk = scratch[order[start:start + CHUNK_ROWS]]
+        vectors[start:start + chunk.shape[0]] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    vectors.flush()
+    del scratch
+    os.remove(scratch_path)
+
+    ordered_ids = np.asarray(ids, dtype=str)[order] if order.size else np.zeros(0, dtype="<U1")
+    np.savez(os.path.join(staging, TABLE_FILE), ids=ordered_ids, store_ids=store_ids, store_offsets=store_offsets)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "model": model_name or model_name_of(fingerprint.models) or DEFAULT_MODEL,
+        "models": dict(sorted(fingerprint.models.items())),
+        "dimensions": dimensions,
+        "products": int(order.size),
+        "stores": int(len(store_ids)),
+        "skipped": skipped,
+        "source_documents": fingerprint.count,
+        "fingerprint": fingerprint.hexdigest(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "checksum": compute_checksum(vectors, ordered_ids, store_ids, store_offsets),
+    }
+    del vectors
+    with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(staging, path)
+    logger.info(f"Exported {manifest['products']} embeddings in {manifest['stores']} stores to {path} in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"No snapshot at {path} (missing {MANIFEST_FILE})")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {manifest.get('version')} is not supported (expected {SNAPSHOT_VERSION})")
+    return manifest
+
+
+def load_snapshot(
+    path: str,
+    model_name: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    verify: bool = False
+) -> Snapshot:
+    """
+    Map a snapshot read-only. Raises SnapshotError when it was built for a
+    different model or dimension, when the files do not match the manifest
+    or, with verify, when the checksum does not match (reads every page).
+    """
+    manifest = read_manifest(path)
+    if model_name and manifest["model"] != model_name:
+        raise SnapshotError(f"Snapshot was built with {manifest['model']}, not {model_name}")
+    if dimensions and manifest["dimensions"] != dimensions:
+        raise SnapshotError(f"Snapshot has {manifest['dimensions']} dimensions, not {dimensions}")
+
+    try:
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        with np.load(os.path.join(path, TABLE_FILE)) as table:
+            ids, store_ids, store_offsets = table["ids"], table["store_ids"], table["store_offsets"]
+    except (OSError, ValueError, KeyError) as e:
+        raise SnapshotError(f"Snapshot at {path} is unreadable: {e}")
+
+    if vectors.shape != (manifest["products"], manifest["dimensions"]) or len(ids) != manifest["products"]:
+        raise SnapshotError(f"Snapshot at {path} does not match its manifest")
+    if len(store_offsets) != len(store_ids) + 1 or (len(store_offsets) and store_offsets[-1] != len(ids)):
+        raise SnapshotError(f"Snapshot at {path} has an inconsistent store table")
+    if verify and compute_checksum(vectors, ids, store_ids, store_offsets) != manifest["checksum"]:
+        raise SnapshotError(f"Snapshot at {path} is corrupt (checksum mismatch)")
+
+    return Snapshot(manifest, vectors, ids, store_ids, store_offsets)
+
+
+def stale_reason(manifest: Dict[str, Any], collection) -> Optional[str]:
+    """
+    Why the snapshot no longer matches the catalog, or None if it still
+    does. Reads the _id, text hash and model of every embedded product
+    (no vectors) to recompute the export's fingerprint.
+    """
+    current = CatalogFingerprint.of(collection)
+    if current.count != manifest["source_documents"]:
+        return f"catalog has {current.count} embedded products, snapshot was taken from {manifest['source_documents']}"
+    models = dict(sorted(current.models.items()))
+    if models != manifest["models"]:
+        return f"products are embedded by {models}, snapshot holds vectors of {manifest['models']}"
+    if current.hexdigest() != manifest["fingerprint"]:
+        return "products were re-embedded or edited since the snapshot was taken"
+    return None
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export, inspect and verify memory-mapped embedding snapshots")
+    parser.add_argument("command", choices=["export", "info", "verify"])
+    parser.add_argument("path", help="Snapshot directory")
+    parser.add_argument("--model", default=None, help="Model name recorded in the manifest (default: the model of the stored embeddings)")
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--mongo-uri", default=os.getenv("EMBEDDING_MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--mongo-db", default=os.getenv("EMBEDDING_MONGO_DB", "FluxCommerce"))
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            import pymongo
+
+            client = pymongo.MongoClient(args.mongo_uri)
+            try:
+                manifest = export_snapshot(client[args.mongo_db]["Products"], args.path, args.model, args.dimensions)
+            finally:
+                client.close()
+        elif args.command == "verify":
+            manifest = load_snapshot(args.path, verify=True).manifest
+            print("Checksum OK")
+        else:
+            manifest = read_manifest(args.path)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+How product embeddings are stored in MongoDB
+Two layouts are accepted everywhere an embedding is read:
+
+  array   BSON array of doubles, the original layout. Each element carries
+          a type byte and its index as a string key: ~4.5 KB for 384 dims.
+  binary  BSON binary subtype 9 (MongoDB's vector type): a dtype byte
+          (0x27 = float32), a padding byte, then little-endian float32
+          values: 1.5 KB for 384 dims, the same layout Atlas Vector Search
+          and the drivers' BinaryVector helpers use.
+
+Writers choose with STORAGE_ARRAY / STORAGE_BINARY; migrate_embeddings.py
+converts existing documents between the two.
+"""
+from typing import Any, Optional
+
+import numpy as np
+from bson.binary import Binary
+
+STORAGE_ARRAY = "array"
+STORAGE_BINARY = "binary"
+STORAGES = (STORAGE_ARRAY, STORAGE_BINARY)
+
+VECTOR_SUBTYPE = 9
+FLOAT32_DTYPE = 0x27
+_HEADER = bytes([FLOAT32_DTYPE, 0])
+_LITTLE_ENDIAN_F4 = np.dtype("<f4")
+
+
+def encode_embedding(vector, storage: str = STORAGE_ARRAY):
+    """The BSON value to store for a vector in the given layout"""
+    if storage == STORAGE_BINARY:
+        return Binary(_HEADER + np.asarray(vector, dtype=_LITTLE_ENDIAN_F4).tobytes(), VECTOR_SUBTYPE)
+    if storage == STORAGE_ARRAY:
+        return np.asarray(vector, dtype=np.float32).tolist() if isinstance(vector, np.ndarray) else list(vector)
+    raise ValueError(f"Unknown embedding storage {storage!r}, expected one of {STORAGES}")
+
+
+def decode_embedding(value: Any) -> Optional[np.ndarray]:
+    """
+    float32 vector from either layout, None for anything else. Binary
+    values are zero-copy views over the BSON bytes (read-only).
+    """
+    if isinstance(value, (bytes, Binary)):
+        subtype = getattr(value, "subtype", 0)
+        if subtype != VECTOR_SUBTYPE or len(value) < 2 or value[0] != FLOAT32_DTYPE or (len(value) - 2) % 4:
+            return None
+        return np.frombuffer(value, dtype=_LITTLE_ENDIAN_F4, offset=2)
+    if isinstance(value, np.ndarray):
+        return value.astype(np.float32, copy=False)
+    if isinstance(value, list):
+        try:
+            return np.asarray(value, dtype=np.float32)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def storage_of(value: Any) -> Optional[str]:
+    if isinstance(value, (bytes, Binary)):
+        return STORAGE_BINARY
+    if isinstance(value, list):
+        return STORAGE_ARRAY
+    return None
@@ -0,0 +1,203 @@
+"""
+NDJSON streaming helpers for the FluxCommerce embedding services
+Server side: read {"id", "text"} records from a chunked upload and stream
+{"id", "embedding"} records back as each chunk is encoded.
+Client side: a full-duplex client that uploads and reads at the same time.
+"""
+import http.client
+import json
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+from starlette.responses import StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard json encoder
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class StreamRecordError(ValueError):
+    """A line of the upload is not a valid {"id", "text"} record"""
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def parse_record(line: bytes, line_number: int) -> Tuple[Any, str]:
+    """
+    Parse one upload line into (id, text). A missing id defaults to the line number.
+    """
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise StreamRecordError(f"Line {line_number} is not valid JSON: {e}")
+
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        raise StreamRecordError(f"Line {line_number} must be an object with a string 'text' field")
+
+    return record.get("id", line_number), record["text"]
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Split an async byte stream into non-empty lines without buffering the whole body
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in chunk:
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield line
+
+        if len(buffer) > max_line_bytes:
+            raise StreamRecordError(f"A line is longer than {max_line_bytes} bytes")
+
+    if buffer.strip():
+        yield buffer
+
+
+async def stream_embeddings(
+    chunks: AsyncIterator[bytes],
+    embed_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+    chunk_size: int,
+    max_line_bytes: int
+) -> AsyncIterator[bytes]:
+    """
+    Encode uploaded records chunk by chunk and yield NDJSON result lines.
+
+    Memory stays bounded by chunk_size records regardless of upload size.
+    An invalid record or a failed encode ends the stream with a final
+    {"error": ...} line, since the response status has already been sent.
+    """
+    ids: List[Any] = []
+    texts: List[str] = []
+    line_number = 0
+    error = None
+
+    try:
+        async for line in iter_ndjson_lines(chunks, max_line_bytes):
+            line_number += 1
+            try:
+                record_id, text = parse_record(line, line_number)
+            except StreamRecordError as e:
+                # Records before the bad line are still encoded below
+                error = e
+                break
+            ids.append(record_id)
+            texts.append(text)
+
+            if len(texts) >= chunk_size:
+                yield render_ndjson(ids, await embed_fn(texts))
+                ids, texts = [], []
+
+        if texts:
+            yield render_ndjson(ids, await embed_fn(texts))
+    except Exception as e:
+        error = e
+
+    if error is not None:
+        yield _dumps({"error": str(error)}) + b"\n"
+
+
+def render_ndjson(ids: List[Any], embeddings: np.ndarray) -> bytes:
+    """
+    One {"id": ..., "embedding": [...]} line per row. Vectors are widened to
+    float64 so numbers match the JSON endpoints.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    return b"".join(
+        _dumps({"id": record_id, "embedding": embedding}) + b"\n"
+        for record_id, embedding in zip(ids, embeddings)
+    )
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response that sends its body while the request body is still
+    being uploaded. Starlette's StreamingResponse listens for disconnects on
+    `receive`, which would swallow upload chunks; here the body iterator is
+    the only reader of the request stream.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def stream_embeddings_client(
+    service_url: str,
+    records: Iterable[Tuple[Any, str]],
+    lines_per_frame: int = 64,
+    timeout: float = 300
+) -> Iterator[Tuple[Any, List[float]]]:
+    """
+    Upload (id, text) records to /embed_stream and yield (id, embedding)
+    as results arrive.
+
+    `requests` only reads a response after the whole upload is sent, which
+    deadlocks once the server's streamed output fills the socket buffers.
+    This client uploads from a background thread while the caller reads,
+    so neither side ever holds more than a few chunks in memory.
+    """
+    url = urlparse(service_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    connection.putrequest("POST", url.path.rstrip("/") + "/embed_stream")
+    connection.putheader("Content-Type", NDJSON_MEDIA_TYPE)
+    connection.putheader("Transfer-Encoding", "chunked")
+    connection.endheaders()
+
+    upload_error: List[BaseException] = []
+
+    def send_frame(lines: List[bytes]):
+        frame = b"".join(lines)
+        connection.send(b"%x\r\n%s\r\n" % (len(frame), frame))
+
+    def upload():
+        try:
+            lines: List[bytes] = []
+            for record_id, text in records:
+                lines.append(_dumps({"id": record_id, "text": text}) + b"\n")
+                if len(lines) >= lines_per_frame:
+                    send_frame(lines)
+                    lines = []
+            if lines:
+                send_frame(lines)
+            connection.send(b"0\r\n\r\n")
+        except BaseException as e:
+            upload_error.append(e)
+
+    uploader = threading.Thread(target=upload, name="embed-stream-upload", daemon=True)
+    uploader.start()
+
+    try:
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f"Embedding stream failed: {response.status} {response.read()[:200]!r}")
+
+        for line in response:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if "error" in result:
+                raise RuntimeError(f"Embedding stream failed: {result['error']}")
+            yield result["id"], result["embedding"]
+
+        uploader.join()
+        if upload_error:
+            raise upload_error[0]
+    finally:
+        connection.close()
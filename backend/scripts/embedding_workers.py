@@ -0,0 +1,120 @@
+"""
+Pre-fork multi-process serving for the FluxCommerce Embedding Service
+The parent process loads the model once and then forks the workers, so
+they share the model weights copy-on-write instead of each loading a copy.
+Every worker runs its own uvicorn server on the shared listening socket.
+"""
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Tuple
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies faster than this after starting is not restarted
+MIN_WORKER_UPTIME_S = 5.0
+
+
+def can_fork() -> bool:
+    """Pre-forking needs os.fork (Linux/macOS, not Windows)"""
+    return hasattr(os, "fork")
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """Split the available cores between workers so they do not oversubscribe the CPU"""
+    return max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_preforked(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    preload: Callable[[], None],
+    log_level: str = "info"
+):
+    """
+    Run preload() in this process, then fork `workers` uvicorn servers that
+    share the listening socket. Crashed workers are restarted; SIGINT or
+    SIGTERM stops them all.
+
+    Nothing that owns threads or file handles (event loop, inference pool,
+    SQLite connection) may be created by preload(); workers create their
+    own in the app's startup hook.
+    """
+    started = time.perf_counter()
+    preload()
+    logger.info(f"Model preloaded in {time.perf_counter() - started:.2f}s; forking {workers} worker(s)")
+
+    sock = bind_socket(host, port)
+    children: Dict[int, Tuple[int, float]] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+                server.run(sockets=[sock])
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = (index, time.monotonic())
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(workers):
+        spawn(index)
+
+    logger.info(f"Serving on http://{host}:{port} with {workers} pre-forked worker(s)")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        child = children.pop(pid, None)
+        if stopping or child is None:
+            continue
+
+        index, started_at = child
+        uptime = time.monotonic() - started_at
+        logger.warning(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} after {uptime:.1f}s")
+        if uptime < MIN_WORKER_UPTIME_S:
+            logger.error("Worker failed right after starting; not restarting it")
+            continue
+        spawn(index)
+
+    sock.close()
@@ -0,0 +1,175 @@
+"""
+Export the FluxCommerce embedding model to ONNX (fp32 and dynamic int8)
+and check that the exported models agree with the PyTorch output
+
+Usage:
+    python export_onnx_model.py                  # export + quantize + parity check
+    python export_onnx_model.py --check-only     # parity check of an existing export
+
+Requires: pip install onnx onnxruntime transformers
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from embedding_backends import (
+    BACKEND_ONNX,
+    BACKEND_ONNX_INT8,
+    DEFAULT_MODEL_NAME,
+    DEFAULT_ONNX_DIR,
+    ONNX_CONFIG_FILE,
+    ONNX_INT8_MODEL_FILE,
+    ONNX_MODEL_FILE,
+    TorchBackend,
+    cosine_agreement,
+    create_backend,
+)
+
+# Chat queries and catalog-style texts used for the parity check
+PARITY_TEXTS = [
+    "medicina para dolor",
+    "comida para desayuno",
+    "huevos",
+    "pizza",
+    "algo para mascotas",
+    "regalo para niños",
+    "medicina dolor cabeza",
+    "comida italiana pasta",
+    "productos baratos",
+    "auriculares inalámbricos con cancelación de ruido",
+    "Pizza Deliciosa pizza italiana con masa artesanal, salsa de tomate fresca, mozzarella y ingredientes de primera calidad. Perfecta para compartir en familia.",
+    "Paracetamol Analgésico y antipirético para aliviar el dolor de cabeza, fiebre, dolores musculares y malestar general. Tabletas de 500mg.",
+    "Leche Leche fresca pasteurizada entera, rica en calcio y proteínas. Perfecta para el desayuno, batidos, postres y cocinar. Envase de 1 litro.",
+    "Alimento para perros Alimento balanceado premium para perros adultos con pollo real, vitaminas, minerales y omega 3.",
+    "Teclado Teclado mecánico retroiluminado con teclas programables, switches táctiles y diseño gaming.",
+    "Rompecabezas Rompecabezas de 500 piezas con imagen colorida y educativa. Desarrolla paciencia, concentración y habilidades cognitivas.",
+]
+
+
+def export(model_name: str, output_dir: str, opset: int):
+    """
+    One-time export of the transformer to ONNX plus a dynamically quantized copy
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    int8_path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+
+    print(f"Loading {model_name}...")
+    sentence_model = SentenceTransformer(model_name)
+    transformer = sentence_model[0].auto_model.eval()
+    tokenizer = sentence_model.tokenizer
+
+    sample = tokenizer(["texto de ejemplo para exportar"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Exports only the transformer's token embeddings; pooling runs in NumPy"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    print(f"Exporting to {model_path} (opset {opset})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+            dynamo=False,
+        )
+
+    print(f"Quantizing to {int8_path} (dynamic int8 weights)...")
+    quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as config_file:
+        json.dump(
+            {
+                "model_name": model_name,
+                "max_seq_length": sentence_model.max_seq_length,
+                "dimensions": sentence_model.get_sentence_embedding_dimension(),
+                "opset": opset,
+            },
+            config_file,
+            indent=2,
+        )
+
+    for path in (model_path, int8_path):
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path) / (1024 * 1024):.1f} MB")
+
+
+def time_encode(backend, texts, repeat: int = 5) -> float:
+    backend.encode(texts)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        backend.encode(texts)
+    return (time.perf_counter() - start) / repeat
+
+
+def parity_check(model_name: str, output_dir: str, min_cosine: float) -> bool:
+    """
+    Compare ONNX and int8 ONNX embeddings against PyTorch for the same texts
+    """
+    reference_backend = TorchBackend(model_name)
+    reference_backend.load()
+    reference = reference_backend.encode(PARITY_TEXTS)
+    torch_seconds = time_encode(reference_backend, PARITY_TEXTS)
+
+    print(f"\nParity check against PyTorch on {len(PARITY_TEXTS)} texts")
+    print(f"{'backend':<12}{'min cos':>10}{'mean cos':>10}{'p01 cos':>10}{'ms/batch':>10}{'speedup':>9}")
+    print(f"{'torch':<12}{1.0:>10.5f}{1.0:>10.5f}{1.0:>10.5f}{torch_seconds * 1000:>10.1f}{1.0:>8.1f}x")
+
+    passed = True
+    for name in (BACKEND_ONNX, BACKEND_ONNX_INT8):
+        backend = create_backend(name, model_name, onnx_dir=output_dir)
+        backend.load()
+        agreement = cosine_agreement(reference, backend.encode(PARITY_TEXTS))
+        seconds = time_encode(backend, PARITY_TEXTS)
+        print(
+            f"{name:<12}{agreement['min']:>10.5f}{agreement['mean']:>10.5f}{agreement['p01']:>10.5f}"
+            f"{seconds * 1000:>10.1f}{torch_seconds / seconds:>8.1f}x"
+        )
+        if agreement["min"] < min_cosine:
+            print(f"  ✗ {name} falls below the minimum cosine agreement of {min_cosine}")
+            passed = False
+
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and check parity")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME, help="sentence-transformers model name")
+    parser.add_argument("--output", default=DEFAULT_ONNX_DIR, help="Directory for the exported models")
+    parser.add_argument("--opset", type=int, default=14, help="ONNX opset version")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Minimum per-text cosine agreement")
+    parser.add_argument("--check-only", action="store_true", help="Skip the export and only run the parity check")
+    args = parser.parse_args()
+
+    if not args.check_only:
+        export(args.model, args.output, args.opset)
+
+    if parity_check(args.model, args.output, args.min_cosine):
+        print("\n✅ Exported models agree with PyTorch")
+    else:
+        print("\n❌ Parity check failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Generate a synthetic FluxCommerce catalog for load testing
+Seeds N merchants, each with one store, and any number of products built
+from the store and product templates of generate_stores.py: Spanish store
+names per category, product names with qualifiers and presentations, the
+template descriptions with an extra sentence, realistic prices and stock.
+Product counts per store follow a log-normal spread, so a few stores are
+much larger than the rest, as in production.
+
+Documents are inserted with unordered insert_many batches from several
+threads. Password hashes are computed in a process pool; by default every
+merchant of a category shares the template password and one precomputed
+hash, so seeding does not wait on bcrypt. With --embeddings the products
+are embedded in-process as they are generated and inserted with their
+searchable text, hash and model, so the backfill finds nothing to do.
+
+Usage: python generate_catalog.py --merchants 1000 --products 1000000 [--embeddings mock] [--drop] [--yes]
+"""
+import argparse
+import re
+import time
+import unicodedata
+from itertools import islice
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+from bson import ObjectId
+
+from backfill_pipeline import run_pipeline
+from embedding_backends import BACKEND_REMOTE, BACKENDS, create_backend
+from embedding_freshness import embedding_update, text_hash
+from embedding_storage import STORAGE_ARRAY, STORAGES
+from generate_stores import (
+    BCRYPT_ROUNDS, db, hash_passwords, merchant_document, merchant_collection, product_collection, product_document,
+    store_collection, store_document, stores
+)
+from mongo_bulk import parse_write_concern
+from product_text import create_searchable_text
+
+# Store names: the category's prefix and one or two name parts
+STORE_PREFIXES = {"Mascotas": "Tienda de Mascotas"}
+STORE_NAMES = [
+    "El Sabor", "Central", "La Esquina", "Mundo", "Dulce Hogar", "Primavera", "Sonrisas", "TodoEnUno", "La Esperanza",
+    "San José", "Don Pedro", "Doña Carmen", "El Roble", "La Perla", "Santa Fe", "Los Andes", "El Sol", "La Luna",
+    "Las Palmas", "El Progreso", "La Favorita", "Mi Barrio", "El Trébol", "La Estrella", "Nueva Era", "El Faro",
+    "La Colina", "Buen Vecino", "La Económica", "El Portal",
+]
+STORE_PLACES = [
+    "", "", "", "del Centro", "del Norte", "del Sur", "Express", "Plaza", "del Parque", "de la Avenida",
+    "Los Álamos", "La Floresta", "El Prado", "Chapinero", "Laureles", "San Telmo", "Providencia", "Miraflores",
+]
+STREETS = ["Calle", "Carrera", "Avenida", "Diagonal", "Transversal"]
+
+# Product names: the template name, an optional qualifier and an optional presentation
+QUALIFIERS = ["", "", "Premium", "Select", "Especial", "Gourmet", "Natural", "Tradicional", "Original", "Eco", "Plus",
+              "Express", "Max", "Artesanal", "Familiar", "Deluxe"]
+PRESENTATIONS = [("", 1.0), ("", 1.0), ("", 1.0), ("Pack x2", 1.9), ("Pack x3", 2.7), ("Pack x6", 5.2),
+                 ("Tamaño Grande", 1.4), ("Tamaño Mini", 0.6), ("Edición Especial", 1.3), ("Presentación Familiar", 1.8)]
+EXTRA_SENTENCES = [
+    "Calidad garantizada por {store}.",
+    "Disponible para entrega el mismo día en {store}.",
+    "Uno de los productos más vendidos de {store}.",
+    "Producto seleccionado cuidadosamente por el equipo de {store}.",
+    "Precio especial por tiempo limitado.",
+    "Ideal para regalar.",
+    "Excelente relación calidad-precio.",
+    "Recomendado por nuestros clientes.",
+    "Producto de origen nacional.",
+    "Garantía de satisfacción o te devolvemos tu dinero.",
+]
+
+# Products per insert_many, and batches inserted concurrently
+INSERT_BATCH_SIZE = 2000
+INSERT_THREADS = 4
+
+
+def slugify(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", ascii_text.lower()).strip("-")
+
+
+def plan_stores(merchants: int, products: int, skew: float, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    """
+    One store per merchant: template (category), ids, name, email and
+    product count. Counts are a multinomial draw over log-normal weights;
+    skew 0 spreads the products evenly.
+    """
+    templates = rng.integers(len(stores), size=merchants)
+    weights = rng.lognormal(0.0, skew, merchants) if skew > 0 else np.ones(merchants)
+    counts = rng.multinomial(products, weights / weights.sum())
+    names = rng.integers(len(STORE_NAMES), size=merchants)
+    places = rng.integers(len(STORE_PLACES), size=merchants)
+    planned = []
+    for index, (template, count, name, place) in enumerate(zip(templates.tolist(), counts.tolist(), names.tolist(), places.tolist())):
+        store = stores[template]
+        prefix = STORE_PREFIXES.get(store["category"], store["category"])
+        store_name = " ".join(part for part in (prefix, STORE_NAMES[name], STORE_PLACES[place]) if part)
+        kind = store["email"].split("@")[0]
+        planned.append({
+            "template": template,
+            "merchant_id": ObjectId(),
+            "store_id": ObjectId(),
+            "name": store_name,
+            "slug": f"{slugify(store_name)}-{index + 1}",
+            "email": f"{kind}{index + 1}@example.com",
+            "products": count,
+        })
+    return planned
+
+
+def merchant_passwords(planned: List[Dict[str, Any]], unique: bool) -> List[str]:
+    """The template store's password, or a per-merchant one with unique"""
+    return [
+        f"{stores[store['template']]['password']}-{index + 1}" if unique else stores[store["template"]]["password"]
+        for index, store in enumerate(planned)
+    ]
+
+
+def password_hashes(passwords: List[str], unique: bool, rounds: int) -> List[str]:
+    """
+    bcrypt hashes of the passwords, computed in a process pool. Shared
+    passwords are hashed once each and the hash reused (fixtures only:
+    merchants of a category then share a salt).
+    """
+    if unique:
+        return hash_passwords(passwords, rounds)
+    distinct = sorted(set(passwords))
+    hashes = dict(zip(distinct, hash_passwords(distinct, rounds)))
+    return [hashes[password] for password in passwords]
+
+
+def store_address(rng: np.random.Generator) -> str:
+    street, first, second, third = rng.integers(len(STREETS)), rng.integers(1, 150), rng.integers(1, 99), rng.integers(1, 99)
+    return f"{STREETS[street]} {first} # {second}-{third}"
+
+
+def generate_products(planned: List[Dict[str, Any]], rng: np.random.Generator) -> Iterator[Dict[str, Any]]:
+    """Product documents of every planned store, store by store"""
+    for store in planned:
+        count = store["products"]
+        if not count:
+            continue
+        template = stores[store["template"]]
+        items = template["products"]
+        category = template["category"].lower()
+        picks = rng.integers(len(items), size=count).tolist()
+        qualifiers = rng.integers(len(QUALIFIERS), size=count).tolist()
+        presentations = rng.integers(len(PRESENTATIONS), size=count).tolist()
+        extras = rng.integers(len(EXTRA_SENTENCES), size=count).tolist()
+        price_factors = rng.uniform(0.75, 1.5, size=count).tolist()
+        stock_factors = rng.uniform(0.0, 2.0, size=count).tolist()
+        for pick, qualifier, presentation, extra, price_factor, stock_factor in zip(
+            picks, qualifiers, presentations, extras, price_factors, stock_factors
+        ):
+            item = items[pick]
+            label, multiplier = PRESENTATIONS[presentation]
+            name = " ".join(part for part in (item["name"], QUALIFIERS[qualifier], label) if part)
+            description = f"{item['description']} {EXTRA_SENTENCES[extra].format(store=store['name'])}"
+            yield product_document(
+                store["store_id"],
+                name,
+                round(item["price"] * multiplier * price_factor, 2),
+                int(item["stock"] * stock_factor),
+                description,
+                merchant_id=store["merchant_id"],
+                keywords=[category] + [word for word in name.lower().split() if len(word) > 2],
+            )
+
+
+def insert_documents(collection, documents, batch_size: int):
+    """Unordered insert_many in batches of batch_size; returns the number inserted"""
+    inserted = 0
+    iterator = iter(documents)
+    for batch in iter(lambda: list(islice(iterator, batch_size)), []):
+        inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic FluxCommerce catalog for load testing")
+    parser.add_argument("--merchants", type=int, default=1000, help="Merchants to create, one store each")
+    parser.add_argument("--products", type=int, default=100000, help="Products spread over the stores")
+    parser.add_argument("--skew", type=float, default=1.0, help="Log-normal sigma of the products per store (0 = even)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the catalog")
+    parser.add_argument("--unique-passwords", action="store_true", help="A password and bcrypt hash per merchant instead of one per category")
+    parser.add_argument("--bcrypt-rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost factor of the password hashes")
+    parser.add_argument("--embeddings", choices=["none"] + [name for name in BACKENDS if name != BACKEND_REMOTE], default="none", help="Embed products in-process as they are inserted")
+    parser.add_argument("--model-path", default=None, help="Local sentence-transformers model directory for --embeddings torch")
+    parser.add_argument("--storage", choices=STORAGES, default=STORAGE_ARRAY, help="Layout of inline embeddings")
+    parser.add_argument("--batch", type=int, default=INSERT_BATCH_SIZE, help="Documents per insert_many")
+    parser.add_argument("--threads", type=int, default=INSERT_THREADS, help="Product batches generated, embedded and inserted concurrently")
+    parser.add_argument("--write-concern", default="1", help='"1", "majority", "majority,j" or "0"')
+    parser.add_argument("--credentials", default="catalog_credentials.txt", help="File the merchant logins are written to")
+    parser.add_argument("--progress-every", type=int, default=100000)
+    parser.add_argument("--drop", action="store_true", help="Drop the Merchants, Stores and Products collections first")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    args = parser.parse_args()
+
+    print("🏪 FluxCommerce Catalog Generator")
+    print("=" * 50)
+    print(f"{args.merchants} merchants and stores, {args.products} products in database {db.name}")
+    if args.drop:
+        choice = "y" if args.yes else input("Drop Merchants, Stores and Products first? (y/n): ").lower().strip()
+        if choice != "y":
+            print("Aborted")
+            return
+        for collection in (merchant_collection, store_collection, product_collection):
+            collection.drop()
+
+    write_concern = parse_write_concern(args.write_concern)
+    merchants, store_docs, products = (
+        collection.with_options(write_concern=write_concern) if write_concern else collection
+        for collection in (merchant_collection, store_collection, product_collection)
+    )
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+
+    planned = plan_stores(args.merchants, args.products, args.skew, rng)
+    passwords = merchant_passwords(planned, args.unique_passwords)
+    hashes = password_hashes(passwords, args.unique_passwords, args.bcrypt_rounds)
+    hashed = time.perf_counter()
+    print(f"  ✓ Hashed {len(set(hashes))} passwords in {hashed - started:.1f}s")
+
+    inserted_merchants = insert_documents(merchants, (
+        dict(merchant_document(store["name"], store["email"], password_hash), _id=store["merchant_id"])
+        for store, password_hash in zip(planned, hashes)
+    ), args.batch)
+    inserted_stores = insert_documents(store_docs, (
+        dict(store_document(store["merchant_id"], store["name"], stores[store["template"]]["category"], store["slug"]),
+             _id=store["store_id"], Address=store_address(rng))
+        for store in planned
+    ), args.batch)
+    with open(args.credentials, "w", encoding="utf-8") as cred_file:
+        for store, password in zip(planned, passwords):
+            cred_file.write(f"Email: {store['email']}, Password: {password}\n")
+    print(f"  ✓ Inserted {inserted_merchants} merchants and {inserted_stores} stores; logins in {args.credentials}")
+
+    backend = None
+    if args.embeddings != "none":
+        backend = create_backend(args.embeddings, model_path=args.model_path)
+        print(f"Loading {backend.model_name} on the '{args.embeddings}' backend in this process...")
+        backend.load()
+    model_id = backend.model_id() if backend else None
+
+    def insert_batch(batch):
+        if backend is not None:
+            texts = [create_searchable_text(product) for product in batch]
+            for product, searchable_text, embedding in zip(batch, texts, backend.encode(texts)):
+                product.update(embedding_update(searchable_text, text_hash(searchable_text), model_id, embedding, args.storage)["$set"])
+        return len(products.insert_many(batch, ordered=False).inserted_ids)
+
+    inserted = 0
+    next_report = args.progress_every
+    products_started = time.perf_counter()
+
+    def count(batch, batch_inserted):
+        nonlocal inserted, next_report
+        inserted += batch_inserted
+        if inserted >= next_report:
+            print(f"  ✓ Inserted {inserted} products ({inserted / (time.perf_counter() - products_started):.0f} docs/s)")
+            next_report += args.progress_every
+
+    # Generation runs on the reader thread; embedding and insert_many on the worker threads
+    documents = generate_products(planned, rng)
+    try:
+        run_pipeline(iter(lambda: list(islice(documents, args.batch)), []), insert_batch, count, args.threads)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted after {inserted} products")
+        return
+    finally:
+        if backend is not None:
+            backend.close()
+
+    elapsed = time.perf_counter() - started
+    product_seconds = time.perf_counter() - products_started
+    print(f"✅ Seeded {inserted_merchants} merchants, {inserted_stores} stores and {inserted} products in {elapsed:.1f}s "
+          f"({inserted / max(product_seconds, 1e-9):.0f} products/s{f', embedded with {model_id}' if model_id else ''})")
+    largest = max(planned, key=lambda store: store["products"]) if planned else None
+    if largest:
+        print(f"Largest store: {largest['name']} with {largest['products']} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,170 +5,425 @@ import pymongo
 import requests
 import time
 import json
-from typing import List, Dict, Any
+import argparse
+import http.client
+from collections import Counter, deque
+from itertools import islice
+from typing import Dict, Any, Optional
 
-# MongoDB connection
+from pymongo import UpdateOne
+
+from backfill_checkpoint import DEAD_LETTERS_COLLECTION, BackfillCheckpoint, DeadLetters, Watermark
+from backfill_pipeline import BatchRetrier, ServiceUnavailable, run_pipeline
+from backfill_shards import SHARD_BY_ID, SHARD_MODES, run_sharded_backfill
+from embedding_backends import BACKEND_REMOTE, BACKENDS, create_backend
+from embedding_freshness import (
+    LIVE_PRODUCTS_FILTER, SCAN_PROJECTION, embedding_update, format_counts, model_id_from_health, select_stale
+)
+from embedding_stream import stream_embeddings_client
+from embedding_storage import STORAGE_ARRAY, STORAGES, decode_embedding
+from mongo_bulk import BulkWriter, parse_write_concern
+from product_text import create_searchable_text
+
+# MongoDB connection, opened by connect() (in main, or in each shard worker)
+MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "FluxCommerce"
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-db = client[DB_NAME]
-products_collection = db["Products"]
+client = None
+db = None
+products_collection = None
 
 # Embedding service configuration
 EMBEDDING_SERVICE_URL = "http://localhost:8000"
 
-def create_searchable_text(product: Dict[str, Any]) -> str:
-    """
-    Create searchable text by combining name, description, and keywords
-    """
-    parts = []
-    
-    # Add product name
-    name = product.get("Name", "").strip()
-    if name:
-        parts.append(name)
-    
-    # Add description
-    description = product.get("Description", "").strip()
-    if description:
-        parts.append(description)
-    
-    # Add keywords
-    keywords = product.get("Keywords", [])
-    if keywords and isinstance(keywords, list):
-        keyword_text = " ".join([kw for kw in keywords if isinstance(kw, str)])
-        if keyword_text.strip():
-            parts.append(keyword_text)
-    
-    return " ".join(parts)
+# Checkpoint and dead-letter key of this script's runs
+JOB_ID = "generate_embeddings"
 
-def generate_embedding(text: str) -> List[float]:
-    """
-    Generate embedding for a single text using the embedding service
-    """
-    try:
-        response = requests.post(
-            f"{EMBEDDING_SERVICE_URL}/embed",
-            json={"text": text},
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()["embedding"]
-        else:
-            print(f"Error from embedding service: {response.status_code}")
-            return [0.0] * 384  # Return zero vector on error
-    
-    except Exception as e:
-        print(f"Error generating embedding: {e}")
-        return [0.0] * 384  # Return zero vector on error
+# Products fetched per cursor round trip, and embedding updates per bulk_write
+READ_BATCH_SIZE = 1000
+WRITE_BATCH_SIZE = 500
 
-def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
-    """
-    Generate embeddings for multiple texts using batch endpoint
-    """
-    try:
-        response = requests.post(
-            f"{EMBEDDING_SERVICE_URL}/embed_batch",
-            json={"texts": texts},
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            return response.json()["embeddings"]
-        else:
-            print(f"Error from embedding service: {response.status_code}")
-            return [[0.0] * 384] * len(texts)  # Return zero vectors on error
-    
-    except Exception as e:
-        print(f"Error generating batch embeddings: {e}")
-        return [[0.0] * 384] * len(texts)  # Return zero vectors on error
+# Write concern of the embedding updates ("1", "majority", "0"; empty = server default)
+WRITE_CONCERN = "1"
+
+# Embedding layout in MongoDB: "array" (BSON doubles) or "binary" (packed float32, a third of the size)
+EMBEDDING_STORAGE = STORAGE_ARRAY
+
+def connect(uri: str = MONGO_URI):
+    """Open the MongoDB client the update functions use"""
+    global MONGO_URI, client, db, products_collection
+    MONGO_URI = uri
+    client = pymongo.MongoClient(uri)
+    db = client[DB_NAME]
+    products_collection = db["Products"]
 
 def check_embedding_service():
     """
-    Check if the embedding service is running
+    Check if the embedding service is running; returns its /health data
     """
     try:
         response = requests.get(f"{EMBEDDING_SERVICE_URL}/health", timeout=5)
         if response.status_code == 200:
             health_data = response.json()
             print(f"Embedding service is healthy: {health_data}")
-            return True
+            return health_data
         else:
             print(f"Embedding service health check failed: {response.status_code}")
-            return False
+            return None
     except Exception as e:
         print(f"Cannot connect to embedding service: {e}")
         print("Please make sure the embedding service is running:")
         print("1. cd backend/scripts")
         print("2. pip install -r requirements.txt")
         print("3. python embedding_service.py")
+        return None
+
+def backfill_writer(on_flush=None, on_write_error=None) -> BulkWriter:
+    """Unordered bulk writer for the embedding updates, with the configured batch size and write concern"""
+    return BulkWriter(products_collection, WRITE_BATCH_SIZE, parse_write_concern(WRITE_CONCERN), on_flush, on_write_error)
+
+def find_stale_products(model_id: str, full: bool = False, after_id=None, shard_filter: Optional[Dict[str, Any]] = None):
+    """
+    Products that need embedding: new, text changed, embedded by another
+    model or left with a failed (zero) vector. With full, every product.
+    Returns the lazy selection and the reason counts it fills in.
+    
+    The cursor is read in pages of READ_BATCH_SIZE with only the text
+    fields projected, so images and embeddings never leave the server.
+    Products come in _id order; after_id resumes an interrupted run and
+    shard_filter limits the scan to one shard of a sharded run.
+    """
+    counts = Counter()
+    conditions = [LIVE_PRODUCTS_FILTER]
+    if shard_filter:
+        conditions.append(shard_filter)
+    if after_id is not None:
+        conditions.append({"_id": {"$gt": after_id}})
+    query = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    cursor = products_collection.find(query, projection=SCAN_PROJECTION, batch_size=READ_BATCH_SIZE).sort("_id", pymongo.ASCENDING)
+    return select_stale(cursor, create_searchable_text, model_id, counts, full), counts
+
+def open_backend(
+    name: str = BACKEND_REMOTE,
+    concurrency: int = 4,
+    target_latency: float = 2.0,
+    load: bool = True,
+    model_path: Optional[str] = None,
+    num_threads: int = 0
+):
+    """
+    The embedding backend of a run: the embedding service over HTTP
+    (remote), or a model loaded in this process (torch, onnx, onnx-int8,
+    mock), which skips the HTTP round trip and JSON/binary encoding.
+    Returns None when the service is not reachable.
+    """
+    if name == BACKEND_REMOTE:
+        health = check_embedding_service()
+        if not health:
+            return None
+        backend = create_backend(name, url=EMBEDDING_SERVICE_URL, concurrency=concurrency, target_latency=target_latency)
+        backend.health = health
+    else:
+        backend = create_backend(name, model_path=model_path, num_threads=num_threads)
+    if load:
+        if name != BACKEND_REMOTE:
+            print(f"Loading {backend.model_name} on the '{name}' backend in this process...")
+        backend.load()
+    return backend
+
+def report_stale_products(full: bool = False, backend_name: str = BACKEND_REMOTE):
+    """
+    Dry run: count the products a run would embed, without embedding anything
+    """
+    backend = open_backend(backend_name, load=False)
+    if not backend:
         return False
+    
+    model_id = backend.model_id()
+    selection, counts = find_stale_products(model_id, full)
+    selected = sum(1 for _ in selection)
+    print(f"Model: {model_id}")
+    print(f"Products: {format_counts(counts)}")
+    print(f"Dry run: {selected} products would be embedded")
+    return True
 
-def update_product_embeddings(batch_size: int = 10):
+def backfill_products(backend, batch_size: int = 32, full: bool = False, retries: int = 3, restart: bool = False,
+                      job_id: str = JOB_ID, shard_filter: Optional[Dict[str, Any]] = None, should_stop=None, on_batch=None):
     """
-    Update all products with embeddings and searchable text
+    Embed the products that are new or changed since the last run
+    (every product with full, only those matching shard_filter if given)
+    with the given loaded backend and store their searchable text.
+    
+    Reading, embedding and writing run as a pipeline: a reader thread pulls
+    batches off the cursor, the backend embeds them (with the remote
+    backend, several /embed_batch requests in flight over a shared
+    keep-alive session), and this thread writes the results with unordered
+    bulk writes. Bounded queues between the stages keep memory flat, and
+    remote requests back off when the service slows down or answers
+    429/503 instead of sleeping between batches.
+    
+    Progress is checkpointed under job_id by _id after every bulk write, so
+    an interrupted run resumes where it stopped (restart ignores the
+    checkpoint). Failed batches are retried with backoff and split until
+    the failing products are isolated; those go to the dead-letter
+    collection and keep their previous embedding, as do products whose
+    write MongoDB rejected, so the checkpoint never skips them silently.
+    
+    should_stop() is polled before each batch is read; when it returns
+    True the batches in flight are written, the checkpoint saved and the
+    job left resumable. on_batch(processed, failed) is called after each
+    batch is written. Returns the run summary and the selection's reason
+    counts; raises ServiceUnavailable when the service stays unreachable.
     """
-    if not check_embedding_service():
+    model_id = backend.model_id()
+    checkpoint = BackfillCheckpoint(db, job_id, model_id, full)
+    resume_after = checkpoint.start(restart)
+    dead_letters = DeadLetters(db, job_id)
+    
+    selection, counts = find_stale_products(model_id, full, resume_after, shard_filter)
+    stopped = False
+    
+    def next_batch():
+        nonlocal stopped
+        if should_stop is not None and should_stop():
+            stopped = True
+            return []
+        return list(islice(selection, batch_size))
+    
+    batches = enumerate(iter(next_batch, []))
+    
+    # In-process models already use every core for one batch; only remote calls overlap
+    concurrency = backend.concurrency if backend.name == BACKEND_REMOTE else 1
+    limiter = backend.limiter if backend.name == BACKEND_REMOTE else None
+    retrier = BatchRetrier(backend.encode, retries)
+    watermark = Watermark(resume_after)
+    processed = 0
+    started = time.perf_counter()
+    
+    def embed(numbered_batch):
+        _, batch = numbered_batch
+        return retrier([searchable_text for _, searchable_text, _ in batch])
+    
+    def write(numbered_batch, results):
+        nonlocal processed
+        seq, batch = numbered_batch
+        embedded = []
+        for (product, searchable_text, text_hash), (embedding, error) in zip(batch, results):
+            if error is not None:
+                dead_letters.record(product["_id"], text_hash, model_id, error)
+                continue
+            writer.add(UpdateOne(
+                {"_id": product["_id"]},
+                embedding_update(searchable_text, text_hash, model_id, embedding, EMBEDDING_STORAGE)
+            ), key=(product["_id"], text_hash))
+            embedded.append(product["_id"])
+        dead_letters.resolve(embedded)
+        processed += len(batch)
+        # Saved on the next flush, once everything up to it is in MongoDB
+        watermark.complete(seq, batch[-1][0]["_id"])
+        if on_batch is not None:
+            on_batch(len(batch), len(batch) - len(embedded))
+    
+    def write_failed(key, message):
+        product_id, text_hash = key
+        dead_letters.record(product_id, text_hash, model_id, f"write failed: {message}")
+    
+    # Every write() finishes before the next flush, so the watermark is on disk after it;
+    # rejected writes are dead-lettered before the checkpoint moves past them
+    writer = backfill_writer(
+        on_flush=lambda: checkpoint.save(watermark.last_id, processed),
+        on_write_error=write_failed
+    )
+    with writer:
+        run_pipeline(batches, embed, write, concurrency)
+    # The last batch can fill a bulk write before its watermark moves; save it once all is flushed
+    checkpoint.save(watermark.last_id, processed)
+    
+    elapsed = time.perf_counter() - started
+    summary = {
+        "processed": processed,
+        "written": writer.written,
+        "write_failures": writer.failed,
+        "write_concern_errors": writer.write_concern_errors,
+        "bulk_writes": writer.batches,
+        "write_seconds": round(writer.write_seconds, 1),
+        "dead_letters": dead_letters.recorded,
+        "retries": retrier.retried,
+        "splits": retrier.splits,
+        "throttled": limiter.stats()["throttled"] if limiter else 0,
+        "backend": backend.name,
+        "seconds": round(elapsed, 1),
+        "docs_per_s": round(processed / max(elapsed, 1e-9), 1),
+        "resumed_after": checkpoint.previously_processed if resume_after is not None else None,
+        "complete": not stopped,
+    }
+    if not stopped:
+        checkpoint.finish(summary)
+    return summary, counts
+
+def update_product_embeddings(backend, batch_size: int = 32, full: bool = False, progress_every: int = 1000,
+                              retries: int = 3, restart: bool = False):
+    """
+    Embed the new or changed products (every product with full) in this
+    process with backfill_products, printing progress and a summary
+    """
+    limiter = backend.limiter if backend.name == BACKEND_REMOTE else None
+    progress = Counter()
+    next_report = progress_every
+    started = time.perf_counter()
+    
+    def report(processed, failed):
+        nonlocal next_report
+        progress.update(processed=processed, failed=failed)
+        if progress["processed"] >= next_report:
+            in_flight = f", {limiter.stats()['limit']:.1f} requests in flight" if limiter else ""
+            print(f"  ✓ Processed {progress['processed']} products "
+                  f"({progress['processed'] / (time.perf_counter() - started):.0f} docs/s, "
+                  f"{progress['failed']} failed{in_flight})")
+            next_report += progress_every
+    
+    try:
+        summary, counts = backfill_products(backend, batch_size, full, retries, restart, on_batch=report)
+    except ServiceUnavailable as e:
+        print(f"❌ {e}")
+        print("Progress is checkpointed; run again to resume once the service is back.")
+        return False
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again to resume from the last checkpoint.")
         return False
     
-    # Get all non-deleted products
-    products = list(products_collection.find({
-        "$or": [
-            {"IsDeleted": {"$ne": True}},
-            {"IsDeleted": {"$exists": False}}
-        ]
-    }))
+    if summary["resumed_after"] is not None:
+        print(f"Resumed an interrupted run ({summary['resumed_after']} products already processed)")
+    print(f"Products: {format_counts(counts)}")
+    if limiter:
+        stats = limiter.stats()
+        print(f"Embedding service: {stats['requests']} requests, {stats['throttled']} throttled, "
+              f"{stats['slow']} over {limiter.target_latency:g}s, {stats['avg_latency_s']:.2f}s average")
+    print(f"Retries: {summary['retries']}, split batches: {summary['splits']}")
+    print(f"✅ Embedding generation complete! {summary['written']} written, {summary['write_failures']} failed "
+          f"in {summary['bulk_writes']} bulk writes ({summary['write_seconds']:.1f}s waiting on MongoDB)")
+    print(f"Processed {summary['processed']} products in {summary['seconds']:.1f}s ({summary['docs_per_s']:.0f} docs/s)")
+    if summary["write_concern_errors"]:
+        print(f"⚠️  {summary['write_concern_errors']} write concern errors: some updates may not be replicated")
+    if summary["dead_letters"]:
+        print(f"❌ {summary['dead_letters']} products failed and were left unchanged; "
+              f"see the {DEAD_LETTERS_COLLECTION} collection ({db[DEAD_LETTERS_COLLECTION].count_documents({})} entries)")
+    return True
+
+def update_product_embeddings_stream(progress_every: int = 1000, full: bool = False, restart: bool = False):
+    """
+    Embed the new or changed products (every product with full) through
+    the /embed_stream endpoint.
+    Products are read from a cursor and uploaded as they are read, and
+    results are written back as they stream in, so memory stays flat no
+    matter how large the catalog is.
     
-    print(f"Found {len(products)} products to process")
+    Like the batched run, progress is checkpointed by _id under JOB_ID after
+    every bulk write, so an interrupted or failed stream resumes where it
+    stopped (restart ignores the checkpoint), and rejected writes go to the
+    dead-letter collection. A failed stream is reported and returns False.
+    """
+    health = check_embedding_service()
+    if not health:
+        return False
     
-    # Process products in batches
-    for i in range(0, len(products), batch_size):
-        batch = products[i:i + batch_size]
-        
-        print(f"Processing batch {i//batch_size + 1}/{(len(products) + batch_size - 1)//batch_size}")
-        
-        # Prepare texts for batch embedding
-        texts = []
-        product_updates = []
-        
-        for product in batch:
-            searchable_text = create_searchable_text(product)
-            texts.append(searchable_text)
-            product_updates.append({
-                "id": product["_id"],
-                "searchable_text": searchable_text
-            })
-        
-        # Generate embeddings for the batch
-        embeddings = generate_embeddings_batch(texts)
-        
-        # Update each product in the database
-        for j, product_update in enumerate(product_updates):
-            try:
-                products_collection.update_one(
-                    {"_id": product_update["id"]},
-                    {
-                        "$set": {
-                            "searchableText": product_update["searchable_text"],
-                            "embedding": embeddings[j]
-                        }
-                    }
-                )
+    model_id = model_id_from_health(health)
+    checkpoint = BackfillCheckpoint(db, JOB_ID, model_id, full)
+    resume_after = checkpoint.start(restart)
+    dead_letters = DeadLetters(db, JOB_ID)
+    selection, counts = find_stale_products(model_id, full, resume_after)
+    if resume_after is not None:
+        print(f"Resuming an interrupted run ({checkpoint.previously_processed} products already processed)")
+    
+    # Results stream back in upload order; the uploader thread appends and
+    # the loop below pops, so only in-flight products are held here
+    in_flight = deque()
+    
+    def records():
+        for product, searchable_text, text_hash in selection:
+            in_flight.append((product["_id"], searchable_text, text_hash))
+            yield str(product["_id"]), searchable_text
+    
+    def write_failed(key, message):
+        product_id, text_hash = key
+        dead_letters.record(product_id, text_hash, model_id, f"write failed: {message}")
+    
+    received = 0
+    last_id = resume_after
+    embedded = []
+    started = time.perf_counter()
+    
+    # Results arrive in _id order, so everything up to last_id is in the writer when it flushes
+    writer = backfill_writer(on_flush=lambda: checkpoint.save(last_id, received), on_write_error=write_failed)
+    stream = stream_embeddings_client(EMBEDDING_SERVICE_URL, records())
+    try:
+        with writer:
+            for product_id, embedding in stream:
+                original_id, searchable_text, text_hash = in_flight.popleft()
+                if str(original_id) != product_id:
+                    raise RuntimeError(f"Embedding stream out of order: expected {original_id}, got {product_id}")
                 
-                # Get product name for logging
-                product_name = next((p.get("Name", "Unknown") for p in batch if p["_id"] == product_update["id"]), "Unknown")
-                print(f"  ✓ Updated: {product_name}")
+                last_id = original_id
+                received += 1
+                writer.add(UpdateOne(
+                    {"_id": original_id},
+                    embedding_update(searchable_text, text_hash, model_id, embedding, EMBEDDING_STORAGE)
+                ), key=(original_id, text_hash))
+                embedded.append(original_id)
+                if len(embedded) >= WRITE_BATCH_SIZE:
+                    dead_letters.resolve(embedded)
+                    embedded = []
                 
-            except Exception as e:
-                print(f"  ✗ Error updating product {product_update['id']}: {e}")
-        
-        # Small delay between batches to be nice to the embedding service
-        if i + batch_size < len(products):
-            time.sleep(1)
+                if received % progress_every == 0:
+                    print(f"  ✓ Updated {received} products ({writer.rate():.0f} docs/s)")
+            dead_letters.resolve(embedded)
+    except (RuntimeError, ValueError, OSError, http.client.HTTPException) as e:
+        print(f"❌ {e}")
+        print(f"Stopped after {received} products; progress is checkpointed, run again to resume.")
+        return False
+    except KeyboardInterrupt:
+        print("\nInterrupted; run again to resume from the last checkpoint.")
+        return False
+    finally:
+        stream.close()
+        checkpoint.save(last_id, received)
     
-    print("✅ Embedding generation complete!")
+    elapsed = time.perf_counter() - started
+    checkpoint.finish({
+        "processed": received,
+        "written": writer.written,
+        "write_failures": writer.failed,
+        "write_concern_errors": writer.write_concern_errors,
+        "bulk_writes": writer.batches,
+        "write_seconds": round(writer.write_seconds, 1),
+        "dead_letters": dead_letters.recorded,
+        "backend": "stream",
+        "seconds": round(elapsed, 1),
+        "docs_per_s": round(received / max(elapsed, 1e-9), 1),
+        "resumed_after": checkpoint.previously_processed if resume_after is not None else None,
+        "complete": True,
+    })
+    print(f"Products: {format_counts(counts)}")
+    print(f"✅ Embedding generation complete! {writer.summary()}")
+    if dead_letters.recorded:
+        print(f"❌ {dead_letters.recorded} products failed and were left unchanged; "
+              f"see the {DEAD_LETTERS_COLLECTION} collection")
     return True
 
+def reload_search_index():
+    """
+    Ask the embedding service to reload its in-memory search index so the
+    new embeddings are searchable
+    """
+    try:
+        response = requests.post(f"{EMBEDDING_SERVICE_URL}/search/reload", timeout=300)
+        if response.status_code == 200:
+            stats = response.json()
+            print(f"Search index reloaded: {stats['products']} products in {stats['stores']} stores")
+        else:
+            print(f"Search index not reloaded: {response.status_code} {response.text[:200]}")
+    except Exception as e:
+        print(f"Could not reload the search index: {e}")
+
 def test_embeddings():
     """
     Test the embedding generation with a few sample products
@@ -191,7 +446,8 @@ def test_embeddings():
     for product in test_products:
         name = product.get("Name", "Unknown")
         searchable_text = product.get("searchableText", "")
-        embedding = product.get("embedding", [])
+        embedding = decode_embedding(product.get("embedding"))
+        embedding = [] if embedding is None else embedding.tolist()
         
         print(f"\nProduct: {name}")
         print(f"Searchable text: {searchable_text}")
@@ -202,15 +458,192 @@ def main():
     """
     Main function - generate embeddings for all products
     """
+    global READ_BATCH_SIZE, WRITE_BATCH_SIZE, WRITE_CONCERN, EMBEDDING_STORAGE
+    
+    parser = argparse.ArgumentParser(description="Generate embeddings for all FluxCommerce products")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream products through /embed_stream instead of batched /embed_batch calls"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-embed every product, not only new or changed ones"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report how many products would be embedded"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=BACKEND_REMOTE,
+        help="remote: call the embedding service; torch, onnx, onnx-int8 or mock: run the model in this process"
+    )
+    parser.add_argument(
+        "--model-path",
+        default=None,
+        help="Local sentence-transformers model directory for --backend torch (no Hub download)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Texts per /embed_batch request or in-process encode call (default 32 remote, 256 in-process)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Most /embed_batch requests in flight at once (lowered automatically under load)"
+    )
+    parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=2.0,
+        help="Seconds per /embed_batch request above which fewer requests are sent concurrently"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries of a failed /embed_batch request before it is split to isolate bad products"
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the checkpoint of an interrupted run and start from the first product"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes, each with its own MongoDB client and encoder, that backfill shards of the catalog"
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=SHARD_MODES,
+        default=SHARD_BY_ID,
+        help="With --workers: split the catalog into _id ranges (id) or one shard per StoreId (store)"
+    )
+    parser.add_argument(
+        "--create-index",
+        action="store_true",
+        help="With --shard-by store: build the {StoreId: 1, _id: 1} index the store shards scan by"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=0,
+        help="Inference threads per in-process encoder (0 = library default; cores / workers with --workers)"
+    )
+    parser.add_argument(
+        "--read-batch",
+        type=int,
+        default=READ_BATCH_SIZE,
+        help="Products fetched per MongoDB cursor round trip"
+    )
+    parser.add_argument(
+        "--write-batch",
+        type=int,
+        default=WRITE_BATCH_SIZE,
+        help="Embedding updates per unordered bulk_write"
+    )
+    parser.add_argument(
+        "--write-concern",
+        default=WRITE_CONCERN,
+        help='Write concern of the updates: "1", "majority", "majority,j" or "0" (unacknowledged)'
+    )
+    parser.add_argument(
+        "--storage",
+        choices=STORAGES,
+        default=EMBEDDING_STORAGE,
+        help="Store embeddings as a BSON array of doubles or as packed float32 BSON binary"
+    )
+    parser.add_argument(
+        "--mongo-uri",
+        default=MONGO_URI,
+        help="MongoDB connection string, used by the shard workers too"
+    )
+    parser.add_argument(
+        "--yes",
+        action="store_true",
+        help="Do not ask for confirmation (for scheduled runs)"
+    )
+    args = parser.parse_args()
+    connect(args.mongo_uri)
+    
+    # Cursor page size, bulk write size and write concern used by the update functions
+    READ_BATCH_SIZE, WRITE_BATCH_SIZE, WRITE_CONCERN = args.read_batch, args.write_batch, args.write_concern
+    EMBEDDING_STORAGE = args.storage
+    
     print("🚀 FluxCommerce Embedding Generator")
     print("=" * 50)
     
+    if args.dry_run:
+        report_stale_products(args.full, args.backend)
+        return
+    
+    if args.stream and args.backend != BACKEND_REMOTE:
+        print("❌ --stream sends products to the embedding service; it cannot be combined with an in-process --backend")
+        return
+    if args.stream and args.workers > 1:
+        print("❌ --stream runs in one process; it cannot be combined with --workers")
+        return
+    batch_size = args.batch_size or (32 if args.backend == BACKEND_REMOTE else 256)
+    
     # Check if we should update embeddings
-    choice = input("Generate embeddings for all products? (y/n): ").lower().strip()
+    scope = "all products" if args.full else "new and changed products"
+    choice = "y" if args.yes else input(f"Generate embeddings for {scope}? (y/n): ").lower().strip()
     
     if choice == 'y':
-        success = update_product_embeddings()
+        if args.stream:
+            success = update_product_embeddings_stream(full=args.full, restart=args.restart)
+        elif args.workers > 1:
+            # Only the model id is needed here; every worker loads its own encoder
+            backend = open_backend(args.backend, load=False, model_path=args.model_path)
+            if not backend:
+                return
+            settings = {
+                "backend": args.backend,
+                "model_path": args.model_path,
+                "num_threads": args.threads,
+                "concurrency": args.concurrency,
+                "target_latency": args.target_latency,
+                "batch_size": batch_size,
+                "full": args.full,
+                "retries": args.retries,
+                "READ_BATCH_SIZE": READ_BATCH_SIZE,
+                "WRITE_BATCH_SIZE": WRITE_BATCH_SIZE,
+                "WRITE_CONCERN": WRITE_CONCERN,
+                "EMBEDDING_STORAGE": EMBEDDING_STORAGE,
+                "EMBEDDING_SERVICE_URL": EMBEDDING_SERVICE_URL,
+                "MONGO_URI": MONGO_URI,
+            }
+            success = run_sharded_backfill(
+                db, JOB_ID, backend.model_id(), settings, args.workers, args.shard_by, args.restart,
+                create_index=args.create_index
+            )
+        else:
+            backend = open_backend(
+                args.backend, args.concurrency, args.target_latency, model_path=args.model_path, num_threads=args.threads
+            )
+            if not backend:
+                return
+            try:
+                success = update_product_embeddings(
+                    backend,
+                    batch_size,
+                    full=args.full,
+                    retries=args.retries,
+                    restart=args.restart
+                )
+            finally:
+                backend.close()
         if success:
+            reload_search_index()
             test_embeddings()
     else:
         print("Skipping embedding generation")
@@ -1,11 +1,24 @@
 """
 Generate embeddings for existing products in FluxCommerce MongoDB
-Standalone version with embedded mock embedding logic
+Standalone version: no embedding service needed. Uses the mock engine
+(mock_embeddings.py) by default, or runs a real model in this process
+with --backend torch / onnx / onnx-int8 (see embedding_backends.py).
 """
 import pymongo
-import hashlib
-import numpy as np
-from typing import List, Dict, Any
+import argparse
+from collections import Counter
+from itertools import islice
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from embedding_freshness import (
+    LIVE_PRODUCTS_FILTER, REASON_UNCHANGED, SCAN_PROJECTION, embedding_update, format_counts, select_stale
+)
+from embedding_storage import STORAGE_ARRAY, STORAGES, decode_embedding
+from embedding_backends import BACKEND_MOCK, BACKEND_REMOTE, BACKENDS, create_backend
+from mongo_bulk import BulkWriter, parse_write_concern
+from product_text import create_searchable_text
 
 # MongoDB connection
 DB_NAME = "FluxCommerce"
@@ -13,124 +26,69 @@ client = pymongo.MongoClient("mongodb://localhost:27017/")
 db = client[DB_NAME]
 products_collection = db["Products"]
 
-def create_simple_embedding(text: str) -> List[float]:
-    """
-    Create a simple 384-dimensional embedding based on text characteristics
-    This is the same mock implementation from the embedding service
-    """
-    # Normalize text
-    text = text.lower().strip()
-    
-    # Create a reproducible seed from text
-    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
-    np.random.seed(seed)
-    
-    # Base random vector
-    embedding = np.random.normal(0, 0.1, 384)
-    
-    # Add semantic features based on keywords
-    food_keywords = ['pizza', 'hamburguesa', 'ensalada', 'arroz', 'leche', 'huevos', 'pan', 'croissant', 'comida', 'desayuno', 'almuerzo', 'cena']
-    medicine_keywords = ['paracetamol', 'alcohol', 'curitas', 'medicina', 'medicamento', 'dolor', 'cabeza', 'fiebre']
-    tech_keywords = ['auriculares', 'mouse', 'teclado', 'tecnología', 'electrónica', 'computadora']
-    toy_keywords = ['juguete', 'muñeca', 'carrito', 'rompecabezas', 'niño', 'niña', 'regalo']
-    
-    # Boost specific dimensions for categories
-    if any(keyword in text for keyword in food_keywords):
-        embedding[0:50] += 0.3  # Food dimension
-    
-    if any(keyword in text for keyword in medicine_keywords):
-        embedding[50:100] += 0.3  # Medicine dimension
-        
-    if any(keyword in text for keyword in tech_keywords):
-        embedding[100:150] += 0.3  # Tech dimension
-        
-    if any(keyword in text for keyword in toy_keywords):
-        embedding[150:200] += 0.3  # Toy dimension
-    
-    # Add word-specific patterns
-    words = text.split()
-    for i, word in enumerate(words):
-        if i < 50:  # Use first 50 words
-            word_hash = hash(word) % 384
-            embedding[word_hash] += 0.2
-    
-    # Normalize to unit vector
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
-    
-    return embedding.tolist()
+# Products fetched per cursor round trip, and embedding updates per bulk_write
+READ_BATCH_SIZE = 1000
+WRITE_BATCH_SIZE = 500
 
-def create_searchable_text(product: Dict[str, Any]) -> str:
-    """
-    Create searchable text by combining name, description, and keywords
-    """
-    parts = []
-    
-    # Add product name
-    name = product.get("Name", "").strip()
-    if name:
-        parts.append(name)
-    
-    # Add description
-    description = product.get("Description", "").strip()
-    if description:
-        parts.append(description)
-    
-    # Add keywords (if they exist)
-    keywords = product.get("Keywords", [])
-    if keywords and isinstance(keywords, list):
-        keyword_text = " ".join([kw for kw in keywords if isinstance(kw, str)])
-        if keyword_text.strip():
-            parts.append(keyword_text)
-    
-    return " ".join(parts)
+# Texts embedded per backend encode call
+EMBED_BATCH_SIZE = 256
 
-def update_product_embeddings():
+def update_product_embeddings(
+    full: bool = False,
+    dry_run: bool = False,
+    read_batch: int = READ_BATCH_SIZE,
+    write_batch: int = WRITE_BATCH_SIZE,
+    write_concern: str = "1",
+    progress_every: int = 1000,
+    storage: str = STORAGE_ARRAY,
+    backend_name: str = BACKEND_MOCK,
+    batch_size: int = EMBED_BATCH_SIZE,
+    model_path: Optional[str] = None
+):
     """
-    Update all products with embeddings and searchable text
+    Embed the products that are new or changed since the last run (every
+    product with full) and store their searchable text. Products are
+    streamed from a projected cursor, embedded batch_size at a time by the
+    in-process backend and written with unordered bulk writes, embeddings
+    in the given storage layout (see embedding_storage.py).
     """
-    # Get all non-deleted products
-    products = list(products_collection.find({
-        "$or": [
-            {"IsDeleted": {"$ne": True}},
-            {"IsDeleted": {"$exists": False}}
-        ]
-    }))
-    
-    print(f"Found {len(products)} products to process")
-    
-    updated_count = 0
-    
-    for i, product in enumerate(products):
-        try:
-            # Create searchable text
-            searchable_text = create_searchable_text(product)
-            
-            # Generate embedding
-            embedding = create_simple_embedding(searchable_text)
+    backend = create_backend(backend_name, model_path=model_path)
+    model_id = backend.model_id()
+    
+    # Only non-deleted products whose text hash or model differs from the stored one
+    counts = Counter()
+    cursor = products_collection.find(LIVE_PRODUCTS_FILTER, projection=SCAN_PROJECTION, batch_size=read_batch)
+    selection = select_stale(cursor, create_searchable_text, model_id, counts, full)
+    
+    if dry_run:
+        selected = sum(1 for _ in selection)
+        print(f"Model: {model_id}")
+        print(f"Products: {format_counts(counts)}")
+        print(f"Dry run: {selected} products would be embedded")
+        return False
+    
+    backend.load()
+    
+    updated = 0
+    next_report = progress_every
+    
+    with BulkWriter(products_collection, write_batch, parse_write_concern(write_concern)) as writer:
+        for batch in iter(lambda: list(islice(selection, batch_size)), []):
+            embeddings = backend.encode([searchable_text for _, searchable_text, _ in batch])
+            for (product, searchable_text, text_hash), embedding in zip(batch, embeddings):
+                writer.add(UpdateOne(
+                    {"_id": product["_id"]},
+                    embedding_update(searchable_text, text_hash, model_id, embedding, storage)
+                ))
             
-            # Update product in database
-            products_collection.update_one(
-                {"_id": product["_id"]},
-                {
-                    "$set": {
-                        "searchableText": searchable_text,
-                        "embedding": embedding
-                    }
-                }
-            )
-            
-            product_name = product.get("Name", "Unknown")
-            print(f"  ✓ ({i+1}/{len(products)}) Updated: {product_name}")
-            updated_count += 1
-            
-        except Exception as e:
-            product_name = product.get("Name", "Unknown")
-            print(f"  ✗ Error updating {product_name}: {e}")
-    
-    print(f"✅ Embedding generation complete! Updated {updated_count} products.")
-    return updated_count > 0
+            updated += len(batch)
+            if updated >= next_report:
+                print(f"  ✓ Updated {updated} products ({writer.rate():.0f} docs/s)")
+                next_report += progress_every
+    
+    print(f"Products: {format_counts(counts)}")
+    print(f"✅ Embedding generation complete! {writer.summary()}")
+    return writer.written > 0 or counts[REASON_UNCHANGED] > 0
 
 def test_embeddings():
     """
@@ -154,7 +112,8 @@ def test_embeddings():
     for product in test_products:
         name = product.get("Name", "Unknown")
         searchable_text = product.get("searchableText", "")
-        embedding = product.get("embedding", [])
+        embedding = decode_embedding(product.get("embedding"))
+        embedding = [] if embedding is None else embedding.tolist()
         
         print(f"\n📦 Product: {name}")
         print(f"🔍 Searchable text: {searchable_text[:100]}{'...' if len(searchable_text) > 100 else ''}")
@@ -163,11 +122,28 @@ def test_embeddings():
 
 def main():
     """
-    Main function - generate embeddings for all products
+    Main function - generate embeddings for new and changed products
     """
+    parser = argparse.ArgumentParser(description="Generate mock embeddings for FluxCommerce products")
+    parser.add_argument("--full", action="store_true", help="Re-embed every product, not only new or changed ones")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many products would be embedded")
+    parser.add_argument("--read-batch", type=int, default=READ_BATCH_SIZE, help="Products fetched per cursor round trip")
+    parser.add_argument("--write-batch", type=int, default=WRITE_BATCH_SIZE, help="Updates per unordered bulk_write")
+    parser.add_argument("--write-concern", default="1", help='"1", "majority", "majority,j" or "0" (unacknowledged)')
+    parser.add_argument(
+        "--backend",
+        choices=[name for name in BACKENDS if name != BACKEND_REMOTE],
+        default=BACKEND_MOCK,
+        help="In-process embedding backend (generate_embeddings.py talks to the service)"
+    )
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per encode call")
+    parser.add_argument("--model-path", default=None, help="Local sentence-transformers model directory for --backend torch")
+    parser.add_argument("--storage", choices=STORAGES, default=STORAGE_ARRAY, help="Store embeddings as a BSON array or packed float32 binary")
+    args = parser.parse_args()
+    
     print("🚀 FluxCommerce Standalone Embedding Generator")
     print("=" * 50)
-    print("Using embedded mock embedding logic (same as mock_embedding_service.py)")
+    print(f"Using the in-process '{args.backend}' embedding backend")
     print()
     
     try:
@@ -175,18 +151,30 @@ def main():
         client.admin.command('ping')
         print("✅ MongoDB connection successful")
         
-        # Generate embeddings
-        print("\n🔄 Generating embeddings for all products...")
-        success = update_product_embeddings()
-        
-        if success:
-            print("\n🧪 Testing a few embeddings...")
-            test_embeddings()
-            
-            print("\n✅ All done! Your products now have vector embeddings.")
-            print("You can now test the vector search functionality in the chat!")
+        if args.dry_run:
+            update_product_embeddings(args.full, dry_run=True, read_batch=args.read_batch, backend_name=args.backend)
         else:
-            print("\n❌ No products were updated.")
+            # Generate embeddings
+            print("\n🔄 Generating embeddings for new and changed products...")
+            success = update_product_embeddings(
+                args.full,
+                read_batch=args.read_batch,
+                write_batch=args.write_batch,
+                write_concern=args.write_concern,
+                storage=args.storage,
+                backend_name=args.backend,
+                batch_size=args.batch_size,
+                model_path=args.model_path
+            )
+            
+            if success:
+                print("\n🧪 Testing a few embeddings...")
+                test_embeddings()
+                
+                print("\n✅ All done! Your products now have vector embeddings.")
+                print("You can now test the vector search functionality in the chat!")
+            else:
+                print("\n❌ No products were updated.")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -1,4 +1,7 @@
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import bcrypt
 import pymongo
 
@@ -124,51 +127,90 @@ merchant_collection = db["Merchants"]
 store_collection = db["Stores"]
 product_collection = db["Products"]
 
+# Cost factor of the password hashes; BCrypt.Net reads it from the hash when verifying
+BCRYPT_ROUNDS = 12
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    # Hash the password using official bcrypt for .NET BCrypt.Net compatibility
+    password_bytes = password[:72].encode("utf-8")
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password_bytes, salt).decode("utf-8")
+
+
+def hash_passwords(passwords, rounds=BCRYPT_ROUNDS, processes=None):
+    # Each hash takes ~250 ms at 12 rounds; spread them over the cores
+    passwords = list(passwords)
+    if len(passwords) <= 1:
+        return [hash_password(password, rounds) for password in passwords]
+    with ProcessPoolExecutor(max_workers=processes or os.cpu_count()) as pool:
+        return list(pool.map(hash_password, passwords, [rounds] * len(passwords), chunksize=max(1, len(passwords) // 64)))
+
+
+def merchant_document(name, email, password_hash):
+    # Merchant (no store fields)
+    return {
+        "Name": name,
+        "Email": email,
+        "PasswordHash": password_hash,
+        "State": "active"
+    }
+
+
+def store_document(merchant_id, name, category, slug=None):
+    return {
+        "MerchantId": str(merchant_id),
+        "Name": name,
+        "StoreSlug": slug or name.lower().replace(" ", "-"),
+        "Category": category,
+        "Address": "",
+        "Phone": "555-123-4567",
+        "State": "active",
+        "IsActive": True
+    }
+
+
+def product_document(store_id, name, price, stock, description="", merchant_id=None, keywords=None):
+    product = {
+        "Name": name,
+        "Price": price,
+        "Stock": stock,
+        "StoreId": str(store_id),
+        "IsDeleted": False,
+        "Description": description,
+        "Images": [],
+        "CoverIndex": 0
+    }
+    if merchant_id is not None:
+        product["MerchantId"] = str(merchant_id)
+    if keywords:
+        product["Keywords"] = keywords
+    return product
+
+
+def seed_stores():
+    password_hashes = hash_passwords(store["password"] for store in stores)
+
+    with open("store_credentials.txt", "w", encoding="utf-8") as cred_file:
+        for store, password_hash in zip(stores, password_hashes):
+            merchant = merchant_document(store["name"], store["email"], password_hash)
+            merchant_id = merchant_collection.insert_one(merchant).inserted_id
+
+            # Insert store for merchant
+            store_doc = store_document(merchant_id, store["name"], store.get("category", ""))
+            store_id = store_collection.insert_one(store_doc).inserted_id
+
+            # Insert products for store
+            product_collection.insert_many([
+                product_document(store_id, prod["name"], prod["price"], prod["stock"], prod.get("description", ""))
+                for prod in store["products"]
+            ])
+
+            # Write credentials
+            cred_file.write(f"Email: {store['email']}, Password: {store['password']}\n")
+
+    print("Stores and products seeded. Credentials saved to store_credentials.txt.")
 
 
-with open("store_credentials.txt", "w", encoding="utf-8") as cred_file:
-    for store in stores:
-        # Hash the password using official bcrypt for .NET BCrypt.Net compatibility
-        password_bytes = store["password"][:72].encode("utf-8")
-        salt = bcrypt.gensalt(rounds=12)
-        password_hash = bcrypt.hashpw(password_bytes, salt).decode("utf-8")
-        # Insert merchant (no store fields)
-        merchant = {
-            "Name": store["name"],
-            "Email": store["email"],
-            "PasswordHash": password_hash,
-            "State": "active"
-        }
-        merchant_id = merchant_collection.insert_one(merchant).inserted_id
-
-        # Insert store for merchant
-        store_doc = {
-            "MerchantId": str(merchant_id),
-            "Name": store["name"],
-            "StoreSlug": store["name"].lower().replace(" ", "-"),
-            "Category": store.get("category", ""),
-            "Address": "",
-            "Phone": "555-123-4567",
-            "State": "active",
-            "IsActive": True
-        }
-        store_id = store_collection.insert_one(store_doc).inserted_id
-
-        # Insert products for store
-        for prod in store["products"]:
-            product = {
-                "Name": prod["name"],
-                "Price": prod["price"],
-                "Stock": prod["stock"],
-                "StoreId": str(store_id),
-                "IsDeleted": False,
-                "Description": prod.get("description", ""),
-                "Images": [],
-                "CoverIndex": 0
-            }
-            product_collection.insert_one(product)
-
-        # Write credentials
-        cred_file.write(f"Email: {store['email']}, Password: {store['password']}\n")
-
-print("Stores and products seeded. Credentials saved to store_credentials.txt.")
+if __name__ == "__main__":
+    seed_stores()
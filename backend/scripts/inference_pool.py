@@ -0,0 +1,92 @@
+"""
+Worker pool for blocking model inference in the FluxCommerce Embedding Service
+Keeps the asyncio event loop free while SentenceTransformer.encode runs
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class InferencePool:
+    """
+    Thread pool that runs blocking inference jobs off the event loop.
+
+    PyTorch releases the GIL inside its kernels, so threads give real
+    parallelism for encode calls while sharing a single model instance.
+    The pool tracks how many jobs are waiting for a worker and how many
+    are currently running. Jobs run in a copy of the caller's context, so
+    per-request state such as the Server-Timing stages reaches the worker.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Create the worker threads"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on a worker thread and await its result"""
+        if self._executor is None:
+            raise RuntimeError("Inference pool is not running")
+
+        with self._lock:
+            self.queued += 1
+
+        job = self._executor.submit(contextvars.copy_context().run, self._call, fn, args)
+        job.add_done_callback(self._settle_cancelled)
+        return await asyncio.wrap_future(job)
+
+    def _settle_cancelled(self, job):
+        # A job cancelled before a worker picked it up never reaches _call
+        if job.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self.running -= 1
+                self.failed += 1
+            raise
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
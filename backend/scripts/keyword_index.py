@@ -0,0 +1,258 @@
+"""
+In-memory keyword index for FluxCommerce product search
+An inverted index per store over each product's searchableText, scored
+with BM25, so keyword matching looks up the query terms' posting lists
+instead of scanning every product's text on every search.
+"""
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Only what the index needs from each product document
+KEYWORD_PROJECTION = {"_id": 1, "StoreId": 1, "searchableText": 1, "Name": 1, "Description": 1}
+
+# BM25 term-frequency saturation and document-length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9ñ]+")
+
+# Common Spanish (and a few English) function words that carry no product meaning
+STOPWORDS = frozenset(
+    "para con sin por del las los una uno unos unas que como mas muy sus este esta estos estas "
+    "ese esa eso hay son the and for with".split()
+)
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip diacritics (café -> cafe), keeping ñ distinct from n"""
+    text = text.lower().replace("ñ", "\0")
+    folded = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return folded.replace("\0", "ñ")
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded words longer than two characters, without stopwords"""
+    if not text:
+        return []
+    return [token for token in _TOKEN_PATTERN.findall(fold_accents(text)) if len(token) > 2 and token not in STOPWORDS]
+
+
+def product_text(document: Dict[str, Any]) -> str:
+    """searchableText, or name and description for products not yet embedded"""
+    text = document.get("searchableText")
+    if text:
+        return text
+    return " ".join(part for part in (document.get("Name"), document.get("Description")) if part)
+
+
+class StoreKeywords:
+    """Posting lists (term -> product -> term frequency) and document lengths of one store"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.terms: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.terms)
+
+    def add(self, product_id: str, tokens: List[str]):
+        self.remove(product_id)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[product_id] = frequency
+        self.terms[product_id] = frequencies
+        self.lengths[product_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, product_id: str) -> bool:
+        frequencies = self.terms.pop(product_id, None)
+        if frequencies is None:
+            return False
+        for term in frequencies:
+            posting = self.postings[term]
+            del posting[product_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(product_id)
+        return True
+
+    def _term_weights(self, terms: Iterable[str]) -> Dict[str, float]:
+        """BM25 idf of each query term present in the store"""
+        count = self.count
+        weights = {}
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if posting:
+                weights[term] = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+        return weights
+
+    def _score(self, frequency: int, length: int, weight: float, average_length: float) -> float:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        return weight * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+    def search(self, terms: List[str], k: int, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-k products by BM25, walking only the query terms' posting lists"""
+        weights = self._term_weights(terms)
+        if not weights:
+            return []
+        average_length = max(self.total_length / max(self.count, 1), 1.0)
+        scores: Dict[str, float] = {}
+        for term, weight in weights.items():
+            for product_id, frequency in self.postings[term].items():
+                score = self._score(frequency, self.lengths[product_id], weight, average_length)
+                scores[product_id] = scores.get(product_id, 0.0) + score
+        for product_id in exclude:
+            scores.pop(product_id, None)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def score(self, terms: List[str], product_ids: Iterable[str]) -> Dict[str, float]:
+        """BM25 of the given products only (0 for products without a match)"""
+        weights = self._term_weights(terms)
+        average_length = max(self.total_length / max(self.count, 1), 1.0)
+        scores = {}
+        for product_id in product_ids:
+            frequencies = self.terms.get(product_id)
+            score = 0.0
+            if frequencies:
+                for term, weight in weights.items():
+                    if term in frequencies:
+                        score += self._score(frequencies[term], self.lengths[product_id], weight, average_length)
+            scores[product_id] = score
+        return scores
+
+    def matching_terms(self, terms: List[str], product_id: str) -> List[str]:
+        frequencies = self.terms.get(product_id, {})
+        return [term for term in dict.fromkeys(terms) if term in frequencies]
+
+
+class KeywordIndex:
+    """
+    Product keyword postings partitioned by StoreId.
+
+    Searches and single-product updates share one lock; a full reload
+    builds the new stores outside the lock and swaps them in, like
+    VectorIndex.
+    """
+
+    def __init__(self):
+        self._stores: Dict[str, StoreKeywords] = {}
+        self._lock = threading.Lock()
+
+        self.loaded = False
+        self.load_seconds = 0.0
+
+    def load_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Replace the index with the given product documents
+        ({"_id", "StoreId", "searchableText"}). Returns the number indexed.
+        """
+        started = time.perf_counter()
+        stores: Dict[str, StoreKeywords] = {}
+        indexed = 0
+        for document in documents:
+            store_id = document.get("StoreId")
+            if not store_id:
+                continue
+            store = stores.get(str(store_id))
+            if store is None:
+                store = stores[str(store_id)] = StoreKeywords()
+            store.add(str(document["_id"]), tokenize(product_text(document)))
+            indexed += 1
+
+        with self._lock:
+            self._stores = stores
+            self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+
+        logger.info(f"Keyword index loaded {indexed} products in {len(stores)} stores in {self.load_seconds:.2f}s")
+        return indexed
+
+    def load_from_mongo(self, collection) -> int:
+        """Load every live product of the Products collection"""
+        cursor = collection.find({"IsDeleted": {"$ne": True}}, KEYWORD_PROJECTION, batch_size=1000)
+        return self.load_documents(cursor)
+
+    def upsert(self, store_id: str, product_id: str, text: str):
+        tokens = tokenize(text)
+        with self._lock:
+            for other_store, store in self._stores.items():
+                if other_store != store_id:
+                    store.remove(product_id)
+            store = self._stores.get(store_id)
+            if store is None:
+                store = self._stores[store_id] = StoreKeywords()
+            store.add(product_id, tokens)
+
+    def remove(self, product_id: str) -> bool:
+        with self._lock:
+            return any([store.remove(product_id) for store in self._stores.values()])
+
+    def search(self, store_id: str, query: str, k: int = 10, exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-k (product_id, BM25 score) in one store, best first"""
+        terms = tokenize(query)
+        with self._lock:
+            store = self._stores.get(store_id)
+            if store is None or not terms:
+                return []
+            return store.search(terms, k, exclude)
+
+    def score(self, store_id: str, query: str, product_ids: Iterable[str]) -> Dict[str, float]:
+        """BM25 of the given products for the query"""
+        terms = tokenize(query)
+        with self._lock:
+            store = self._stores.get(store_id)
+            if store is None:
+                return {product_id: 0.0 for product_id in product_ids}
+            return store.score(terms, product_ids)
+
+    def matching_terms(self, store_id: str, query: str, product_id: str) -> List[str]:
+        """Folded query terms that occur in the product's text"""
+        terms = tokenize(query)
+        with self._lock:
+            store = self._stores.get(store_id)
+            return store.matching_terms(terms, product_id) if store else []
+
+    def stats(self) -> dict:
+        stores = self._stores
+        return {
+            "loaded": self.loaded,
+            "products": sum(store.count for store in stores.values()),
+            "terms": sum(len(store.postings) for store in stores.values()),
+            "load_seconds": self.load_seconds,
+        }
+
+
+def hybrid_rank(
+    vector_scores: Dict[str, float],
+    keyword_scores: Dict[str, float],
+    k: int,
+    keyword_weight: float = 0.3
+) -> List[Tuple[str, float, float, float]]:
+    """
+    Blend cosine and BM25 scores of a candidate list:
+    (1 - keyword_weight) * cosine + keyword_weight * BM25 / best BM25.
+    Returns the top-k (product_id, score, vector score, keyword score);
+    equal scores are ordered by product id, so pages are stable.
+    """
+    best_keyword = max(keyword_scores.values(), default=0.0)
+    ranked = []
+    # Union in insertion order (vector candidates first), not set order
+    for product_id in dict.fromkeys([*vector_scores, *keyword_scores]):
+        vector_score = vector_scores.get(product_id, 0.0)
+        keyword_score = keyword_scores.get(product_id, 0.0) / best_keyword if best_keyword > 0 else 0.0
+        score = (1 - keyword_weight) * vector_score + keyword_weight * keyword_score
+        ranked.append((product_id, score, vector_score, keyword_score))
+    ranked.sort(key=lambda item: (-item[1], item[0]))
+    return ranked[:k]
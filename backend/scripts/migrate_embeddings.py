@@ -0,0 +1,141 @@
+"""
+Convert stored product embeddings between BSON layouts
+Rewrites `embedding` from a BSON array of doubles to packed float32 BSON
+binary (or back with --to array) in unordered bulk batches, while the
+application keeps running. Each update only applies if the product's
+text hash and model are still the ones that were read, so a vector
+re-embedded by a concurrent backfill is never overwritten with the old one.
+
+Before and after the conversion it measures the collection's data size
+and the time to read the embeddings of a sample of products, and reports
+the savings. WiredTiger reuses the freed space for new data; run the
+`compact` command on Products to return it to the operating system.
+
+Usage: python migrate_embeddings.py [--to binary] [--batch 500] [--sample 20000] [--dry-run]
+"""
+import argparse
+import time
+from collections import Counter
+
+import pymongo
+from pymongo import UpdateOne
+
+from embedding_freshness import MODEL_FIELD, TEXT_HASH_FIELD
+from embedding_storage import STORAGE_ARRAY, STORAGE_BINARY, STORAGES, decode_embedding, encode_embedding, storage_of
+from mongo_bulk import BulkWriter, parse_write_concern
+
+DB_NAME = "FluxCommerce"
+
+# BSON type of each layout, for selecting the documents still to convert
+BSON_TYPES = {STORAGE_ARRAY: "array", STORAGE_BINARY: "binData"}
+
+
+def collection_size(db) -> dict:
+    stats = db.command("collStats", "Products")
+    return {"count": stats.get("count", 0), "size": stats.get("size", 0), "avgObjSize": stats.get("avgObjSize", 0),
+            "storageSize": stats.get("storageSize", 0)}
+
+
+def measure_reads(products, sample: int, repeats: int = 3) -> float:
+    """Best-of-N seconds to read and decode the embeddings of `sample` products, as the search index load does"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        cursor = products.find({"embedding": {"$exists": True}}, {"_id": 1, "StoreId": 1, "embedding": 1}, batch_size=1000).limit(sample)
+        for document in cursor:
+            decode_embedding(document["embedding"])
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def convert(products, target: str, args) -> Counter:
+    counts = Counter()
+    source_type = BSON_TYPES[STORAGE_ARRAY if target == STORAGE_BINARY else STORAGE_BINARY]
+    cursor = products.find(
+        {"embedding": {"$type": source_type}},
+        {"embedding": 1, TEXT_HASH_FIELD: 1, MODEL_FIELD: 1},
+        batch_size=args.batch,
+    ).sort("_id", pymongo.ASCENDING)
+
+    started = time.perf_counter()
+    with BulkWriter(products, args.batch, parse_write_concern(args.write_concern)) as writer:
+        for document in cursor:
+            vector = decode_embedding(document["embedding"])
+            if vector is None:
+                counts["unreadable"] += 1
+                continue
+            counts["converted"] += 1
+            writer.add(UpdateOne(
+                {
+                    "_id": document["_id"],
+                    "embedding": {"$type": source_type},
+                    TEXT_HASH_FIELD: document.get(TEXT_HASH_FIELD),
+                    MODEL_FIELD: document.get(MODEL_FIELD),
+                },
+                {"$set": {"embedding": encode_embedding(vector, target)}},
+            ))
+            if counts["converted"] % args.progress_every == 0:
+                print(f"  ✓ Converted {counts['converted']} products ({counts['converted'] / (time.perf_counter() - started):.0f} docs/s)")
+    print(f"  {writer.summary()}")
+    counts["failed"] = writer.failed
+    counts["write_concern_errors"] = writer.write_concern_errors
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert product embeddings between BSON array and packed float32 binary")
+    parser.add_argument("--to", choices=STORAGES, default=STORAGE_BINARY, help="Target layout")
+    parser.add_argument("--batch", type=int, default=500, help="Documents per cursor page and per bulk_write")
+    parser.add_argument("--write-concern", default="1", help='"1", "majority", "majority,j" or "0"')
+    parser.add_argument("--sample", type=int, default=20000, help="Products read for the latency measurement")
+    parser.add_argument("--progress-every", type=int, default=10000)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the layouts and measure reads")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/")
+    args = parser.parse_args()
+
+    print("🗜️  FluxCommerce Embedding Storage Migration")
+    print("=" * 50)
+
+    client = pymongo.MongoClient(args.mongo_uri)
+    try:
+        db = client[DB_NAME]
+        products = db["Products"]
+
+        layouts = Counter(
+            storage_of(document.get("embedding")) or "other"
+            for document in products.find({"embedding": {"$exists": True}}, {"embedding": 1}, batch_size=args.batch)
+        )
+        print(f"Embeddings: {layouts.get(STORAGE_ARRAY, 0)} array, {layouts.get(STORAGE_BINARY, 0)} binary, "
+              f"{layouts.get('other', 0)} other")
+
+        size_before = collection_size(db)
+        read_before = measure_reads(products, args.sample)
+        print(f"Before: {size_before['size'] / 2**20:.1f} MB data ({size_before['avgObjSize']:.0f} B/document), "
+              f"{size_before['storageSize'] / 2**20:.1f} MB on disk, "
+              f"{read_before * 1000:.0f} ms to read {min(args.sample, size_before['count'])} embeddings")
+        if args.dry_run:
+            return
+
+        started = time.perf_counter()
+        counts = convert(products, args.to, args)
+        print(f"✅ Converted {counts['converted']} embeddings to {args.to} in {time.perf_counter() - started:.1f}s "
+              f"({counts['failed']} failed, {counts['unreadable']} unreadable)")
+        if counts["write_concern_errors"]:
+            print(f"⚠️  {counts['write_concern_errors']} bulk writes did not reach write concern {args.write_concern!r}; "
+                  "their documents may not be replicated")
+
+        size_after = collection_size(db)
+        read_after = measure_reads(products, args.sample)
+        print(f"After:  {size_after['size'] / 2**20:.1f} MB data ({size_after['avgObjSize']:.0f} B/document), "
+              f"{size_after['storageSize'] / 2**20:.1f} MB on disk, "
+              f"{read_after * 1000:.0f} ms to read {min(args.sample, size_after['count'])} embeddings")
+        if size_before["size"] and read_before:
+            print(f"Savings: {100 * (1 - size_after['size'] / size_before['size']):.0f}% data size, "
+                  f"{100 * (1 - read_after / read_before):.0f}% read time")
+        print("Run db.runCommand({compact: 'Products'}) to release the freed disk space.")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
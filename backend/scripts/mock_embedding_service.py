@@ -2,13 +2,19 @@
 Simple Mock Embedding Service for FluxCommerce Testing
 This version uses simple word-based embeddings for testing the vector search pipeline
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import logging
 import uvicorn
-import hashlib
 import numpy as np
+import os
+
+from embedding_codec import FORMAT_JSON, MEDIA_TYPES, encode_binary, negotiate_format, render_json
+from embedding_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, ServiceMetrics
+from embedding_stream import DuplexStreamingResponse, stream_embeddings
+from embedding_backends import MockBackend
+from mock_embeddings import MOCK_MODEL_ID
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,6 +22,25 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="FluxCommerce Mock Embedding Service", version="1.0.0")
 
+# Serialize JSON responses straight from numpy instead of through pydantic models
+FAST_JSON = os.getenv("EMBEDDING_FAST_JSON", "1") != "0"
+
+# Records encoded per chunk by /embed_stream and the longest record line it accepts,
+# configured like embedding_service.py
+STREAM_CHUNK_SIZE = int(os.getenv("EMBEDDING_STREAM_CHUNK_SIZE", "256"))
+MAX_REQUEST_CHARS = int(os.getenv("EMBEDDING_MAX_REQUEST_CHARS", "2000000"))
+
+# Per-request log lines and Server-Timing header, as in embedding_service.py
+LOG_REQUESTS = os.getenv("EMBEDDING_LOG_REQUESTS", "1") != "0"
+SERVER_TIMING = os.getenv("EMBEDDING_SERVER_TIMING", "0") != "0"
+
+# Same engine and model id as generate_embeddings_standalone.py's default backend
+backend = MockBackend()
+backend.load()
+
+metrics = ServiceMetrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics, server_timing=SERVER_TIMING)
+
 class EmbeddingRequest(BaseModel):
     text: str
 
@@ -28,101 +53,135 @@ class EmbeddingResponse(BaseModel):
 class BatchEmbeddingResponse(BaseModel):
     embeddings: List[List[float]]
 
-def create_simple_embedding(text: str) -> List[float]:
-    """
-    Create a simple 384-dimensional embedding based on text characteristics
-    This is a mock implementation for testing - not for production use
-    """
-    # Normalize text
-    text = text.lower().strip()
-    
-    # Create a reproducible seed from text
-    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
-    np.random.seed(seed)
-    
-    # Base random vector
-    embedding = np.random.normal(0, 0.1, 384)
-    
-    # Add semantic features based on keywords
-    food_keywords = ['pizza', 'hamburguesa', 'ensalada', 'arroz', 'leche', 'huevos', 'pan', 'croissant', 'comida', 'desayuno', 'almuerzo', 'cena']
-    medicine_keywords = ['paracetamol', 'alcohol', 'curitas', 'medicina', 'medicamento', 'dolor', 'cabeza', 'fiebre']
-    tech_keywords = ['auriculares', 'mouse', 'teclado', 'tecnología', 'electrónica', 'computadora']
-    toy_keywords = ['juguete', 'muñeca', 'carrito', 'rompecabezas', 'niño', 'niña', 'regalo']
-    
-    # Boost specific dimensions for categories
-    if any(keyword in text for keyword in food_keywords):
-        embedding[0:50] += 0.3  # Food dimension
-    
-    if any(keyword in text for keyword in medicine_keywords):
-        embedding[50:100] += 0.3  # Medicine dimension
-        
-    if any(keyword in text for keyword in tech_keywords):
-        embedding[100:150] += 0.3  # Tech dimension
-        
-    if any(keyword in text for keyword in toy_keywords):
-        embedding[150:200] += 0.3  # Toy dimension
-    
-    # Add word-specific patterns
-    words = text.split()
-    for i, word in enumerate(words):
-        if i < 50:  # Use first 50 words
-            word_hash = hash(word) % 384
-            embedding[word_hash] += 0.2
-    
-    # Normalize to unit vector
-    norm = np.linalg.norm(embedding)
-    if norm > 0:
-        embedding = embedding / norm
-    
-    return embedding.tolist()
+def resolve_format(response_format: Optional[str], accept: Optional[str]) -> str:
+    """Pick json/f32/f16 from ?format= or the Accept header"""
+    try:
+        return negotiate_format(response_format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def binary_response(embeddings, fmt: str) -> Response:
+    """Raw little-endian vectors with a row count/dimension header"""
+    return Response(content=encode_binary(np.asarray(embeddings), fmt), media_type=MEDIA_TYPES[fmt])
+
+def json_response(field: str, embeddings) -> Response:
+    """Pre-rendered JSON body, skipping per-element pydantic validation"""
+    return Response(content=render_json(field, embeddings), media_type=MEDIA_TYPES[FORMAT_JSON])
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": True, "model": "mock-simple-embeddings"}
+    return {"status": "healthy", "model_loaded": True, "model": MOCK_MODEL_ID, "backend": backend.describe()}
 
 @app.post("/embed", response_model=EmbeddingResponse)
-async def generate_embedding(request: EmbeddingRequest):
+async def generate_embedding(
+    request: EmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """Generate embedding for a single text"""
+    metrics.mark_parsed()
+    fmt = resolve_format(response_format, accept)
     try:
-        embedding = create_simple_embedding(request.text)
-        logger.info(f"Generated mock embedding for: '{request.text[:50]}...'")
+        with metrics.stage("encode"):
+            embedding = backend.encode([request.text])[0].tolist()
+        metrics.batch_size.observe(1)
+        metrics.texts.inc(1, endpoint="/embed")
+        if LOG_REQUESTS:
+            logger.info(f"Generated mock embedding for: '{request.text[:50]}...'")
+        if fmt != FORMAT_JSON:
+            with metrics.stage("serialize"):
+                return binary_response([embedding], fmt)
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embedding", embedding)
         return EmbeddingResponse(embedding=embedding)
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
         raise e
 
 @app.post("/embed_batch", response_model=BatchEmbeddingResponse)
-async def generate_embeddings_batch(request: BatchEmbeddingRequest):
+async def generate_embeddings_batch(
+    request: BatchEmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """Generate embeddings for multiple texts"""
+    metrics.mark_parsed()
+    fmt = resolve_format(response_format, accept)
     try:
-        embeddings = [create_simple_embedding(text) for text in request.texts]
-        logger.info(f"Generated mock embeddings for {len(request.texts)} texts")
-        return BatchEmbeddingResponse(embeddings=embeddings)
+        with metrics.stage("encode"):
+            embeddings = backend.encode(request.texts)
+        metrics.batch_size.observe(len(request.texts))
+        metrics.texts.inc(len(request.texts), endpoint="/embed_batch")
+        if LOG_REQUESTS:
+            logger.info(f"Generated mock embeddings for {len(request.texts)} texts")
+        if fmt != FORMAT_JSON:
+            with metrics.stage("serialize"):
+                return binary_response(embeddings, fmt)
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embeddings", embeddings)
+        return BatchEmbeddingResponse(embeddings=embeddings.tolist())
     except Exception as e:
         logger.error(f"Error generating batch embeddings: {e}")
         raise e
 
 @app.post("/embeddings", response_model=BatchEmbeddingResponse)
-async def generate_embeddings(request: BatchEmbeddingRequest):
+async def generate_embeddings(
+    request: BatchEmbeddingRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
     """Generate embeddings for multiple texts (FluxCommerce backend compatible endpoint)"""
+    metrics.mark_parsed()
+    fmt = resolve_format(response_format, accept)
     try:
-        embeddings = [create_simple_embedding(text) for text in request.texts]
-        logger.info(f"Generated mock embeddings for {len(request.texts)} texts via /embeddings endpoint")
-        return BatchEmbeddingResponse(embeddings=embeddings)
+        with metrics.stage("encode"):
+            embeddings = backend.encode(request.texts)
+        metrics.batch_size.observe(len(request.texts))
+        metrics.texts.inc(len(request.texts), endpoint="/embeddings")
+        if LOG_REQUESTS:
+            logger.info(f"Generated mock embeddings for {len(request.texts)} texts via /embeddings endpoint")
+        if fmt != FORMAT_JSON:
+            with metrics.stage("serialize"):
+                return binary_response(embeddings, fmt)
+        if FAST_JSON:
+            with metrics.stage("serialize"):
+                return json_response("embeddings", embeddings)
+        return BatchEmbeddingResponse(embeddings=embeddings.tolist())
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise e
 
+async def embed_chunk(texts: List[str]) -> np.ndarray:
+    metrics.batch_size.observe(len(texts))
+    metrics.texts.inc(len(texts), endpoint="/embed_stream")
+    with metrics.stage("encode"):
+        return backend.encode(texts)
+
+@app.post("/embed_stream")
+async def generate_embeddings_stream(request: Request):
+    """Stream embeddings for a chunked NDJSON upload of {"id": ..., "text": ...} records"""
+    if LOG_REQUESTS:
+        logger.info("Started mock embedding stream")
+    return DuplexStreamingResponse(stream_embeddings(request.stream(), embed_chunk, STREAM_CHUNK_SIZE, MAX_REQUEST_CHARS))
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text-format metrics for this process"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     """Root endpoint with basic info"""
     return {
         "message": "FluxCommerce Mock Embedding Service",
-        "model": "simple-word-based-mock",
-        "dimensions": 384,
+        "model": MOCK_MODEL_ID,
+        "dimensions": backend.dimensions,
         "note": "This is a testing implementation - semantic similarity is simulated",
-        "endpoints": ["/embed", "/embed_batch", "/health"]
+        "formats": list(MEDIA_TYPES.keys()),
+        "endpoints": ["/embed", "/embed_batch", "/embeddings", "/embed_stream", "/metrics", "/health"]
     }
 
 if __name__ == "__main__":
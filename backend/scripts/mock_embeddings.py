@@ -0,0 +1,134 @@
+"""
+Mock embeddings for FluxCommerce testing
+Word-based 384-dimensional vectors that give the vector search pipeline
+something to rank without loading a model. Shared by
+mock_embedding_service.py and generate_embeddings_standalone.py.
+
+A batch is built in one NumPy pass: each text's noise comes from its own
+PCG64 stream keyed by a BLAKE2b digest of the text (no global np.random
+state, so threads cannot interfere), category keywords are found with one
+compiled regex, and word features are hashed with BLAKE2b rather than the
+per-process salted hash(), so every process and worker produces the same
+vector for the same text.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+# Reported by the mock service's /health and stored as embeddingModel;
+# v2 vectors are not comparable with the earlier process-dependent ones
+MOCK_MODEL_ID = "mock-simple-embeddings-v2"
+DIMENSIONS = 384
+
+NOISE_SCALE = 0.1
+CATEGORY_BOOST = 0.3
+CATEGORY_WIDTH = 50
+WORD_BOOST = 0.2
+MAX_WORDS = 50
+
+_MASK_128 = (1 << 128) - 1
+
+# Dimensions 0-49 food, 50-99 medicine, 100-149 tech, 150-199 toys.
+# Matched as substrings of the lower-cased text, like the original mock.
+CATEGORY_KEYWORDS = {
+    "food": ['pizza', 'hamburguesa', 'ensalada', 'arroz', 'leche', 'huevos', 'pan', 'croissant', 'comida', 'desayuno', 'almuerzo', 'cena'],
+    "medicine": ['paracetamol', 'alcohol', 'curitas', 'medicina', 'medicamento', 'dolor', 'cabeza', 'fiebre'],
+    "tech": ['auriculares', 'mouse', 'teclado', 'tecnología', 'electrónica', 'computadora'],
+    "toy": ['juguete', 'muñeca', 'carrito', 'rompecabezas', 'niño', 'niña', 'regalo'],
+}
+CATEGORIES = list(CATEGORY_KEYWORDS)
+
+# One pattern for all categories: a lookahead per category records its first
+# keyword found anywhere in the string, so match().groups() tells which
+# categories are present, with the same substring semantics as "keyword in text"
+_CATEGORY_MATCHER = re.compile("(?s)" + "".join(
+    f"(?=(?:.*?({'|'.join(re.escape(keyword) for keyword in keywords)}))?)"
+    for keywords in CATEGORY_KEYWORDS.values()
+))
+
+# Category bitmask -> row of the (texts, categories) mask
+_CATEGORY_ROWS = np.array(
+    [[(bits >> index) & 1 for index in range(len(CATEGORIES))] for bits in range(1 << len(CATEGORIES))],
+    dtype=np.float32,
+)
+
+
+def _digest(value: str, size: int = 8) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=size).digest(), "little")
+
+
+def _pcg_state(text: str) -> dict:
+    """PCG64 state and stream (increment) from the text's 256-bit BLAKE2b digest"""
+    key = _digest(text, 32)
+    return {
+        "bit_generator": "PCG64",
+        "state": {"state": key & _MASK_128, "inc": (key >> 128) | 1},
+        "has_uint32": 0,
+        "uinteger": 0,
+    }
+
+
+def category_bits(text: str) -> int:
+    """Bitmask of the CATEGORIES whose keywords appear in the (lower-cased) text"""
+    groups = _CATEGORY_MATCHER.match(text).groups()
+    return sum(1 << index for index, keyword in enumerate(groups) if keyword is not None)
+
+
+@lru_cache(maxsize=65536)
+def word_features(word: str) -> Tuple[int, int]:
+    """
+    (dimension boosted by the word, category bitmask of the word). Keywords
+    have no spaces, so a text contains one exactly when one of its words
+    does; catalog vocabularies repeat, so each word is matched once.
+    """
+    return _digest(word) % DIMENSIONS, category_bits(word)
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """(len(texts), 384) float32 unit vectors, deterministic across processes"""
+    count = len(texts)
+    embeddings = np.empty((count, DIMENSIONS), dtype=np.float32)
+    text_bits = np.zeros(count, dtype=np.intp)
+    word_counts = np.zeros(count, dtype=np.intp)
+    word_dims: List[int] = []
+
+    # Each text gets its own generator stream: the bit generator is local to
+    # this call and re-keyed per text, which is far cheaper than building a
+    # new Generator (and its SeedSequence) for every text
+    bit_generator = np.random.PCG64()
+    generator = np.random.Generator(bit_generator)
+
+    for row, text in enumerate(texts):
+        text = text.lower().strip()
+        bit_generator.state = _pcg_state(text)
+        generator.standard_normal(out=embeddings[row], dtype=np.float32)
+        features = [word_features(word) for word in text.split()]
+        bits = 0
+        for _, word_bits in features:
+            bits |= word_bits
+        text_bits[row] = bits
+        features = features[:MAX_WORDS]
+        word_counts[row] = len(features)
+        word_dims.extend([dimension for dimension, _ in features])
+
+    embeddings *= NOISE_SCALE
+    width = len(CATEGORIES) * CATEGORY_WIDTH
+    embeddings[:, :width] += CATEGORY_BOOST * np.repeat(_CATEGORY_ROWS[text_bits], CATEGORY_WIDTH, axis=1)
+    # Repeated words add up, as in the per-text loop
+    word_cells = np.repeat(np.arange(count, dtype=np.intp) * DIMENSIONS, word_counts) + np.asarray(word_dims, dtype=np.intp)
+    embeddings += (WORD_BOOST * np.bincount(word_cells, minlength=count * DIMENSIONS)).reshape(count, DIMENSIONS).astype(np.float32)
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+
+def create_simple_embedding(text: str) -> List[float]:
+    """
+    Create a simple 384-dimensional embedding based on text characteristics
+    This is a mock implementation for testing - not for production use
+    """
+    return embed_texts([text])[0].tolist()
@@ -0,0 +1,112 @@
+"""
+Batched MongoDB writes for the FluxCommerce backfill scripts
+Collects update operations and sends them as unordered bulk_write calls,
+one round trip per batch instead of one per product, and tracks the
+write rate for progress reports.
+"""
+import time
+from typing import Any, Callable, List, Optional
+
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+
+def parse_write_concern(value: Optional[str]) -> Optional[WriteConcern]:
+    """
+    "1", "majority", "0" (unacknowledged, fastest) or "majority,j" to also
+    wait for the journal; empty keeps the collection's default
+    """
+    if not value:
+        return None
+    w, _, journal = value.partition(",")
+    return WriteConcern(w=int(w) if w.isdigit() else w, j=True if journal == "j" else None)
+
+
+class BulkWriter:
+    """
+    Buffers write operations and flushes them every batch_size operations.
+    Unordered batches let the server apply them in parallel and keep going
+    past a failed document; failures are counted, not raised. Writes
+    applied without reaching the requested write concern (e.g. majority)
+    are counted separately in write_concern_errors.
+    on_write_error(key, message) is called for each failed write with the
+    key it was added with, before on_flush, which is called after every
+    bulk write, e.g. to checkpoint progress.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 500,
+        write_concern: Optional[WriteConcern] = None,
+        on_flush: Optional[Callable[[], None]] = None,
+        on_write_error: Optional[Callable[[Any, str], None]] = None
+    ):
+        if write_concern is not None:
+            collection = collection.with_options(write_concern=write_concern)
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.pending: List = []
+        self.pending_keys: List = []
+        self.on_flush = on_flush
+        self.on_write_error = on_write_error
+
+        self.written = 0
+        self.failed = 0
+        self.write_concern_errors = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def add(self, operation, key: Any = None):
+        self.pending.append(operation)
+        self.pending_keys.append(key)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        operations, self.pending = self.pending, []
+        keys, self.pending_keys = self.pending_keys, []
+        started = time.perf_counter()
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+            self.written += len(operations)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            self.failed += len(errors)
+            self.written += len(operations) - len(errors)
+            concern_errors = e.details.get("writeConcernErrors", [])
+            self.write_concern_errors += len(concern_errors)
+            if errors:
+                print(f"  ✗ {len(errors)} of {len(operations)} writes failed, first: {errors[0].get('errmsg')}")
+            if concern_errors:
+                print(f"  ⚠️  Write concern not satisfied for a bulk write of {len(operations)}: "
+                      f"{concern_errors[0].get('errmsg')}")
+            if self.on_write_error:
+                # Unordered writeErrors index into this call's operations
+                for error in errors:
+                    self.on_write_error(keys[error["index"]], error.get("errmsg", ""))
+        finally:
+            self.batches += 1
+            self.write_seconds += time.perf_counter() - started
+        if self.on_flush:
+            self.on_flush()
+
+    def rate(self) -> float:
+        """Documents written per second since the writer was created"""
+        return self.written / max(time.perf_counter() - self.started, 1e-9)
+
+    def summary(self) -> str:
+        concern = f", {self.write_concern_errors} write concern errors" if self.write_concern_errors else ""
+        return (
+            f"{self.written} written, {self.failed} failed{concern} in {self.batches} bulk writes "
+            f"({self.rate():.0f} docs/s, {self.write_seconds:.1f}s waiting on MongoDB)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.flush()
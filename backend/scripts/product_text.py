@@ -0,0 +1,33 @@
+"""
+Searchable text of a FluxCommerce product
+Shared by the embedding scripts, so the text that is embedded and hashed
+is built the same way everywhere. No MongoDB or model imports, so data
+generators and benchmarks can use it without connecting to anything.
+"""
+from typing import Any, Dict
+
+
+def create_searchable_text(product: Dict[str, Any]) -> str:
+    """
+    Create searchable text by combining name, description, and keywords
+    """
+    parts = []
+    
+    # Add product name
+    name = product.get("Name", "").strip()
+    if name:
+        parts.append(name)
+    
+    # Add description
+    description = product.get("Description", "").strip()
+    if description:
+        parts.append(description)
+    
+    # Add keywords
+    keywords = product.get("Keywords", [])
+    if keywords and isinstance(keywords, list):
+        keyword_text = " ".join([kw for kw in keywords if isinstance(kw, str)])
+        if keyword_text.strip():
+            parts.append(keyword_text)
+    
+    return " ".join(parts)
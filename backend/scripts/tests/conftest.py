@@ -0,0 +1,16 @@
+"""
+The scripts are imported flat, as they are when run from backend/scripts.
+Tests that need MongoDB get an in-memory mongomock database.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def mongo_db():
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient()["FluxCommerce"]
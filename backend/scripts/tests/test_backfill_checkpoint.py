@@ -0,0 +1,148 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import generate_embeddings
+from backfill_checkpoint import CHECKPOINTS_COLLECTION, DEAD_LETTERS_COLLECTION, Watermark
+from embedding_backends import BACKEND_MOCK, create_backend
+from embedding_freshness import MODEL_FIELD, TEXT_HASH_FIELD
+
+# mongomock cannot evaluate the embedding state expression of SCAN_PROJECTION
+TEXT_PROJECTION = {"Name": 1, "Description": 1, "Keywords": 1, TEXT_HASH_FIELD: 1, MODEL_FIELD: 1}
+
+
+class RejectingProducts:
+    """
+    Products collection whose unordered bulk writes reject the updates of
+    some products, the way a failing validator or a duplicate key does
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.rejected = set()
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def with_options(self, **kwargs):
+        return self
+
+    def bulk_write(self, operations, ordered=True):
+        errors = []
+        for index, operation in enumerate(operations):
+            if operation._filter["_id"] in self.rejected:
+                errors.append({"index": index, "code": 121, "errmsg": "Document failed validation"})
+            else:
+                self.collection.update_one(operation._filter, operation._doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nModified": len(operations) - len(errors)})
+
+
+@pytest.fixture
+def products(mongo_db, monkeypatch):
+    ids = sorted(ObjectId() for _ in range(100))
+    mongo_db["Products"].insert_many(
+        [{"_id": _id, "Name": f"Product {n}", "Description": "Fresh", "Keywords": ["tienda"]} for n, _id in enumerate(ids)]
+    )
+    collection = RejectingProducts(mongo_db["Products"])
+    monkeypatch.setattr(generate_embeddings, "db", mongo_db)
+    monkeypatch.setattr(generate_embeddings, "products_collection", collection)
+    monkeypatch.setattr(generate_embeddings, "SCAN_PROJECTION", TEXT_PROJECTION)
+    monkeypatch.setattr(generate_embeddings, "WRITE_BATCH_SIZE", 10)
+    return collection, ids
+
+
+@pytest.fixture
+def backend():
+    backend = create_backend(BACKEND_MOCK)
+    backend.load()
+    return backend
+
+
+def stop_after(batches):
+    calls = iter(range(batches + 1))
+    return lambda: next(calls, batches) >= batches
+
+
+def test_watermark_waits_for_earlier_batches():
+    watermark = Watermark("start")
+    watermark.complete(1, "b")
+    assert watermark.last_id == "start"
+    watermark.complete(0, "a")
+    assert watermark.last_id == "b"
+
+
+def test_rejected_writes_are_dead_lettered_before_the_checkpoint_passes_them(products, backend, mongo_db):
+    collection, ids = products
+    failed = ids[15]
+    collection.rejected.add(failed)
+
+    summary, _ = generate_embeddings.backfill_products(backend, batch_size=10, should_stop=stop_after(3))
+    job = mongo_db[CHECKPOINTS_COLLECTION].find_one({"_id": generate_embeddings.JOB_ID})
+    assert not summary["complete"] and job["status"] == "running"
+    assert job["last_id"] == ids[29] and job["processed"] == 30
+    assert summary["write_failures"] == 1 and summary["dead_letters"] == 1
+
+    dead = mongo_db[DEAD_LETTERS_COLLECTION].find_one({"_id": failed})
+    assert dead["error"].startswith("write failed: Document failed validation")
+    assert dead["model"] == backend.model_id() and dead["textHash"]
+    assert TEXT_HASH_FIELD not in mongo_db["Products"].find_one({"_id": failed})
+
+    # The resumed run continues after the checkpoint and finishes the job
+    collection.rejected.clear()
+    summary, _ = generate_embeddings.backfill_products(backend, batch_size=10)
+    assert summary["complete"] and summary["processed"] == 70 and summary["resumed_after"] == 30
+    assert mongo_db[CHECKPOINTS_COLLECTION].find_one({"_id": generate_embeddings.JOB_ID})["status"] == "done"
+
+    # The next run finds the rejected product unembedded and clears its dead letter
+    summary, counts = generate_embeddings.backfill_products(backend, batch_size=10)
+    assert summary["processed"] == 1 and counts["new"] == 1 and counts["unchanged"] == 99
+    assert mongo_db["Products"].find_one({"_id": failed})[TEXT_HASH_FIELD]
+    assert mongo_db[DEAD_LETTERS_COLLECTION].count_documents({}) == 0
+
+
+def fake_stream(fail_after=None, swap_at=None):
+    """stream_embeddings_client answering in upload order, failing at or answering out of order at a record"""
+    def stream(url, records):
+        records = iter(records)
+        for n, (record_id, text) in enumerate(records):
+            if n == fail_after:
+                raise RuntimeError("Embedding stream failed: service restarted")
+            if n == swap_at:
+                following, _ = next(records)
+                yield following, [0.1] * 384
+            yield record_id, [0.1] * 384
+    return stream
+
+
+@pytest.fixture
+def streaming(products, monkeypatch):
+    monkeypatch.setattr(generate_embeddings, "check_embedding_service", lambda: {"model": "mock-stream-model"})
+    return products
+
+
+def test_failed_stream_is_reported_and_resumes_from_its_checkpoint(streaming, mongo_db, monkeypatch):
+    collection, ids = streaming
+    collection.rejected.add(ids[3])
+    monkeypatch.setattr(generate_embeddings, "stream_embeddings_client", fake_stream(fail_after=25))
+    assert generate_embeddings.update_product_embeddings_stream() is False
+
+    job = mongo_db[CHECKPOINTS_COLLECTION].find_one({"_id": generate_embeddings.JOB_ID})
+    assert job["status"] == "running" and job["last_id"] == ids[24] and job["processed"] == 25
+    assert mongo_db[DEAD_LETTERS_COLLECTION].find_one({"_id": ids[3]})["error"].startswith("write failed")
+    assert mongo_db["Products"].count_documents({TEXT_HASH_FIELD: {"$exists": True}}) == 24
+
+    collection.rejected.clear()
+    monkeypatch.setattr(generate_embeddings, "stream_embeddings_client", fake_stream())
+    assert generate_embeddings.update_product_embeddings_stream() is True
+    job = mongo_db[CHECKPOINTS_COLLECTION].find_one({"_id": generate_embeddings.JOB_ID})
+    assert job["status"] == "done" and job["summary"]["processed"] == 75 and job["summary"]["resumed_after"] == 25
+    assert mongo_db["Products"].count_documents({TEXT_HASH_FIELD: {"$exists": True}}) == 99
+
+
+def test_out_of_order_stream_is_reported_not_raised(streaming, mongo_db, monkeypatch):
+    _, ids = streaming
+    monkeypatch.setattr(generate_embeddings, "stream_embeddings_client", fake_stream(swap_at=40))
+    assert generate_embeddings.update_product_embeddings_stream() is False
+    job = mongo_db[CHECKPOINTS_COLLECTION].find_one({"_id": generate_embeddings.JOB_ID})
+    assert job["status"] == "running" and job["last_id"] == ids[39]
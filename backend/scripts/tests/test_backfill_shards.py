@@ -0,0 +1,54 @@
+from bson import ObjectId
+
+from backfill_checkpoint import CHECKPOINTS_COLLECTION
+from backfill_shards import (
+    SHARD_BY_ID, SHARD_BY_STORE, ShardPlan, ensure_store_index, has_store_index, id_range_shards, shard_filter,
+    store_shards
+)
+
+MODEL_ID = "mock-simple-embeddings-v2:mock"
+
+
+def insert_products(collection, stores):
+    ids = sorted(ObjectId() for _ in range(sum(stores.values())))
+    store_of = [store for store, products in stores.items() for _ in range(products)]
+    collection.insert_many([{"_id": _id, "StoreId": store} for _id, store in zip(ids, store_of)])
+    return ids
+
+
+def test_id_ranges_cover_every_product_once(mongo_db):
+    products = mongo_db["Products"]
+    ids = insert_products(products, {"a": 500})
+    shards = id_range_shards(products, 8)
+    assert shards[0]["lower"] is None and shards[-1]["upper"] is None
+    covered = [document["_id"] for shard in shards for document in products.find(shard_filter(shard))]
+    assert sorted(covered) == ids
+
+
+def test_store_shards_are_largest_first_and_build_no_index(mongo_db):
+    products = mongo_db["Products"]
+    insert_products(products, {"small": 2, "large": 7, "medium": 4})
+    assert store_shards(products) == [
+        {"store": "large", "products": 7}, {"store": "medium", "products": 4}, {"store": "small", "products": 2}
+    ]
+    assert shard_filter({"store": "large", "products": 7}) == {"StoreId": "large"}
+    assert not has_store_index(products)
+    ensure_store_index(products)
+    assert has_store_index(products)
+
+
+def test_plan_resumes_only_unfinished_shards(mongo_db):
+    products = mongo_db["Products"]
+    insert_products(products, {"a": 3, "b": 2, "c": 1})
+    plan = ShardPlan(mongo_db, "job", MODEL_ID, False, SHARD_BY_STORE)
+    assert len(plan.load_or_create(products, workers=2)) == 3
+    mongo_db[CHECKPOINTS_COLLECTION].insert_one({"_id": plan.shard_job_id(1), "status": "done"})
+
+    resumed = ShardPlan(mongo_db, "job", MODEL_ID, False, SHARD_BY_STORE)
+    pending = resumed.load_or_create(products, workers=2)
+    assert resumed.resumed and [index for index, _ in pending] == [0, 2]
+
+    # Another sharding mode is a new plan
+    replanned = ShardPlan(mongo_db, "job", MODEL_ID, False, SHARD_BY_ID)
+    replanned.load_or_create(products, workers=2)
+    assert not replanned.resumed
@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+import pytest
+
+from embedding_codec import (
+    FORMAT_F16, FORMAT_F32, FORMAT_JSON, HEADER, MEDIA_TYPES, decode_binary, decode_embeddings_response,
+    encode_binary, negotiate_format, render_json
+)
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, content_type: str):
+        self.content = content
+        self.headers = {"Content-Type": content_type}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def test_f32_round_trip_is_exact():
+    embeddings = np.random.default_rng(0).standard_normal((5, 384)).astype(np.float32)
+    decoded = decode_binary(encode_binary(embeddings, FORMAT_F32))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, embeddings)
+
+
+def test_f16_round_trip_is_half_size_and_close():
+    embeddings = np.random.default_rng(1).standard_normal((3, 384)).astype(np.float32)
+    payload = encode_binary(embeddings, FORMAT_F16)
+    assert len(payload) == HEADER.size + embeddings.size * 2
+    np.testing.assert_allclose(decode_binary(payload), embeddings, rtol=1e-3, atol=1e-3)
+
+
+def test_single_vector_and_empty_batch():
+    vector = np.arange(4, dtype=np.float32)
+    assert decode_binary(encode_binary(vector)).shape == (1, 4)
+    assert decode_binary(encode_binary(np.zeros((0,), np.float32))).shape == (0, 0)
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda payload: payload[:HEADER.size - 1],
+    lambda payload: b"XXXX" + payload[4:],
+    lambda payload: payload[:-1],
+])
+def test_decode_rejects_malformed_payloads(corrupt):
+    with pytest.raises(ValueError):
+        decode_binary(corrupt(encode_binary(np.ones((2, 3), np.float32))))
+
+
+def test_negotiate_format():
+    assert negotiate_format("float16") == FORMAT_F16
+    assert negotiate_format(None, f"text/html, {MEDIA_TYPES[FORMAT_F32]};q=0.9") == FORMAT_F32
+    assert negotiate_format(None, "text/html") == FORMAT_JSON
+    with pytest.raises(ValueError):
+        negotiate_format("f64")
+
+
+def test_response_decoding_matches_every_format():
+    embeddings = np.random.default_rng(2).standard_normal((2, 8)).astype(np.float32)
+    binary = FakeResponse(encode_binary(embeddings), MEDIA_TYPES[FORMAT_F32])
+    batch = FakeResponse(render_json("embeddings", embeddings), "application/json")
+    single = FakeResponse(render_json("embedding", embeddings[0]), "application/json")
+    np.testing.assert_array_equal(decode_embeddings_response(binary), embeddings)
+    np.testing.assert_allclose(decode_embeddings_response(batch), embeddings, rtol=1e-6)
+    np.testing.assert_allclose(decode_embeddings_response(single), embeddings[:1], rtol=1e-6)
+
+
+@pytest.mark.parametrize("response", [
+    FakeResponse(b'{"embeddings":[]}', "application/json"),
+    FakeResponse(encode_binary(np.zeros((0,), np.float32)), MEDIA_TYPES[FORMAT_F32]),
+])
+def test_empty_batches_decode_alike(response):
+    decoded = decode_embeddings_response(response)
+    assert decoded.shape == (0, 0) and decoded.dtype == np.float32
@@ -0,0 +1,149 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+from bson.binary import Binary
+
+from embedding_freshness import (
+    EMBEDDED_AT_FIELD, EMBEDDING_EMPTY, EMBEDDING_MISSING, EMBEDDING_OK, EMBEDDING_STATE_EXPRESSION,
+    EMBEDDING_STATE_FIELD, MODEL_FIELD, REASON_CHANGED, REASON_MODEL, REASON_NEW, REASON_NO_VECTOR, REASON_UNCHANGED, SCAN_PROJECTION,
+    TEXT_HASH_FIELD, embedding_update, format_counts, is_fallback, select_stale, stale_reason, text_hash
+)
+from embedding_storage import STORAGE_BINARY, encode_embedding
+from product_text import create_searchable_text
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2:torch"
+
+
+def embedded(product, state=EMBEDDING_OK, model=MODEL):
+    """The product as the scan sees it after a successful embedding"""
+    return {
+        **product,
+        TEXT_HASH_FIELD: text_hash(create_searchable_text(product)),
+        MODEL_FIELD: model,
+        EMBEDDING_STATE_FIELD: state,
+    }
+
+
+@pytest.fixture
+def product():
+    return {"_id": 1, "Name": "Pizza", "Description": "Margherita", "Keywords": ["queso"]}
+
+
+def test_reasons(product):
+    current = text_hash(create_searchable_text(product))
+    assert stale_reason(product, current, MODEL) == REASON_NEW
+    assert stale_reason(embedded(product), current, MODEL) == REASON_UNCHANGED
+    assert stale_reason(embedded(product), text_hash("edited"), MODEL) == REASON_CHANGED
+    assert stale_reason(embedded(product, model="other:onnx"), current, MODEL) == REASON_MODEL
+
+
+@pytest.mark.parametrize("state", [EMBEDDING_EMPTY, EMBEDDING_MISSING])
+def test_current_hash_without_a_vector_is_stale(product, state):
+    current = text_hash(create_searchable_text(product))
+    assert stale_reason(embedded(product, state), current, MODEL) == REASON_NO_VECTOR
+
+
+def test_documents_read_without_the_state_are_judged_by_hash(product):
+    scanned = embedded(product)
+    del scanned[EMBEDDING_STATE_FIELD]
+    assert stale_reason(scanned, scanned[TEXT_HASH_FIELD], MODEL) == REASON_UNCHANGED
+
+
+def test_scan_projects_the_state_not_the_vector():
+    assert SCAN_PROJECTION[EMBEDDING_STATE_FIELD] is EMBEDDING_STATE_EXPRESSION
+    assert "embedding" not in SCAN_PROJECTION
+
+
+_MISSING = object()
+
+
+def evaluate(expression, document):
+    """
+    The aggregation operators EMBEDDING_STATE_EXPRESSION uses, with MongoDB's
+    semantics (mongomock cannot evaluate expressions in a find projection)
+    """
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:], _MISSING)
+    if not isinstance(expression, dict):
+        return expression
+    (operator, argument), = expression.items()
+    if operator == "$switch":
+        for branch in argument["branches"]:
+            if evaluate(branch["case"], document):
+                return evaluate(branch["then"], document)
+        return evaluate(argument["default"], document)
+    if operator == "$cond":
+        condition, then, otherwise = argument
+        return evaluate(then if evaluate(condition, document) else otherwise, document)
+    arguments = argument if isinstance(argument, list) else [argument]
+    values = [evaluate(value, document) for value in arguments]
+    if operator == "$isArray":
+        return isinstance(values[0], list)
+    if operator == "$anyElementTrue":
+        return any(value not in (None, False, 0) for value in values[0])
+    if operator == "$type":
+        value = values[0]
+        if value is _MISSING:
+            return "missing"
+        return "binData" if isinstance(value, bytes) else "array" if isinstance(value, list) else type(value).__name__
+    if operator == "$binarySize":
+        return len(values[0])
+    if operator == "$eq":
+        left, right = values
+        if isinstance(left, Binary) or isinstance(right, Binary):
+            return getattr(left, "subtype", None) == getattr(right, "subtype", None) and bytes(left) == bytes(right)
+        return left == right
+    if operator == "$lte":
+        return values[0] <= values[1]
+    if operator == "$or":
+        return any(values)
+    raise NotImplementedError(operator)
+
+
+@pytest.mark.parametrize("embedding, state", [
+    ([0.1] * 384, EMBEDDING_OK),
+    ([0.0] * 383 + [0.2], EMBEDDING_OK),
+    ([], EMBEDDING_EMPTY),
+    ([0.0] * 384, EMBEDDING_EMPTY),
+    (encode_embedding(np.full(384, 0.1), STORAGE_BINARY), EMBEDDING_OK),
+    (encode_embedding(np.zeros(384), STORAGE_BINARY), EMBEDDING_EMPTY),
+    (encode_embedding(np.zeros(0), STORAGE_BINARY), EMBEDDING_EMPTY),
+    (_MISSING, EMBEDDING_MISSING),
+    (None, EMBEDDING_MISSING),
+    ("not a vector", EMBEDDING_MISSING),
+])
+def test_embedding_state_expression(embedding, state):
+    document = {} if embedding is _MISSING else {"embedding": embedding}
+    assert evaluate(EMBEDDING_STATE_EXPRESSION, document) == state
+
+
+def test_select_stale_counts_every_reason(product):
+    products = [
+        {**product, "_id": 1},
+        embedded({**product, "_id": 2}),
+        embedded({**product, "_id": 3}, EMBEDDING_EMPTY),
+        embedded({**product, "_id": 4}, model="other:onnx"),
+    ]
+    counts = Counter()
+    selected = [scanned["_id"] for scanned, _, _ in select_stale(products, create_searchable_text, MODEL, counts)]
+    assert selected == [1, 3, 4]
+    assert format_counts(counts) == "1 new, 0 changed, 1 model changed, 1 missing vector, 1 unchanged"
+
+    counts = Counter()
+    assert len(list(select_stale(products, create_searchable_text, MODEL, counts, full=True))) == 4
+
+
+@pytest.mark.parametrize("embedding", [[0.0] * 384, [], encode_embedding(np.zeros(384), STORAGE_BINARY), None])
+def test_fallback_vectors_are_written_without_a_hash(embedding):
+    assert is_fallback(embedding)
+    update = embedding_update("text", "hash", MODEL, embedding if embedding is not None else [])
+    assert set(update["$unset"]) == {TEXT_HASH_FIELD, MODEL_FIELD}
+    assert EMBEDDED_AT_FIELD in update["$set"]
+
+
+def test_real_vectors_are_written_with_hash_and_model():
+    update = embedding_update("text", "hash", MODEL, [0.1] * 384, STORAGE_BINARY)
+    assert update["$set"][TEXT_HASH_FIELD] == "hash" and update["$set"][MODEL_FIELD] == MODEL
+    assert not is_fallback(update["$set"]["embedding"])
+    assert update["$set"][EMBEDDED_AT_FIELD].tzinfo is not None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from embedding_freshness import MODEL_FIELD, TEXT_HASH_FIELD
+from embedding_snapshot import SnapshotError, export_snapshot, load_snapshot, read_manifest, stale_reason
+from embedding_storage import STORAGE_ARRAY, STORAGE_BINARY, decode_embedding, encode_embedding
+
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2:torch"
+
+
+@pytest.fixture
+def products(mongo_db):
+    rng = np.random.default_rng(0)
+    collection = mongo_db["Products"]
+    collection.insert_many([
+        {
+            "StoreId": f"store-{n % 3}",
+            "embedding": encode_embedding(rng.standard_normal(384), STORAGE_BINARY if n % 2 else STORAGE_ARRAY),
+            TEXT_HASH_FIELD: f"hash-{n}",
+            MODEL_FIELD: MODEL_ID,
+        }
+        for n in range(30)
+    ])
+    return collection
+
+
+@pytest.fixture
+def snapshot(products, tmp_path):
+    path = str(tmp_path / "snapshot")
+    export_snapshot(products, path)
+    return path
+
+
+def test_export_round_trip(products, snapshot):
+    loaded = load_snapshot(snapshot, model_name="sentence-transformers/all-MiniLM-L6-v2", dimensions=384, verify=True)
+    assert loaded.manifest["models"] == {MODEL_ID: 30}
+    stored = {str(product["_id"]): product for product in products.find()}
+    exported = 0
+    for store_id, ids, vectors in loaded.stores():
+        for product_id, vector in zip(ids, vectors):
+            assert stored[product_id]["StoreId"] == store_id
+            expected = decode_embedding(stored[product_id]["embedding"])
+            np.testing.assert_allclose(vector, expected / np.linalg.norm(expected), rtol=1e-5, atol=1e-6)
+            exported += 1
+    assert exported == 30
+
+
+def test_fresh_snapshot_is_not_stale(products, snapshot):
+    assert stale_reason(read_manifest(snapshot), products) is None
+
+
+def test_edited_product_makes_it_stale_at_the_same_count(products, snapshot):
+    products.update_one({}, {"$set": {TEXT_HASH_FIELD: "edited"}})
+    assert "edited" in stale_reason(read_manifest(snapshot), products)
+
+
+def test_model_change_makes_it_stale(products, snapshot):
+    products.update_one({}, {"$set": {MODEL_FIELD: "sentence-transformers/all-MiniLM-L6-v2:onnx"}})
+    assert "embedded by" in stale_reason(read_manifest(snapshot), products)
+
+
+def test_added_product_makes_it_stale(products, snapshot):
+    products.insert_one({"StoreId": "store-0", "embedding": [0.1] * 384, TEXT_HASH_FIELD: "new", MODEL_FIELD: MODEL_ID})
+    assert "31 embedded products" in stale_reason(read_manifest(snapshot), products)
+
+
+def test_load_refuses_another_model(snapshot):
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot, model_name="another/model")
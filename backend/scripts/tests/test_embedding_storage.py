@@ -0,0 +1,51 @@
+import bson
+import numpy as np
+import pytest
+from bson.binary import Binary
+
+from embedding_storage import (
+    FLOAT32_DTYPE, STORAGE_ARRAY, STORAGE_BINARY, VECTOR_SUBTYPE, decode_embedding, encode_embedding, storage_of
+)
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).standard_normal(384).astype(np.float32)
+
+
+def test_binary_layout(vector):
+    value = encode_embedding(vector, STORAGE_BINARY)
+    assert isinstance(value, Binary) and value.subtype == VECTOR_SUBTYPE
+    assert value[0] == FLOAT32_DTYPE and value[1] == 0
+    assert len(value) == 2 + 384 * 4
+    assert storage_of(value) == STORAGE_BINARY
+
+
+@pytest.mark.parametrize("storage", [STORAGE_ARRAY, STORAGE_BINARY])
+def test_round_trip_through_bson(vector, storage):
+    document = bson.decode(bson.encode({"embedding": encode_embedding(vector, storage)}))
+    decoded = decode_embedding(document["embedding"])
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, vector)
+    assert storage_of(document["embedding"]) == storage
+
+
+def test_lists_are_accepted_as_input(vector):
+    np.testing.assert_array_equal(decode_embedding(encode_embedding(vector.tolist(), STORAGE_BINARY)), vector)
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    "not a vector",
+    ["a", "b"],
+    Binary(bytes([FLOAT32_DTYPE, 0, 1, 2, 3]), VECTOR_SUBTYPE),
+    Binary(bytes([0x03, 0]) + b"\x00" * 8, VECTOR_SUBTYPE),
+    Binary(bytes([FLOAT32_DTYPE, 0]) + b"\x00" * 8, 0),
+])
+def test_decode_rejects_other_values(value):
+    assert decode_embedding(value) is None
+
+
+def test_unknown_storage_is_an_error(vector):
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "parquet")
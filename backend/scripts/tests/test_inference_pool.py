@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import pytest
+
+from embedding_metrics import ServiceMetrics, _request_stages
+from inference_pool import InferencePool
+
+
+def test_stages_timed_on_a_worker_reach_the_request():
+    metrics = ServiceMetrics()
+    pool = InferencePool(max_workers=2)
+    pool.start()
+
+    def encode(texts):
+        with metrics.stage("inference"):
+            return threading.current_thread().name, len(texts)
+
+    async def request():
+        stages = {}
+        _request_stages.set(stages)
+        result = await pool.run(encode, ["a", "b"])
+        return result, stages
+
+    try:
+        (thread, count), stages = asyncio.run(request())
+    finally:
+        pool.shutdown()
+    assert thread.startswith("inference") and count == 2
+    assert set(stages) == {"inference"}
+
+
+def test_failures_are_raised_and_counted():
+    pool = InferencePool()
+    pool.start()
+
+    def fail():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(fail))
+    finally:
+        pool.shutdown()
+    assert pool.stats()["failed"] == 1 and pool.stats()["queued"] == 0
@@ -0,0 +1,47 @@
+from pymongo.errors import BulkWriteError
+
+from mongo_bulk import BulkWriter, parse_write_concern
+
+
+class FailingCollection:
+    """Answers every bulk write with the given BulkWriteError details"""
+
+    def __init__(self, details):
+        self.details = details
+        self.calls = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls.append((len(operations), ordered))
+        raise BulkWriteError(self.details)
+
+
+def test_failed_writes_are_reported_by_key_before_on_flush():
+    events = []
+    collection = FailingCollection({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]})
+    writer = BulkWriter(
+        collection, 3,
+        on_flush=lambda: events.append("flush"),
+        on_write_error=lambda key, message: events.append((key, message))
+    )
+    with writer:
+        for key in "abc":
+            writer.add(object(), key=key)
+    assert collection.calls == [(3, False)]
+    assert events == [("b", "duplicate key"), "flush"]
+    assert (writer.written, writer.failed, writer.write_concern_errors) == (2, 1, 0)
+
+
+def test_write_concern_errors_are_counted_and_reported():
+    collection = FailingCollection(
+        {"writeErrors": [], "writeConcernErrors": [{"code": 64, "errmsg": "waiting for replication timed out"}]}
+    )
+    with BulkWriter(collection, 10) as writer:
+        writer.add(object())
+    assert (writer.written, writer.failed, writer.write_concern_errors) == (1, 0, 1)
+    assert "1 write concern errors" in writer.summary()
+
+
+def test_parse_write_concern():
+    assert parse_write_concern("") is None
+    assert parse_write_concern("1").document == {"w": 1}
+    assert parse_write_concern("majority,j").document == {"w": "majority", "j": True}
@@ -0,0 +1,434 @@
+"""
+In-memory vector index for FluxCommerce product search
+Keeps one L2-normalized float32 embedding matrix per store, so a query is a
+single matrix-vector product plus an argpartition top-k instead of a scan
+over every product document.
+"""
+import logging
+import threading
+import time
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ann_index import IVFIndex
+from embedding_storage import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Only what the index needs from each product document
+PRODUCT_PROJECTION = {"_id": 1, "StoreId": 1, "embedding": 1}
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting everything"""
+    if k <= 0 or scores.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class StorePartition:
+    """
+    Embedding matrix and product ids of one store.
+
+    Rows live in a preallocated matrix that grows geometrically, so single
+    product updates do not copy the whole matrix. Without an ANN index,
+    removal moves the last row into the freed slot. With one (build_ann),
+    rows are ordered by cluster, so removal leaves a tombstone instead and
+    new products join the unclustered tail that every search scans.
+
+    A partition attached to a snapshot (attach) reads rows straight from
+    the read-only memory map and copies them into its own matrix only on
+    the first update.
+    """
+
+    def __init__(self, dimensions: int, capacity: int = 64):
+        self.dimensions = dimensions
+        self.matrix = np.zeros((max(capacity, 1), dimensions), dtype=np.float32)
+        self.ids: List[Optional[str]] = []
+        self.positions: Dict[str, int] = {}
+        self.ivf: Optional[IVFIndex] = None
+        self.tombstones: Set[int] = set()
+
+    @property
+    def size(self) -> int:
+        """Rows in use, including tombstones"""
+        return len(self.ids)
+
+    @property
+    def count(self) -> int:
+        """Live products"""
+        return len(self.positions)
+
+    def vectors(self) -> np.ndarray:
+        return self.matrix[:self.size]
+
+    def bulk_load(self, ids: List[str], vectors: np.ndarray):
+        self.matrix = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimensions))
+        self.ids = list(ids)
+        self.positions = {product_id: row for row, product_id in enumerate(self.ids)}
+        self.ivf = None
+        self.tombstones = set()
+
+    def attach(self, ids: List[str], vectors: np.ndarray):
+        """Use already-normalized rows (e.g. a memory-mapped snapshot) without copying them"""
+        self.matrix = vectors
+        self.ids = list(ids)
+        self.positions = {product_id: row for row, product_id in enumerate(self.ids)}
+        self.ivf = None
+        self.tombstones = set()
+
+    def _make_writable(self):
+        if not self.matrix.flags.writeable:
+            self.matrix = np.array(self.matrix, dtype=np.float32)
+
+    def _reorder(self, order: np.ndarray):
+        """Keep only the given rows, in the given order"""
+        self.matrix = self.vectors()[order]
+        self.ids = [self.ids[row] for row in order]
+        self.positions = {product_id: row for row, product_id in enumerate(self.ids)}
+        self.tombstones = set()
+
+    def _live_rows(self) -> np.ndarray:
+        return np.fromiter(sorted(self.positions.values()), dtype=np.int64, count=self.count)
+
+    def build_ann(self, nlist: int = 0, nprobe: int = 16):
+        """Cluster the live rows with k-means and store them grouped by cluster"""
+        if self.count != self.size:
+            self._reorder(self._live_rows())
+        ivf = IVFIndex(nlist, nprobe)
+        self._reorder(ivf.build(self.vectors()))
+        self.ivf = ivf
+
+    def apply_ann(self, ivf: IVFIndex, saved_ids: np.ndarray, saved_assignments: np.ndarray):
+        """
+        Reuse clusters saved by IVFIndex.save(). Products missing from the
+        file go to the unclustered tail; products no longer here are ignored.
+        """
+        known_rows, known_lists = [], []
+        for product_id, list_id in zip(saved_ids, saved_assignments):
+            row = self.positions.get(str(product_id))
+            if row is not None:
+                known_rows.append(row)
+                known_lists.append(list_id)
+
+        clustered = np.asarray(known_rows, dtype=np.int64)[ivf.group(np.asarray(known_lists, dtype=np.int32))]
+        tail = np.setdiff1d(self._live_rows(), clustered, assume_unique=True)
+        self._reorder(np.concatenate([clustered, tail]))
+        self.ivf = ivf
+
+    def upsert(self, product_id: str, vector: np.ndarray):
+        self._make_writable()
+        row = self.positions.get(product_id)
+        if row is None:
+            row = self.size
+            if row == self.matrix.shape[0]:
+                grown = np.zeros((row + max(row // 2, 64), self.dimensions), dtype=np.float32)
+                grown[:row] = self.matrix[:row]
+                self.matrix = grown
+            self.ids.append(product_id)
+            self.positions[product_id] = row
+        self.matrix[row] = vector
+
+    def remove(self, product_id: str) -> bool:
+        row = self.positions.pop(product_id, None)
+        if row is None:
+            return False
+        self._make_writable()
+        if self.ivf is not None:
+            self.ids[row] = None
+            self.matrix[row] = 0.0
+            self.tombstones.add(row)
+            return True
+        last = self.size - 1
+        if row != last:
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.positions[moved] = row
+        self.ids.pop()
+        return True
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        exclude: Iterable[str] = (),
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Tuple[str, float]]:
+        masked = [self.positions[product_id] for product_id in exclude if product_id in self.positions]
+        masked.extend(self.tombstones)
+
+        if self.ivf is not None and not exact:
+            rows, scores = self.ivf.candidates(self.matrix, self.size, query, nprobe)
+        else:
+            rows, scores = None, self.vectors() @ query
+
+        if masked:
+            masked = np.asarray(masked, dtype=np.int64)
+            scores[masked if rows is None else np.isin(rows, masked)] = -np.inf
+
+        best = top_k(scores, k)
+        picked = best if rows is None else rows[best]
+        return [
+            (self.ids[row], float(score))
+            for row, score in zip(picked, scores[best])
+            if score != -np.inf
+        ]
+
+    def ann_stats(self) -> Optional[dict]:
+        if self.ivf is None:
+            return None
+        return {**self.ivf.params(), "tail_rows": self.size - self.ivf.size, "tombstones": len(self.tombstones)}
+
+
+class VectorIndex:
+    """
+    Product embeddings partitioned by StoreId.
+
+    Vectors are normalized on the way in, so scores are cosine similarities.
+    Zero vectors (the placeholder written when embedding generation failed)
+    and vectors of the wrong dimension are skipped rather than indexed.
+    Searches and single-product updates share one lock (a search is a
+    sub-millisecond matrix-vector product); a full reload builds the new
+    partitions outside the lock and swaps them in.
+
+    Stores with at least ann_min_products products get an IVF index
+    (ann_index.py) and are searched approximately, probing ann_nprobe of
+    their clusters. With ann_dir set, trained clusters are saved there and
+    reused on the next load instead of re-running k-means.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        ann_min_products: int = 0,
+        ann_nlist: int = 0,
+        ann_nprobe: int = 16,
+        ann_dir: Optional[str] = None
+    ):
+        self.dimensions = dimensions
+        self.ann_min_products = ann_min_products
+        self.ann_nlist = ann_nlist
+        self.ann_nprobe = ann_nprobe
+        self.ann_dir = ann_dir
+        self._stores: Dict[str, StorePartition] = {}
+        self._lock = threading.Lock()
+
+        self.loaded = False
+        self.load_seconds = 0.0
+        self.skipped = 0
+        self.searches = 0
+
+    def _usable(self, vector: Any) -> Optional[np.ndarray]:
+        # Either storage layout (embedding_storage.py) or a plain list/array
+        vector = decode_embedding(vector)
+        if vector is None:
+            return None
+        vector = vector.ravel()
+        if vector.shape[0] != self.dimensions or not np.isfinite(vector).all():
+            return None
+        norm = np.linalg.norm(vector)
+        if norm < 1e-6:
+            return None
+        return vector / norm
+
+    def load_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Replace the index with the given product documents
+        ({"_id", "StoreId", "embedding"}). Returns the number indexed.
+        """
+        started = time.perf_counter()
+        ids: Dict[str, List[str]] = {}
+        vectors: Dict[str, List[np.ndarray]] = {}
+        skipped = 0
+
+        for document in documents:
+            vector = self._usable(document.get("embedding"))
+            store_id = document.get("StoreId")
+            if vector is None or not store_id:
+                skipped += 1
+                continue
+            ids.setdefault(str(store_id), []).append(str(document["_id"]))
+            vectors.setdefault(str(store_id), []).append(vector)
+
+        stores = {}
+        for store_id in list(ids):
+            partition = StorePartition(self.dimensions)
+            partition.bulk_load(ids[store_id], np.stack(vectors.pop(store_id)))
+            stores[store_id] = partition
+
+        return self._swap_in(stores, skipped, started)
+
+    def load_snapshot(self, snapshot) -> int:
+        """
+        Replace the index with a memory-mapped snapshot (embedding_snapshot.py).
+        Partitions are views into the shared file until they are updated.
+        """
+        started = time.perf_counter()
+        if snapshot.manifest["dimensions"] != self.dimensions:
+            raise ValueError(f"Snapshot has {snapshot.manifest['dimensions']} dimensions, not {self.dimensions}")
+        stores = {}
+        for store_id, ids, vectors in snapshot.stores():
+            partition = StorePartition(self.dimensions)
+            partition.attach(ids.tolist(), vectors)
+            stores[store_id] = partition
+        return self._swap_in(stores, snapshot.manifest["skipped"], started)
+
+    def _swap_in(self, stores: Dict[str, StorePartition], skipped: int, started: float) -> int:
+        """Attach ANN indexes to large stores, then replace the live partitions"""
+        for store_id, partition in stores.items():
+            if self.ann_min_products and partition.count >= self.ann_min_products:
+                self._attach_ann(store_id, partition)
+
+        with self._lock:
+            self._stores = stores
+            self.skipped = skipped
+            self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+
+        indexed = sum(partition.count for partition in stores.values())
+        logger.info(f"Vector index loaded {indexed} products in {len(stores)} stores ({skipped} skipped) in {self.load_seconds:.2f}s")
+        return indexed
+
+    def _ann_path(self, store_id: str) -> str:
+        return os.path.join(self.ann_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", store_id) + ".ivf.npz")
+
+    def _attach_ann(self, store_id: str, partition: StorePartition):
+        """Reuse saved clusters for the store when available, otherwise train and save them"""
+        started = time.perf_counter()
+        path = self._ann_path(store_id) if self.ann_dir else None
+        if path and os.path.exists(path):
+            ivf, saved_ids, saved_assignments = IVFIndex.load(path)
+            ivf.nprobe = self.ann_nprobe
+            partition.apply_ann(ivf, saved_ids, saved_assignments)
+            action = "loaded"
+        else:
+            partition.build_ann(self.ann_nlist, self.ann_nprobe)
+            if path:
+                os.makedirs(self.ann_dir, exist_ok=True)
+                partition.ivf.save(path, partition.ids)
+            action = "built"
+        logger.info(
+            f"ANN index {action} for store {store_id}: {partition.count} products, "
+            f"{partition.ivf.nlist} lists in {time.perf_counter() - started:.2f}s"
+        )
+
+    def save_ann(self) -> int:
+        """Write the current clusters of every ANN-indexed store to ann_dir"""
+        saved = 0
+        os.makedirs(self.ann_dir, exist_ok=True)
+        with self._lock:
+            for store_id, partition in self._stores.items():
+                if partition.ivf is not None:
+                    partition.ivf.save(self._ann_path(store_id), [product_id or "" for product_id in partition.ids])
+                    saved += 1
+        return saved
+
+    def load_from_mongo(self, collection) -> int:
+        """Load every live product with an embedding from the Products collection"""
+        cursor = collection.find(
+            {"IsDeleted": {"$ne": True}, "embedding": {"$exists": True}},
+            PRODUCT_PROJECTION,
+            batch_size=1000,
+        )
+        return self.load_documents(cursor)
+
+    def upsert(self, store_id: str, product_id: str, vector: Any) -> bool:
+        """Add or replace one product; unusable vectors remove it instead"""
+        vector = self._usable(vector)
+        if vector is None:
+            self.remove(product_id)
+            return False
+        with self._lock:
+            for other_store, partition in self._stores.items():
+                if other_store != store_id:
+                    partition.remove(product_id)
+            partition = self._stores.get(store_id)
+            if partition is None:
+                partition = self._stores[store_id] = StorePartition(self.dimensions)
+            partition.upsert(product_id, vector)
+        return True
+
+    def remove(self, product_id: str) -> bool:
+        with self._lock:
+            return any([partition.remove(product_id) for partition in self._stores.values()])
+
+    def search(
+        self,
+        store_id: str,
+        query: Any,
+        k: int = 10,
+        exclude: Iterable[str] = (),
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k (product_id, cosine score) in one store, best first. nprobe
+        overrides the ANN probe count; exact forces a full scan.
+        """
+        query = self._usable(query)
+        if query is None:
+            raise ValueError(f"Query vector must be a non-zero vector of {self.dimensions} dimensions")
+
+        with self._lock:
+            self.searches += 1
+            partition = self._stores.get(store_id)
+            if partition is None or partition.count == 0:
+                return []
+            return partition.search(query, k, exclude, nprobe, exact)
+
+    def scores(self, store_id: str, query: Any, product_ids: Iterable[str]) -> Dict[str, float]:
+        """Cosine score of the given products (those not indexed are left out)"""
+        query = self._usable(query)
+        if query is None:
+            raise ValueError(f"Query vector must be a non-zero vector of {self.dimensions} dimensions")
+
+        with self._lock:
+            partition = self._stores.get(store_id)
+            if partition is None:
+                return {}
+            found = [product_id for product_id in product_ids if product_id in partition.positions]
+            if not found:
+                return {}
+            rows = np.fromiter((partition.positions[product_id] for product_id in found), dtype=np.int64, count=len(found))
+            return dict(zip(found, (partition.matrix[rows] @ query).tolist()))
+
+    def vector(self, store_id: str, product_id: str) -> Optional[np.ndarray]:
+        """Stored (normalized) vector of one product, if indexed"""
+        with self._lock:
+            partition = self._stores.get(store_id)
+            if partition is None or product_id not in partition.positions:
+                return None
+            return partition.matrix[partition.positions[product_id]].copy()
+
+    def stats(self) -> dict:
+        stores = self._stores
+        return {
+            "loaded": self.loaded,
+            "stores": len(stores),
+            "products": sum(partition.count for partition in stores.values()),
+            "skipped": self.skipped,
+            "dimensions": self.dimensions,
+            "memory_mb": sum(partition.matrix.nbytes for partition in stores.values() if partition.matrix.flags.writeable) / (1024 * 1024),
+            "mapped_mb": sum(partition.matrix.nbytes for partition in stores.values() if not partition.matrix.flags.writeable) / (1024 * 1024),
+            "load_seconds": self.load_seconds,
+            "searches": self.searches,
+            "ann": {
+                "min_products": self.ann_min_products,
+                "nprobe": self.ann_nprobe,
+                "stores": {store_id: partition.ann_stats() for store_id, partition in stores.items() if partition.ivf is not None},
+            },
+        }